@@ -1,6 +1,8 @@
 import streamlit as st
 from datetime import date
 
+from core import media
+
 st.set_page_config(layout="wide", page_title="🐑清境農場周邊土地利用分類與環境變遷分析")
 
 st.title("清境農場周邊土地利用分類與環境變遷分析")
@@ -26,7 +28,8 @@ st.markdown(markdown)
 
 
 # Display the image
-st.image("sheep.png", caption="""青青草原""",use_container_width=True)
+# 預先縮小的 AVIF / WebP 版本，以靜態檔提供
+media.image("sheep.png", caption="""青青草原""")
 
 
 
@@ -38,12 +41,9 @@ markdown = """
 """
 st.markdown(markdown)
 
+# 影片以靜態檔網址播放，瀏覽器展開後才分段下載，不會讀進 Python 記憶體
 with st.expander("播放真色影像mp4檔(landsat)1984年~2024年"):
-    video_file = open("qingjing_true (1).mp4", "rb")  # "rb"指的是讀取二進位檔案（圖片、影片）
-    video_bytes = video_file.read()
-    st.video(video_bytes)
+    media.video("qingjing_true (1).mp4")
 
 with st.expander("播放假色影像mp4檔(sentinel2) bands=['B8', 'B4', 'B3']2016年~2024年"):
-    video_file = open("false_qingjing.mp4", "rb")  # "rb"指的是讀取二進位檔案（圖片、影片）
-    video_bytes = video_file.read()
-    st.video(video_bytes)
+    media.video("false_qingjing.mp4")
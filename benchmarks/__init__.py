@@ -0,0 +1 @@
+"""離線基準測試（以 `python -m benchmarks.<名稱>` 從專案根目錄執行）。"""
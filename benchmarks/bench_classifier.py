@@ -0,0 +1,200 @@
+"""
+土地覆蓋分類器的參數掃描：樹數 × 每類取樣點數 × 輸入波段。
+
+每組參數記錄訓練時間、分類時間與驗證精度（整體精度、kappa），輸出 Pareto 前緣
+（分類時間、訓練時間越小越好，精度越高越好），並推薦精度與最佳值相差不超過 --tolerance 的
+最便宜組合。
+
+    # Earth Engine：各組同時送出（上限 --workers），分類時間為一個年份的分類 + 面積統計
+    python -m benchmarks.bench_classifier --mode ee --workers 4
+    # 本機：樣本只匯出一次，以 scikit-learn 訓練並對本機影像庫的影像預測（需要 scikit-learn）
+    python -m benchmarks.bench_classifier --mode local --classify-year 2024
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from functools import partial
+
+import numpy as np
+
+from core import config
+from core.classifier import default_spec
+from core.session import ensure_ee
+
+BAND_SETS = {
+    "all": None,
+    # 去掉 60 公尺的大氣波段
+    "no60m": ('B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B8A', 'B11', 'B12'),
+    # 只用 10 公尺波段
+    "10m": ('B2', 'B3', 'B4', 'B8'),
+}
+
+
+def grid(trees, points, band_sets):
+    return [
+        {"trees": t, "points": p, "bands": b}
+        for t in trees for p in points for b in band_sets
+    ]
+
+
+def run_ee(params, classify_year, registry_dir):
+    """在 Earth Engine 上訓練（精度隨訓練一起取回），再計時一個年份的分類與面積統計。"""
+    import ee
+    from core.area_stats import grouped_area
+    from core.classifier import ClassifierService
+    from core.pipeline import year_collection
+
+    spec = default_spec(trees=params["trees"], num_points=params["points"], bands=BAND_SETS[params["bands"]])
+    service = ClassifierService(registry_dir=registry_dir, use_artifacts=False)
+    t0 = time.perf_counter()
+    trained = service.get(spec)
+    train_s = time.perf_counter() - t0
+
+    image = ee.Image(year_collection([classify_year]).first())
+    t0 = time.perf_counter()
+    grouped_area(image.classify(trained.classifier), ee.Geometry.Rectangle(config.ROI_COORDS)).getInfo()
+    classify_s = time.perf_counter() - t0
+    return {**params, "train_s": train_s, "classify_s": classify_s,
+            "overall": trained.accuracy["overall"], "kappa": trained.accuracy["kappa"]}
+
+
+def stratified_subset(labels, candidates, per_class, seed):
+    """從 candidates（布林遮罩）中每個類別取最多 per_class 個樣本的索引。"""
+    rng = np.random.default_rng(seed)
+    chosen = []
+    for label in np.unique(labels[candidates]):
+        indices = np.flatnonzero(candidates & (labels == label))
+        chosen.append(rng.permutation(indices)[:per_class])
+    return np.concatenate(chosen)
+
+
+def classify_target(classify_year, samples):
+    """本機分類計時的輸入：影像庫中該年份的影像；沒有時以樣本重複組成 100 萬個像素。"""
+    from core.raster_store import default_store
+    for entry in default_store().entries():
+        if entry.date.startswith(str(classify_year)) and tuple(entry.roi) == tuple(config.ROI_COORDS):
+            return f"{entry.scene_id}", entry
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, len(samples["features"]), 1_000_000)
+    return "samples x 1e6", samples["features"][rows]
+
+
+def predict_target(forest, bands, names, target):
+    if isinstance(target, np.ndarray):
+        return forest.predict(target[:, [names.index(b) for b in bands]])
+    # 與 LocalClassifier.classify 相同的逐圖塊預測，但不寫入快取
+    height, width = target.shape[1:]
+    for row in range(0, height, 128):
+        rows = min(128, height - row)
+        pixels = np.asarray(target.read(bands, (row, 0, rows, width)), dtype=np.float32).reshape(len(bands), -1).T
+        valid = pixels.any(axis=1)
+        if valid.any():
+            forest.predict(pixels[valid])
+
+
+def run_local(params, samples, target, seed=0):
+    """以本機樣本訓練；所有組合使用同一組驗證樣本（最大取樣數中 random > 0.8 的部分）。"""
+    from core.accuracy import local_accuracy
+    from core.local_classifier import _sklearn_forest, select_bands
+
+    names = [str(b) for b in samples["bands"]]
+    bands, features = select_bands(samples, BAND_SETS[params["bands"]])
+    labels = samples["labels"]
+    train = stratified_subset(labels, samples["random"] <= 0.8, int(params["points"] * 0.8), seed)
+    validation = samples["random"] > 0.8
+
+    forest = _sklearn_forest()(n_estimators=params["trees"], random_state=seed, n_jobs=-1)
+    t0 = time.perf_counter()
+    forest.fit(features[train], labels[train])
+    train_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    predict_target(forest, bands, names, target)
+    classify_s = time.perf_counter() - t0
+
+    accuracy = local_accuracy(labels[validation], forest.predict(features[validation]))
+    return {**params, "train_s": train_s, "classify_s": classify_s,
+            "overall": accuracy["overall"], "kappa": accuracy["kappa"]}
+
+
+def pareto_front(rows):
+    """沒有被其他組合在分類時間、訓練時間與精度上同時優於（或相等）的組合。"""
+    def dominates(a, b):
+        no_worse = a["classify_s"] <= b["classify_s"] and a["train_s"] <= b["train_s"] and a["overall"] >= b["overall"]
+        better = a["classify_s"] < b["classify_s"] or a["train_s"] < b["train_s"] or a["overall"] > b["overall"]
+        return no_worse and better
+    return [row for row in rows if not any(dominates(other, row) for other in rows)]
+
+
+def recommend(rows, tolerance):
+    """精度不低於最佳值 - tolerance 的組合中，分類時間最短者（同分時取訓練時間短者）。"""
+    best = max(row["overall"] for row in rows)
+    eligible = [row for row in rows if row["overall"] >= best - tolerance]
+    return min(eligible, key=lambda row: (row["classify_s"], row["train_s"]))
+
+
+def print_table(rows, front):
+    front_ids = {id(row) for row in front}
+    print(f"{'trees':>5} {'points':>6} {'bands':>6} {'train_s':>8} {'classify_s':>10} {'OA':>6} {'kappa':>6}  pareto")
+    for row in sorted(rows, key=lambda r: (r["classify_s"], -r["overall"])):
+        print(f"{row['trees']:>5} {row['points']:>6} {row['bands']:>6} {row['train_s']:>8.2f} "
+              f"{row['classify_s']:>10.2f} {row['overall']:>6.3f} {row['kappa']:>6.3f}  {'*' if id(row) in front_ids else ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分類器樹數、取樣點數與波段的參數掃描")
+    parser.add_argument("--mode", choices=["ee", "local"], default="local")
+    parser.add_argument("--trees", type=int, nargs="+", default=[10, 20, 50, 100])
+    parser.add_argument("--points", type=int, nargs="+", default=[1000, 5000, 10000], help="每個類別的取樣點數")
+    parser.add_argument("--bands", nargs="+", choices=list(BAND_SETS), default=list(BAND_SETS))
+    parser.add_argument("--classify-year", type=int, default=2024)
+    parser.add_argument("--workers", type=int, default=4, help="Earth Engine 模式同時送出的組合數")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="可接受的整體精度差距")
+    parser.add_argument("--output", default="bench_classifier.json")
+    args = parser.parse_args(argv)
+
+    configs = grid(args.trees, args.points, args.bands)
+    t0 = time.time()
+    if args.mode == "ee":
+        from core.fetch import fetch_all
+        ensure_ee()
+        registry_dir = tempfile.mkdtemp(prefix="meovv-sweep-")
+        fetched = fetch_all({
+            i: partial(run_ee, params, args.classify_year, registry_dir) for i, params in enumerate(configs)
+        }, max_workers=args.workers, timeout=1800)
+        rows = [fetched.values[i] for i in sorted(fetched.values)]
+        for i, error in fetched.errors.items():
+            print(f"失敗 {configs[i]}: {error}")
+        target_name = f"{args.classify_year} (Earth Engine)"
+    else:
+        from core.local_classifier import LocalClassifier
+        local = LocalClassifier(default_spec(num_points=max(args.points)))
+        try:
+            samples = local.samples()
+        except Exception:
+            # 樣本尚未匯出時才需要 Earth Engine
+            ensure_ee()
+            samples = local.samples()
+        target_name, target = classify_target(args.classify_year, samples)
+        rows = []
+        for params in configs:
+            rows.append(run_local(params, samples, target))
+            print(f"  {params} 完成", flush=True)
+
+    if not rows:
+        return 1
+    front = pareto_front(rows)
+    choice = recommend(rows, args.tolerance)
+    print_table(rows, front)
+    print(f"\n推薦（精度差距 ≤ {args.tolerance}）：trees={choice['trees']} points={choice['points']} "
+          f"bands={choice['bands']}  OA={choice['overall']:.3f}  分類 {choice['classify_s']:.2f}s")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"mode": args.mode, "classify_target": target_name, "elapsed": time.time() - t0,
+                   "rows": rows, "pareto": front, "recommended": choice}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+第 1 頁載入流程的並行擷取基準測試（假延遲後端，不需網路）。
+
+模擬 4 個颱風前後場景查詢加上 6 個圖層 map ID，比較依序執行與 fetch_all 並行執行的時間。
+
+    python -m benchmarks.bench_fetch --latency 0.5
+"""
+import argparse
+import tempfile
+import time
+from functools import partial
+
+from core import config
+from core.fetch import FakeLatencyBackend, fetch_all
+from core.scenes import SceneQuery, SceneResolver
+
+WINDOWS = [
+    ('2023-06-01', '2023-07-31'),
+    ('2023-08-01', '2023-09-30'),
+    ('2024-09-01', '2024-10-29'),
+    ('2024-10-30', '2024-12-30'),
+]
+LAYERS = ['kanu_bef', 'kanu_aft', 'kanu_ndvi', 'kangrui_bef', 'kangrui_aft', 'kangrui_ndvi']
+
+
+def queries():
+    return [SceneQuery(tuple(config.POINT_COORDS), tuple(config.ROI_COORDS), s, e) for s, e in WINDOWS]
+
+
+def sequential(backend, resolver):
+    t0 = time.perf_counter()
+    for query in queries():
+        resolver.resolve(query)
+    for name in LAYERS:
+        backend.tile_url(name, None)
+    return time.perf_counter() - t0
+
+
+def concurrent(backend, resolver):
+    t0 = time.perf_counter()
+    fetch_all({i: partial(resolver.resolve, q) for i, q in enumerate(queries())})
+    fetch_all({name: partial(backend.tile_url, name, None) for name in LAYERS})
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.5, help="每個請求的基本延遲（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {}
+    for label, run in (("sequential", sequential), ("concurrent", concurrent)):
+        backend = FakeLatencyBackend(args.latency, args.jitter)
+        resolver = SceneResolver(cache_dir=tempfile.mkdtemp(), lookup=backend.lookup)
+        cold = run(backend, resolver)
+        warm = run(FakeLatencyBackend(args.latency, args.jitter), resolver)  # 場景已快取，只剩 map ID
+        results[label] = (cold, warm)
+        print(f"{label:>10}: cold {cold:6.2f}s  warm(scenes cached) {warm:6.3f}s  calls {backend.calls}")
+    speedup = results["sequential"][0] / results["concurrent"][0]
+    print(f"cold speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+頁面的匯入時間：每個頁面在獨立的子行程中執行該頁最上層的 import 敘述（以 ast 取出），
+量測總耗時，並以 python -X importtime 列出累計耗時最多的模組。
+
+--eager 另外量測改為延遲匯入前，每個頁面一開始就匯入的套件（ee、geemap.foliumap、geopandas、
+requests、folium、google-auth），作為冷啟動的比較基準。--init 量測 core.session.ensure_ee()
+第一次與之後呼叫的耗時（需要金鑰與網路）。
+
+    python -m benchmarks.bench_imports --eager --top 10
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["app.py"] + sorted(os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, "pages", "*.py")))
+EAGER_IMPORTS = ("ee", "geemap.foliumap", "geopandas", "requests", "folium", "google.oauth2.service_account")
+
+CHILD = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+failed = []
+for statement in json.loads(sys.argv[1]):
+    try:
+        exec(statement, {})
+    except Exception as e:
+        failed.append(f"{statement}: {type(e).__name__}")
+print(json.dumps({"seconds": time.perf_counter() - t0, "failed": failed}))
+"""
+
+INIT_CHILD = """
+import json, time
+from core.session import ensure_ee
+times = []
+for _ in range(3):
+    t0 = time.perf_counter()
+    ensure_ee()
+    times.append(time.perf_counter() - t0)
+print(json.dumps(times))
+"""
+
+
+def top_level_imports(path):
+    """頁面最上層（不含函式內）的 import 敘述。"""
+    with open(os.path.join(ROOT, path), "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def parse_importtime(stderr):
+    """{模組: 累計微秒}（-X importtime 的輸出）。"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def measure(statements):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, json.dumps(statements)],
+        cwd=ROOT, capture_output=True, text=True, timeout=300,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(completed.stderr)
+    # 只列出頂層模組（子模組的時間已包含在其中）
+    result["modules"] = {name: us for name, us in modules.items() if "." not in name}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="頁面匯入時間")
+    parser.add_argument("--eager", action="store_true", help="另外量測一開始就匯入所有大型套件的情況")
+    parser.add_argument("--init", action="store_true", help="量測 ensure_ee() 的首次與重複呼叫")
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--output", default="bench_imports.json")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for page in PAGES:
+        statements = top_level_imports(page)
+        entry = {"lazy": measure(statements)}
+        if args.eager:
+            entry["eager"] = measure([f"import {name}" for name in EAGER_IMPORTS] + statements)
+        results[page] = entry
+        line = f"{page}: {entry['lazy']['seconds']:.2f}s"
+        if args.eager:
+            line += f"（一開始全部匯入 {entry['eager']['seconds']:.2f}s）"
+        print(line)
+        heaviest = sorted(entry["lazy"]["modules"].items(), key=lambda x: -x[1])[:args.top]
+        print("  " + "  ".join(f"{name} {us / 1e6:.2f}s" for name, us in heaviest))
+        for phase in entry.values():
+            for failure in phase["failed"]:
+                print(f"  匯入失敗 {failure}")
+
+    if args.init:
+        completed = subprocess.run([sys.executable, "-c", INIT_CHILD], cwd=ROOT,
+                                   capture_output=True, text=True, timeout=300)
+        if completed.returncode == 0:
+            times = json.loads(completed.stdout.strip().splitlines()[-1])
+            results["ensure_ee"] = times
+            print("ensure_ee(): " + " / ".join(f"{t * 1000:.1f} ms" for t in times))
+        else:
+            print(f"ensure_ee() 失敗：{completed.stderr.strip().splitlines()[-1]}")
+
+    with open(os.path.join(ROOT, args.output), "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+頁面繪製基準測試：以 Streamlit AppTest 執行 app.py 與三個頁面。
+
+每個頁面在獨立的子行程中執行（快取目錄為空的暫存目錄），量測：
+冷啟動、無變更 rerun、操作元件後 rerun 的時間，各階段的遠端呼叫次數與位元組，以及峰值 RSS。
+Earth Engine 以 core.ee_replay 的錄製檔重播，HTTP 以專案內的本機檔案回應，不需網路。
+錄製檔含服務帳戶的 Earth Engine 回應、基準結果與機器有關，兩者都不放進版本庫，需先在本機產生：
+
+    # 先錄製（需要 .streamlit/secrets.toml 的金鑰與網路）
+    python -m benchmarks.bench_pages --record benchmarks/recordings/pages.jsonl
+    # 以錄製檔重播一次，作為之後比較的基準
+    python -m benchmarks.bench_pages --output benchmarks/baseline.json
+    # 離線重播並與基準比較，任一指標退步超過 20% 時以 exit code 1 結束
+    python -m benchmarks.bench_pages --recording benchmarks/recordings/pages.jsonl \\
+        --output bench_results.json --baseline benchmarks/baseline.json --threshold 0.2
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["app.py"] + sorted(os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, "pages", "*.py")))
+
+# 各頁面操作元件的方式（沒有元件的頁面略過此階段）
+WIDGET_ACTIONS = {
+    "natural_disaster": lambda at: at.radio[0].set_value("NBR"),
+    "smileRandomForest": lambda at: at.multiselect[0].set_value([2016, 2024]),
+}
+
+# 比較基準時檢查的指標（數值越大越差）
+COMPARED_METRICS = ("cold_s", "warm_s", "widget_s", "cold_calls", "warm_calls", "widget_calls", "peak_rss_mb")
+# 時間差距小於此值（秒）時不視為退步，避免雜訊
+MIN_TIME_DELTA = 0.05
+
+
+def fake_service_account():
+    """產生可通過 google-auth 解析的假服務帳戶（重播模式不會真的使用）。"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    return {
+        "type": "service_account",
+        "project_id": "meovv-bench",
+        "private_key_id": "bench",
+        "private_key": pem,
+        "client_email": "bench@meovv-bench.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+
+
+class FakeHTTP:
+    """以專案內同名檔案回應 requests 的 GET，並計算次數與位元組。"""
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def install(self):
+        import requests
+
+        def request(session, method, url, *args, **kwargs):
+            self.calls += 1
+            response = requests.Response()
+            response.url = url
+            local = os.path.join(ROOT, os.path.basename(url.split("?")[0]))
+            if method.upper() == "GET" and os.path.isfile(local):
+                with open(local, "rb") as f:
+                    response._content = f.read()
+                response.status_code = 200
+            else:
+                response._content = b""
+                response.status_code = 404
+            response._content_consumed = True
+            response.raw = io.BytesIO(response._content)
+            self.bytes += len(response._content)
+            return response
+
+        requests.sessions.Session.request = request
+        return self
+
+
+def run_child(page, timeout):
+    """子行程：執行單一頁面的三個階段並輸出 JSON。"""
+    from streamlit.testing.v1 import AppTest
+
+    from core import ee_replay
+    backend = ee_replay.install_from_env()
+    http = FakeHTTP().install() if os.environ.get("MEOVV_EE_MODE") == "replay" else None
+
+    def remote_counts():
+        ee_calls = sum(v["calls"] for k, v in backend.stats.snapshot().items() if k != "getAlgorithms") if backend else 0
+        ee_bytes = sum(v["bytes"] for v in backend.stats.snapshot().values()) if backend else 0
+        return ee_calls + (http.calls if http else 0), ee_bytes + (http.bytes if http else 0)
+
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=timeout)
+    secrets_path = os.path.join(ROOT, ".streamlit", "secrets.toml")
+    if os.environ.get("MEOVV_EE_MODE") == "replay" or not os.path.exists(secrets_path):
+        at.secrets["GEE_SERVICE_ACCOUNT"] = fake_service_account()
+    else:
+        try:
+            import tomllib
+        except ModuleNotFoundError:  # Python < 3.11
+            import tomli as tomllib
+        with open(secrets_path, "rb") as f:
+            at.secrets["GEE_SERVICE_ACCOUNT"] = tomllib.load(f)["GEE_SERVICE_ACCOUNT"]
+
+    result = {"page": page, "exceptions": []}
+    phases = [("cold", lambda: at), ("warm", lambda: at)]
+    for marker, action in WIDGET_ACTIONS.items():
+        if marker in page:
+            phases.append(("widget", lambda action=action: action(at)))
+
+    for phase, prepare in phases:
+        calls_before, bytes_before = remote_counts()
+        try:
+            target = prepare()
+            t0 = time.perf_counter()
+            target.run()
+            result[f"{phase}_s"] = round(time.perf_counter() - t0, 4)
+        except Exception as e:
+            result[f"{phase}_s"] = None
+            result["exceptions"].append(f"{phase}: {type(e).__name__}: {e}")
+        calls_after, bytes_after = remote_counts()
+        result[f"{phase}_calls"] = calls_after - calls_before
+        result[f"{phase}_bytes"] = bytes_after - bytes_before
+        result["exceptions"].extend(f"{phase}: {e.message}" for e in at.exception)
+
+    if backend is not None:
+        result["ee"] = backend.stats.snapshot()
+        result["replay_misses"] = dict(getattr(backend, "misses", {}))
+    # Linux 的 ru_maxrss 單位為 KB
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def run_page(page, args):
+    env = dict(os.environ)
+    env["MEOVV_CACHE_DIR"] = tempfile.mkdtemp(prefix="meovv-bench-cache-")
+    if not args.with_artifacts:
+        env["MEOVV_ARTIFACT_DIR"] = tempfile.mkdtemp(prefix="meovv-bench-artifacts-")
+    if args.record:
+        env.update(MEOVV_EE_MODE="record", MEOVV_EE_RECORDING=args.record)
+    else:
+        env.update(MEOVV_EE_MODE="replay", MEOVV_EE_RECORDING=args.recording,
+                   MEOVV_EE_REPLAY_LATENCY=str(args.latency))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_pages", "--child", page, "--timeout", str(args.timeout)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        return {"page": page, "exceptions": [proc.stderr.strip()[-2000:]]}
+    return json.loads(lines[-1])
+
+
+def compare(results, baseline, threshold):
+    """回傳退步清單：新值超過基準值 (1 + threshold) 倍的指標。"""
+    base_by_page = {entry["page"]: entry for entry in baseline.get("pages", [])}
+    regressions = []
+    for entry in results["pages"]:
+        base = base_by_page.get(entry["page"])
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            new, old = entry.get(metric), base.get(metric)
+            if new is None or old is None:
+                continue
+            if metric.endswith("_s") and new - old < MIN_TIME_DELTA:
+                continue
+            if new > old * (1 + threshold) and new != old:
+                regressions.append(f"{entry['page']} {metric}: {old} -> {new}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streamlit 頁面繪製基準測試")
+    parser.add_argument("--recording", default=os.path.join(ROOT, "benchmarks", "recordings", "pages.jsonl"),
+                        help="重播用的 Earth Engine 錄製檔")
+    parser.add_argument("--record", metavar="PATH", help="改為連線執行並錄製到 PATH")
+    parser.add_argument("--latency", type=float, default=1.0, help="重播延遲倍率（0 表示不延遲）")
+    parser.add_argument("--pages", nargs="+", default=PAGES)
+    parser.add_argument("--with-artifacts", action="store_true", help="允許讀取 artifacts/（預設以空目錄量測冷啟動）")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="基準結果 JSON；有退步時 exit code 為 1")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.timeout)
+        return 0
+
+    if not args.record and not os.path.exists(args.recording):
+        parser.error(f"找不到錄製檔 {args.recording}（錄製檔不在版本庫中）；請先以 "
+                     f"python -m benchmarks.bench_pages --record {os.path.relpath(args.recording, ROOT)} 錄製")
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f"找不到基準結果 {args.baseline}；請先以 "
+                     f"python -m benchmarks.bench_pages --output {args.baseline} 產生")
+
+    results = {"created_at": time.time(), "latency_scale": args.latency, "pages": []}
+    for page in args.pages:
+        entry = run_page(page, args)
+        results["pages"].append(entry)
+        print(f"{page}: cold {entry.get('cold_s')}s ({entry.get('cold_calls')} calls)  "
+              f"warm {entry.get('warm_s')}s ({entry.get('warm_calls')} calls)  "
+              f"widget {entry.get('widget_s', '-')}s  rss {entry.get('peak_rss_mb')} MB")
+        for message in entry.get("exceptions", []):
+            print(f"    ! {message}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
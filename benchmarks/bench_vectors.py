@@ -0,0 +1,79 @@
+"""
+向量圖層的 HTML 大小比較：完整精度的內嵌 GeoJSON（與 geemap add_gdf 相同）、
+core.vector_layers 簡化量化後的內嵌 GeoJSON、經過圖磚代理載入（不內嵌），以及點位叢集。
+
+只量測 folium 產生的 HTML 位元組與編碼時間；瀏覽器端的繪製時間需在瀏覽器中另外量測。
+
+    python -m benchmarks.bench_vectors --layers hotels collapse110 --zooms 12 15
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+import folium
+
+from core import tile_proxy, vector_layers
+from core.geodata import load_vector
+
+
+def html_bytes(layer):
+    m = folium.Map()
+    layer.add_to(m)
+    return len(m.get_root().render().encode("utf-8"))
+
+
+def measure(gdf, zooms, proxy):
+    rows = [{"variant": "full", "bytes": html_bytes(folium.GeoJson(gdf.to_crs("EPSG:4326").to_json()))}]
+    for zoom in zooms:
+        t0 = time.perf_counter()
+        layer = vector_layers.geojson_layer(gdf, "layer", zoom=zoom)
+        rows.append({"variant": f"reduced z{zoom}", "bytes": html_bytes(layer),
+                     "encode_s": time.perf_counter() - t0})
+    tile_proxy.TILE_PROXY = proxy
+    try:
+        rows.append({"variant": "proxied", "bytes": html_bytes(vector_layers.geojson_layer(gdf, "layer", zoom=max(zooms)))})
+    finally:
+        tile_proxy.TILE_PROXY = None
+    if gdf.geom_type.isin(["Point"]).all():
+        rows.append({"variant": "cluster", "bytes": html_bytes(vector_layers.point_cluster_layer(gdf, "layer"))})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="向量圖層 HTML 大小比較")
+    parser.add_argument("--layers", nargs="+", default=["hotels", "collapse110"])
+    parser.add_argument("--zooms", type=int, nargs="+", default=[12, 15])
+    parser.add_argument("--port", type=int, default=8766, help="暫時啟動的本機代理埠號")
+    parser.add_argument("--output", default="bench_vectors.json")
+    args = parser.parse_args(argv)
+
+    # folium 以網址載入時會在建立圖層時讀取一次，暫時啟動只提供 /vectors/ 的代理
+    server = tile_proxy.make_server(tile_proxy.TileCache(resolve=lambda key: None), port=args.port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = {}
+    try:
+        for name in args.layers:
+            try:
+                gdf = load_vector(name)
+            except Exception as e:
+                print(f"{name}: 載入失敗 {e}")
+                continue
+            rows = measure(gdf, args.zooms, f"http://127.0.0.1:{args.port}")
+            results[name] = rows
+            full = rows[0]["bytes"]
+            print(f"{name}（{len(gdf)} 筆）")
+            for row in rows:
+                print(f"  {row['variant']:<12} {row['bytes']:>12,} bytes  {row['bytes'] / full:>7.1%}")
+    finally:
+        server.shutdown()
+    if not results:
+        return 1
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
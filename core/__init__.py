@@ -0,0 +1,7 @@
+"""清境農場土地利用分析的共用模組（GEE 查詢、分類器、快取）。"""
+import os
+
+# 設定 MEOVV_EE_MODE=record / replay 時，在頁面初始化 Earth Engine 之前安裝錄製或重播
+if os.environ.get("MEOVV_EE_MODE"):
+    from core.ee_replay import install_from_env
+    install_from_env()
@@ -0,0 +1,74 @@
+"""
+分類精度評估。
+
+以驗證樣本（random > 0.8）計算混淆矩陣、整體精度、kappa 與各類別 F1，
+組成一個 ee.Dictionary，與訓練結果放在同一次 getInfo 取回，並隨分類器 registry 一起快取。
+"""
+import ee
+
+from core import config
+
+
+def ee_accuracy(classifier, validation, class_band=None):
+    """ee.Dictionary：{'matrix': [[...]], 'overall': 數值, 'kappa': 數值, 'f1': [...], 'count': 樣本數}。"""
+    class_band = class_band or config.LABEL_BAND
+    order = list(range(len(config.CLASS_VALUES)))
+    matrix = validation.classify(classifier).errorMatrix(class_band, 'classification', order)
+    return ee.Dictionary({
+        'matrix': matrix.array(),
+        'overall': matrix.accuracy(),
+        'kappa': matrix.kappa(),
+        'f1': matrix.fscore(),
+        'count': validation.size(),
+    })
+
+
+def summary(accuracy):
+    """頁面上方顯示的摘要：(整體精度, kappa, 驗證樣本數)。"""
+    return accuracy['overall'], accuracy['kappa'], accuracy.get('count')
+
+
+def f1_frame(accuracy):
+    """各類別 F1；驗證樣本中沒有出現的類別不列出。"""
+    import pandas as pd
+    matrix = accuracy['matrix']
+    rows = []
+    for index in range(len(matrix)):
+        support = sum(matrix[index])
+        f1 = accuracy['f1'][index] if index < len(accuracy['f1']) else None
+        name = config.CLASS_NAMES[index] if index < len(config.CLASS_NAMES) else str(index)
+        if support and isinstance(f1, (int, float)):
+            rows.append([name, support, round(f1, 3)])
+    return pd.DataFrame(rows, columns=['類別', '驗證樣本數', 'F1'])
+
+
+def confusion_frame(accuracy):
+    """混淆矩陣（列：實際類別，欄：預測類別）；省略全為 0 的類別。"""
+    import pandas as pd
+    matrix = accuracy['matrix']
+    keep = [i for i in range(len(matrix)) if sum(matrix[i]) or sum(row[i] for row in matrix)]
+    names = [config.CLASS_NAMES[i] for i in keep]
+    return pd.DataFrame([[matrix[i][j] for j in keep] for i in keep], index=names, columns=names)
+
+
+def local_accuracy(actual, predicted):
+    """本機模式：由實際與預測類別陣列算出與 ee_accuracy 相同格式的結果。"""
+    import numpy as np
+    n = len(config.CLASS_VALUES)
+    matrix = np.bincount(np.asarray(actual, dtype=np.int64) * n + np.asarray(predicted, dtype=np.int64),
+                         minlength=n * n).reshape(n, n)
+    total = matrix.sum()
+    overall = np.trace(matrix) / total if total else 0.0
+    expected = (matrix.sum(axis=0) * matrix.sum(axis=1)).sum() / total ** 2 if total else 0.0
+    kappa = (overall - expected) / (1 - expected) if expected < 1 else 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.diag(matrix) / matrix.sum(axis=0)
+        recall = np.diag(matrix) / matrix.sum(axis=1)
+        f1 = 2 * precision * recall / (precision + recall)
+    return {
+        'matrix': matrix.tolist(),
+        'overall': float(overall),
+        'kappa': float(kappa),
+        'f1': [None if np.isnan(v) else float(v) for v in f1],
+        'count': int(total),
+    }
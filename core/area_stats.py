@@ -0,0 +1,143 @@
+"""
+土地覆蓋面積統計。
+
+每個年份用一次以類別分組的 ee.Image.pixelArea() 加總，所有缺少快取的年份合併成一個
+ee.Dictionary 只送出一次 getInfo。結果以 (年份, 分類器鍵, ROI) 快取在記憶體與磁碟，
+圖表與文字重新繪製時不需再呼叫 Earth Engine。
+"""
+import os
+import threading
+
+import ee
+
+from core import artifacts, config
+from core.instrumentation import cache_hit, timed
+from core.shared_cache import single_flight_many
+from core.storage import read_json, stable_key, write_json
+
+CLASS_BAND = 'class'
+
+
+def grouped_area(classified, roi, scale=10):
+    """回傳 ee.Dictionary：{'groups': [{'class': 類別索引, 'sum': 平方公里}, ...]}。"""
+    return (
+        ee.Image.pixelArea().divide(1e6)
+        .addBands(classified.select(0).rename(CLASS_BAND))
+        .reduceRegion(
+            reducer=ee.Reducer.sum().group(groupField=1, groupName=CLASS_BAND),
+            geometry=roi,
+            scale=scale,
+            maxPixels=1e10,
+        )
+    )
+
+
+def ee_compute(classified_by_year, roi_coords, scale):
+    """把多個年份的分組加總打包成一次請求。"""
+    roi = ee.Geometry.Rectangle(list(roi_coords))
+    batch = ee.Dictionary({
+        str(year): grouped_area(image, roi, scale) for year, image in classified_by_year.items()
+    })
+    result = batch.getInfo()
+    return {
+        int(year): {int(g[CLASS_BAND]): g['sum'] for g in value.get('groups', [])}
+        for year, value in result.items()
+    }
+
+
+class AreaStatsEngine:
+    """依 (年份, 分類器鍵, ROI) 快取各類別面積（平方公里，以類別索引 0~10 為鍵）。"""
+
+    def __init__(self, cache_dir=None, compute=None, use_artifacts=True):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "area_stats")
+        self.compute = compute or ee_compute
+        self.use_artifacts = use_artifacts
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _key(self, year, classifier_key, roi_coords, scale):
+        return stable_key([int(year), classifier_key, list(roi_coords), scale])
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        record = read_json(os.path.join(self.cache_dir, f"{key}.json"))
+        if record is None and self.use_artifacts:
+            record = artifacts.lookup("area_stats", key)
+        if record is not None:
+            record = {int(k): v for k, v in record.items()}
+            with self._lock:
+                self._memory[key] = record
+        return record
+
+    def _store(self, key, areas):
+        with self._lock:
+            self._memory[key] = areas
+        write_json(os.path.join(self.cache_dir, f"{key}.json"), areas)
+
+    def get(self, classified_by_year, classifier_key, roi_coords=None, scale=10):
+        """
+        classified_by_year: {年份: 已分類的 ee.Image}。
+        回傳 {年份: {類別索引: 平方公里}}；只有快取未命中的年份會送出（合併的）一次請求。
+        """
+        roi_coords = roi_coords or config.ROI_COORDS
+        keys = {year: self._key(year, classifier_key, roi_coords, scale) for year in classified_by_year}
+        stats = {}
+        missing = {}
+        for year, key in keys.items():
+            cached = self._lookup(key)
+            cache_hit("area_stats", cached is not None)
+            if cached is None:
+                missing[year] = classified_by_year[year]
+            else:
+                stats[year] = cached
+        if missing:
+            # 遠端計算不持有鎖；同一個鍵在所有 process 中只計算一次，等待後重新讀取快取
+            with single_flight_many(f"area_stats/{keys[year]}" for year in missing):
+                for year in list(missing):
+                    cached = self._lookup(keys[year])
+                    if cached is not None:
+                        del missing[year]
+                        stats[year] = cached
+                if missing:
+                    with timed("area_stats.compute"):
+                        computed = self.compute(missing, roi_coords, scale)
+                    for year, areas in computed.items():
+                        self._store(keys[year], areas)
+                        stats[year] = areas
+        return {year: stats[year] for year in classified_by_year}
+
+
+def to_frame(stats, min_area=0.0):
+    """轉成頁面使用的表格：'類別' 欄加上每個年份一欄；略過所有年份都小於 min_area 的類別。"""
+    import pandas as pd
+    years = list(stats)
+    rows = []
+    for index, name in enumerate(config.CLASS_NAMES):
+        values = [round(stats[year].get(index, 0.0), 2) for year in years]
+        if max(values, default=0.0) > min_area:
+            rows.append([name] + values)
+    return pd.DataFrame(rows, columns=['類別'] + [str(year) for year in years])
+
+
+def format_areas(areas, min_area=0.1):
+    """例如「10 Trees:60.22平方公里 ；30 Grassland:11.43平方公里」。"""
+    parts = [
+        f"{config.CLASS_NAMES[index]}:{area:.2f}平方公里"
+        for index, area in sorted(areas.items())
+        if area >= min_area
+    ]
+    return " ；".join(parts)
+
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+
+def default_engine():
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = AreaStatsEngine()
+        return _default_engine
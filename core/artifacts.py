@@ -0,0 +1,113 @@
+"""
+預先計算的成果目錄（由 prepare.py 產生）。
+
+每次 prepare 寫入一個新的版本目錄 artifacts/<版本>/，完成後才把 artifacts/CURRENT
+指向它，頁面因此不會讀到寫到一半的版本。目錄內各類紀錄沿用各快取模組的鍵與格式：
+
+    scenes/<鍵>.json         場景 ID（core.scenes）
+    classifiers/<鍵>.json    分類器 registry（core.classifier）
+    area_stats/<鍵>.json     各年份面積統計（core.area_stats）
+    change_stats/<鍵>.json   事件受損面積（core.change_detection）
+    transitions/<鍵>.json    土地覆蓋轉移面積（core.transitions）
+    map_ids/<鍵>.json        圖磚網址與到期時間（core.map_ids）
+    vectors/<名稱>.parquet   GeoParquet 向量資料
+    thumbnails/<名稱>.png    縮圖
+    manifest.json            產生時間與內容摘要
+
+頁面先查本機快取，再查目前版本的成果目錄，都沒有才即時計算。
+"""
+import os
+import shutil
+import time
+
+from core.storage import atomic_write_bytes, read_json, write_json
+
+ARTIFACT_FORMAT = 1
+ARTIFACT_DIR = os.environ.get(
+    "MEOVV_ARTIFACT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "artifacts"),
+)
+CURRENT_FILE = "CURRENT"
+
+# Earth Engine map ID 的有效時間未公開；保守地視為 4 小時後到期
+MAP_ID_TTL = 4 * 3600
+
+
+def current_dir(root=None):
+    """目前版本的目錄；尚未執行過 prepare 時回傳 None。"""
+    root = root or ARTIFACT_DIR
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(root, name)
+    return path if name and os.path.isdir(path) else None
+
+
+def path(kind, filename, root=None):
+    directory = current_dir(root)
+    return os.path.join(directory, kind, filename) if directory else None
+
+
+def lookup(kind, key, root=None):
+    """讀取目前版本中的一筆 JSON 紀錄；沒有時回傳 None。"""
+    record_path = path(kind, f"{key}.json", root)
+    return read_json(record_path) if record_path else None
+
+
+def read_vector(name, root=None):
+    """讀取目前版本中的 GeoParquet；沒有時回傳 None。"""
+    vector_path = path("vectors", f"{name}.parquet", root)
+    if not vector_path or not os.path.exists(vector_path):
+        return None
+    import geopandas as gpd
+    return gpd.read_parquet(vector_path)
+
+
+class ArtifactWriter:
+    """prepare.py 使用：建立新版本目錄，寫完後 commit 才會切換 CURRENT。"""
+
+    def __init__(self, root=None, keep=3):
+        self.root = root or ARTIFACT_DIR
+        self.keep = keep
+        self.version = f"v{ARTIFACT_FORMAT}-{time.strftime('%Y%m%dT%H%M%S')}"
+        self.directory = os.path.join(self.root, self.version)
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest = {"format": ARTIFACT_FORMAT, "version": self.version,
+                         "started_at": time.time(), "items": {}}
+
+    def kind_dir(self, kind):
+        directory = os.path.join(self.directory, kind)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def note(self, kind, count=1):
+        self.manifest["items"][kind] = self.manifest["items"].get(kind, 0) + count
+
+    def write_json(self, kind, key, record):
+        write_json(os.path.join(self.kind_dir(kind), f"{key}.json"), record)
+        self.note(kind)
+
+    def write_bytes(self, kind, filename, data):
+        atomic_write_bytes(os.path.join(self.kind_dir(kind), filename), data)
+        self.note(kind)
+
+    def write_vector(self, name, gdf):
+        target = os.path.join(self.kind_dir("vectors"), f"{name}.parquet")
+        tmp = target + ".tmp"
+        gdf.to_parquet(tmp)
+        os.replace(tmp, target)
+        self.note("vectors")
+
+    def commit(self):
+        """寫入 manifest、切換 CURRENT，並只保留最近 keep 個版本。"""
+        self.manifest["finished_at"] = time.time()
+        write_json(os.path.join(self.directory, "manifest.json"), self.manifest)
+        atomic_write_bytes(os.path.join(self.root, CURRENT_FILE), self.version.encode("utf-8"))
+        versions = sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith("v") and os.path.isdir(os.path.join(self.root, name))
+        )
+        for name in versions[:-self.keep]:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
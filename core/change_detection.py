@@ -0,0 +1,142 @@
+"""
+災前災後變遷偵測。
+
+每個事件的 NDVI、NBR、NDWI 差異（災後 - 災前）合成一張多波段影像，
+所以同一個事件的所有指數共用一次統計請求；所有事件的受損面積（差異低於門檻的像素，
+平方公里）再合併成一次 getInfo，並依 (事件, 場景 ID, ROI, 門檻) 快取。
+"""
+import os
+import threading
+
+import ee
+
+from core import artifacts, config
+from core.instrumentation import cache_hit, timed
+from core.shared_cache import single_flight_many
+from core.storage import read_json, stable_key, write_json
+
+# 指數名稱: (normalizedDifference 的兩個波段)
+INDICES = {
+    'NDVI': ('B8', 'B4'),   # 植生
+    'NBR': ('B8', 'B12'),   # 燒毀 / 裸露
+    'NDWI': ('B3', 'B8'),   # 水體
+}
+
+DIFF_VIS = {
+    'min': -1,
+    'max': 1,
+    'palette': ['red', 'white', 'green'] # 紅色表示減少，綠色表示增加
+}
+
+
+def diff_band(index_name):
+    return f'{index_name}_diff'
+
+
+def index_image(image):
+    return ee.Image.cat([
+        image.normalizedDifference(list(bands)).rename(name) for name, bands in INDICES.items()
+    ])
+
+
+def change_image(img_bef, img_aft):
+    """多波段差異影像，波段為 NDVI_diff、NBR_diff、NDWI_diff。"""
+    return index_image(img_aft).subtract(index_image(img_bef)).rename([diff_band(n) for n in INDICES])
+
+
+def damage_area(change, roi_coords, thresholds, scale=10):
+    """ee.Dictionary：{指數: 差異低於門檻的面積（平方公里）}，所有指數一次 reduceRegion。"""
+    names = list(INDICES)
+    damaged = change.select([diff_band(n) for n in names]).lt(
+        ee.Image.constant([thresholds[n] for n in names])
+    ).rename(names)
+    return damaged.multiply(ee.Image.pixelArea().divide(1e6)).reduceRegion(
+        reducer=ee.Reducer.sum(),
+        geometry=ee.Geometry.Rectangle(list(roi_coords)),
+        scale=scale,
+        maxPixels=1e10,
+    )
+
+
+def ee_compute(requests, scale):
+    """requests: {事件 ID: (change_image, roi_coords, thresholds)}，合併成一次請求。"""
+    batch = ee.Dictionary({
+        event_id: damage_area(change, roi_coords, thresholds, scale)
+        for event_id, (change, roi_coords, thresholds) in requests.items()
+    })
+    return batch.getInfo()
+
+
+class ChangeDetectionEngine:
+    """事件受損面積統計，快取在記憶體與磁碟。"""
+
+    def __init__(self, cache_dir=None, compute=None, use_artifacts=True):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "change_stats")
+        self.compute = compute or ee_compute
+        self.use_artifacts = use_artifacts
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _key(self, event, scene_ids, scale):
+        return stable_key([event.id, list(scene_ids), list(event.roi), event.thresholds, scale])
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        record = read_json(os.path.join(self.cache_dir, f"{key}.json"))
+        if record is None and self.use_artifacts:
+            record = artifacts.lookup("change_stats", key)
+        if record is not None:
+            with self._lock:
+                self._memory[key] = record
+        return record
+
+    def _store(self, key, areas):
+        with self._lock:
+            self._memory[key] = areas
+        write_json(os.path.join(self.cache_dir, f"{key}.json"), areas)
+
+    def statistics(self, changes, scale=10):
+        """
+        changes: {事件 ID: (Event, change_image, (災前場景 ID, 災後場景 ID))}。
+        回傳 {事件 ID: {指數: 平方公里}}；快取未命中的事件合併成一次請求。
+        """
+        keys = {eid: self._key(event, ids, scale) for eid, (event, _, ids) in changes.items()}
+        stats = {}
+        missing = {}
+        for eid, key in keys.items():
+            cached = self._lookup(key)
+            cache_hit("change_stats", cached is not None)
+            if cached is None:
+                event, change, _ = changes[eid]
+                missing[eid] = (change, event.roi, event.thresholds)
+            else:
+                stats[eid] = cached
+        if missing:
+            # 遠端統計不持有鎖；同一個鍵在所有 process 中只計算一次，等待後重新讀取快取
+            with single_flight_many(f"change_stats/{keys[eid]}" for eid in missing):
+                for eid in list(missing):
+                    cached = self._lookup(keys[eid])
+                    if cached is not None:
+                        del missing[eid]
+                        stats[eid] = cached
+                if missing:
+                    with timed("change_stats.compute"):
+                        computed = self.compute(missing, scale)
+                    for eid, areas in computed.items():
+                        self._store(keys[eid], areas)
+                        stats[eid] = areas
+        return {eid: stats[eid] for eid in changes}
+
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+
+def default_engine():
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = ChangeDetectionEngine()
+        return _default_engine
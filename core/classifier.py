@@ -0,0 +1,238 @@
+"""
+smileRandomForest 分類器服務。
+
+以 (ROI, 參考影像, 標籤資料集, 取樣點數, 亂數種子, 樹數) 為鍵，把訓練好的決策樹字串與
+stratifiedSample 樣本存進磁碟上的 registry。之後的 rerun 或其他頁面直接用
+ee.Classifier.decisionTreeEnsemble 重建分類器，不需重新取樣與訓練。
+驗證樣本的精度評估（core.accuracy）與訓練在同一次請求中取回，一起存進 registry。
+"""
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import ee
+
+from core import artifacts, config
+from core.accuracy import ee_accuracy
+from core.instrumentation import cache_hit, timed
+from core.shared_cache import single_flight
+from core.storage import read_json, stable_key, write_json
+
+# registry 格式版本；格式改變時遞增，舊紀錄會自動視為未命中
+REGISTRY_VERSION = 1
+
+
+@dataclass(frozen=True)
+class ClassifierSpec:
+    """決定一個訓練結果的所有參數。"""
+    roi: tuple = tuple(config.ROI_COORDS)
+    point: tuple = tuple(config.POINT_COORDS)
+    collection: str = config.S2_COLLECTION
+    reference_start: str = config.REFERENCE_START
+    reference_end: str = config.REFERENCE_END
+    max_cloud: float = config.REFERENCE_MAX_CLOUD
+    label_dataset: str = config.LABEL_DATASET
+    num_points: int = 10000
+    seed: int = 0
+    trees: int = 100
+    bands: tuple = None  # 輸入波段；None 表示所有 B.* 波段
+
+    def key(self):
+        fields = asdict(self)
+        if fields['bands'] is None:
+            # 未指定波段時與加入此欄位前的鍵相同，既有的 registry 仍可使用
+            del fields['bands']
+        return stable_key({"version": REGISTRY_VERSION, **fields})
+
+
+def default_spec(**overrides):
+    return ClassifierSpec(**overrides)
+
+
+@dataclass
+class TrainedClassifier:
+    """可重複使用的分類器與其訓練樣本。"""
+    key: str
+    spec: ClassifierSpec
+    classifier: object
+    sample: object
+    input_bands: list
+    accuracy: dict = None
+
+    def training_sample(self):
+        return self.sample.filter('random <= 0.8')
+
+    def validation_sample(self):
+        return self.sample.filter('random > 0.8')
+
+
+class EEClassifierBackend:
+    """實際在 Earth Engine 上取樣與訓練的後端。"""
+
+    def reference_image(self, spec):
+        return (
+            ee.ImageCollection(spec.collection)
+            .filterBounds(ee.Geometry.Point(list(spec.point)))
+            .filterDate(spec.reference_start, spec.reference_end)
+            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', spec.max_cloud))
+            .sort('CLOUDY_PIXEL_PERCENTAGE')
+            .first()
+            .clip(ee.Geometry.Rectangle(list(spec.roi)))
+            .select(list(spec.bands) if spec.bands else 'B.*')
+        )
+
+    def label_image(self, spec):
+        lc = ee.Image(spec.label_dataset).clip(ee.Geometry.Rectangle(list(spec.roi)))
+        remapValues = ee.List.sequence(0, len(config.CLASS_VALUES) - 1)
+        return lc.remap(config.CLASS_VALUES, remapValues, bandName='Map').rename(config.LABEL_BAND).toByte()
+
+    def sample(self, spec):
+        image = self.reference_image(spec)
+        return image.addBands(self.label_image(spec)).stratifiedSample(**{
+            'numPoints': spec.num_points,
+            'classBand': config.LABEL_BAND,
+            'region': ee.Geometry.Rectangle(list(spec.roi)),
+            'scale': 10,
+            'seed': spec.seed,
+            'geometries': True
+        }).randomColumn(seed=spec.seed)
+
+    def train(self, spec):
+        """取樣並訓練，只用一次 getInfo 取回決策樹字串、輸入波段與驗證精度。"""
+        image = self.reference_image(spec)
+        sample = self.sample(spec)
+        classifier = ee.Classifier.smileRandomForest(numberOfTrees=spec.trees, seed=spec.seed).train(**{
+            'features': sample.filter('random <= 0.8'),
+            'classProperty': config.LABEL_BAND,
+            'inputProperties': image.bandNames()
+        })
+        info = ee.Dictionary({
+            'trees': classifier.explain().get('trees'),
+            'bands': image.bandNames(),
+            'accuracy': ee_accuracy(classifier, sample.filter('random > 0.8')),
+        }).getInfo()
+        # 樣本超過 getInfo 的 5000 筆上限，只保存可重現的序列化運算式（固定 seed）
+        return {'trees': info['trees'], 'bands': info['bands'], 'sample': sample.serialize(),
+                'accuracy': info['accuracy']}
+
+    def assess(self, classifier, sample):
+        """舊的 registry 紀錄沒有精度時補算（一次 getInfo）。"""
+        return ee_accuracy(classifier, sample.filter('random > 0.8')).getInfo()
+
+    def build(self, record):
+        classifier = ee.Classifier.decisionTreeEnsemble(record['trees'])
+        sample = ee.FeatureCollection(ee.deserializer.fromJSON(record['sample']))
+        return classifier, sample
+
+
+class FakeClassifierBackend:
+    """離線測試用的假後端，記錄訓練次數以驗證命中、未命中與失效。"""
+
+    def __init__(self):
+        self.train_calls = 0
+
+    def train(self, spec):
+        self.train_calls += 1
+        return {
+            'trees': [f"tree-{spec.seed}-{i}" for i in range(spec.trees)],
+            'bands': ['B1', 'B2', 'B3'],
+            'sample': f"sample:{spec.key()}",
+            'accuracy': self.assess(None, None),
+        }
+
+    def assess(self, classifier, sample):
+        # 與 ee_accuracy 相同的格式：每個類別一列，全部分類正確
+        n = len(config.CLASS_VALUES)
+        matrix = [[1 if i == j else 0 for j in range(n)] for i in range(n)]
+        return {'matrix': matrix, 'overall': 1.0, 'kappa': 1.0, 'f1': [1.0] * n, 'count': n}
+
+    def build(self, record):
+        return tuple(record['trees']), record['sample']
+
+
+class ClassifierService:
+    """依參數鍵快取訓練結果：先查記憶體，再查磁碟 registry 與預先計算的成果，最後才重新訓練。"""
+
+    def __init__(self, registry_dir=None, backend=None, use_artifacts=True):
+        self.registry_dir = registry_dir or os.path.join(config.CACHE_DIR, "classifiers")
+        self.backend = backend or EEClassifierBackend()
+        self.use_artifacts = use_artifacts
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.registry_dir, f"{key}.json")
+
+    def _load_record(self, key):
+        record = read_json(self._path(key))
+        if record is None and self.use_artifacts:
+            record = artifacts.lookup("classifiers", key)
+        if not record or record.get('version') != REGISTRY_VERSION:
+            return None
+        return record
+
+    def get(self, spec=None):
+        spec = spec or default_spec()
+        key = spec.key()
+        with self._lock:
+            trained = self._memory.get(key)
+        if trained is not None:
+            cache_hit("classifier", True)
+            return trained
+        # 訓練與精度評估是長時間的遠端呼叫，不持有服務的鎖（其他參數與記憶體命中不需等待）；
+        # 同一組參數在所有 process 與執行緒中只訓練一次，等待者讀取先完成者的結果
+        with single_flight(f"classifier/{key}"):
+            with self._lock:
+                trained = self._memory.get(key)
+            if trained is not None:
+                cache_hit("classifier", True)
+                return trained
+            record = self._load_record(key)
+            cache_hit("classifier", record is not None)
+            if record is None:
+                with timed("classifier.train"):
+                    record = self.backend.train(spec)
+                record.update({'version': REGISTRY_VERSION, 'key': key,
+                               'spec': asdict(spec), 'created': time.time()})
+                write_json(self._path(key), record)
+            classifier, sample = self.backend.build(record)
+            if 'accuracy' not in record:
+                with timed("classifier.assess"):
+                    record['accuracy'] = self.backend.assess(classifier, sample)
+                write_json(self._path(key), record)
+            trained = TrainedClassifier(key, spec, classifier, sample, record['bands'], record['accuracy'])
+            with self._lock:
+                self._memory[key] = trained
+            return trained
+
+    def invalidate(self, spec=None):
+        """刪除指定參數（預設參數）的訓練結果，下次 get 時重新訓練。"""
+        key = (spec or default_spec()).key()
+        with self._lock:
+            self._memory.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if os.path.isdir(self.registry_dir):
+                for name in os.listdir(self.registry_dir):
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(self.registry_dir, name))
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def default_service():
+    """整個 process 共用的分類器服務，讓不同頁面與 session 共享記憶體快取。"""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = ClassifierService()
+        return _default_service
@@ -0,0 +1,43 @@
+"""各頁面共用的研究區域、資料集與視覺化參數。"""
+import os
+
+# 研究區域與中心點（清境農場周邊）
+ROI_COORDS = [121.116451, 24.020390, 121.21, 24.09]
+POINT_COORDS = [121.1617, 24.0495]
+
+# 影像與標籤資料集
+S2_COLLECTION = "COPERNICUS/S2_HARMONIZED"
+LABEL_DATASET = "ESA/WorldCover/v200/2021"
+LABEL_BAND = "lc"
+
+# 訓練用參考影像（2021 年、雲量 < 20%）
+REFERENCE_START = "2021-01-01"
+REFERENCE_END = "2022-01-01"
+REFERENCE_MAX_CLOUD = 20
+
+# ESA WorldCover 類別 remap 成 0~10
+CLASS_VALUES = [10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 100]
+CLASS_NAMES = [
+    "10 Trees", "20 Shrubland", "30 Grassland", "40 Cropland", "50 Built-up",
+    "60 Bare", "70 Snow and ice", "80 Open water", "90 Herbaceous wetland",
+    "95 Mangroves", "100 Moss and lichen",
+]
+
+# 假彩色紅外影像
+VIS_PARAMS = {'min': 100, 'max': 3500, 'bands': ['B11', 'B8', 'B3']}
+
+# 土地覆蓋視覺化參數
+CLASS_VIS = {
+    'min': 0,
+    'max': 10,
+    'palette': [
+        '006400', 'ffbb22', 'ffff4c', 'f096ff', 'fa0000',
+        'b4b4b4', 'f0f0f0', '0064c8', '0096a0', '00cf75', 'fae6a0'
+    ]
+}
+
+# 本機快取目錄，可用環境變數覆寫
+CACHE_DIR = os.environ.get(
+    "MEOVV_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"),
+)
@@ -0,0 +1,206 @@
+"""
+Earth Engine 呼叫的錄製與重播。
+
+錄製模式包住 ee.data 的 computeValue、getMapId、getInfo、getAlgorithms，把每次呼叫的
+參數雜湊、回應、延遲與大小寫成 JSONL；重播模式以同一份紀錄決定性地回應（可選擇加入
+錄製時的延遲），不需網路與金鑰，方便離線計時、計算往返次數與做回歸測試。
+
+以環境變數啟用（在匯入 core 時安裝）：
+
+    MEOVV_EE_MODE=record   MEOVV_EE_RECORDING=recordings/page3.jsonl  streamlit run app.py
+    MEOVV_EE_MODE=replay   MEOVV_EE_RECORDING=recordings/page3.jsonl  MEOVV_EE_REPLAY_LATENCY=1.0 ...
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+import ee
+from ee import serializer
+
+from core import config
+from core.storage import stable_key
+
+RECORDED_CALLS = ('computeValue', 'getMapId', 'getInfo', 'getAlgorithms')
+
+
+class ReplayMiss(ee.EEException):
+    """重播紀錄中找不到對應的呼叫。"""
+
+
+def _encode(value):
+    if isinstance(value, ee.ComputedObject):
+        return serializer.encode(value, for_cloud_api=True)
+    if isinstance(value, dict):
+        return {str(k): _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def call_key(name, args, kwargs):
+    """呼叫的鍵：函式名稱加上序列化後的參數。"""
+    return stable_key([name, _encode(list(args)), _encode(kwargs)], length=32)
+
+
+def _response_to_json(name, response):
+    if name == 'getMapId':
+        return {'mapid': response['mapid'], 'token': response.get('token', ''),
+                'url_format': response['tile_fetcher'].url_format}
+    return response
+
+
+def _response_from_json(name, payload):
+    if name == 'getMapId':
+        return {'mapid': payload['mapid'], 'token': payload['token'],
+                'tile_fetcher': ee.data.TileFetcher(payload['url_format'], map_name=payload['mapid'])}
+    return payload
+
+
+class CallStats:
+    """每種呼叫的次數、位元組與耗時，供基準測試與儀表使用。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = collections.Counter()
+            self.bytes = collections.Counter()
+            self.seconds = collections.Counter()
+
+    def add(self, name, size, seconds):
+        with self._lock:
+            self.calls[name] += 1
+            self.bytes[name] += size
+            self.seconds[name] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {'calls': self.calls[name], 'bytes': self.bytes[name],
+                           'seconds': round(self.seconds[name], 4)}
+                    for name in self.calls}
+
+
+class _Patcher:
+    def __init__(self):
+        self._originals = {}
+        self.stats = CallStats()
+
+    def _patch(self, name, replacement):
+        self._originals.setdefault(name, getattr(ee.data, name))
+        setattr(ee.data, name, replacement)
+
+    def uninstall(self):
+        for name, original in self._originals.items():
+            setattr(ee.data, name, original)
+        self._originals.clear()
+
+
+class Recorder(_Patcher):
+    """把真實的 Earth Engine 呼叫附加寫入 JSONL 紀錄檔。"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._written = set()
+
+    def install(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        for name in RECORDED_CALLS:
+            self._patch(name, self._wrap(name, getattr(ee.data, name)))
+        return self
+
+    def _wrap(self, name, original):
+        def recorded(*args, **kwargs):
+            key = call_key(name, args, kwargs)
+            t0 = time.perf_counter()
+            response = original(*args, **kwargs)
+            latency = time.perf_counter() - t0
+            body = json.dumps(_response_to_json(name, response), ensure_ascii=False)
+            self.stats.add(name, len(body), latency)
+            # 相同參數、相同回應只寫一次（例如每次初始化都會取得的演算法清單）
+            digest = stable_key([key, body])
+            with self._lock:
+                if digest in self._written:
+                    return response
+                self._written.add(digest)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(f'{{"call": {json.dumps(name)}, "key": "{key}", '
+                            f'"latency": {round(latency, 4)}, "response": {body}}}\n')
+            return response
+        recorded.__wrapped__ = original
+        return recorded
+
+
+class ReplayBackend(_Patcher):
+    """
+    以錄製的紀錄回應 ee.data 呼叫。同一個鍵錄到多次時依序回傳，用完後重複最後一筆。
+    latency_scale 為 0 時立即回應；1.0 則重現錄製時的延遲。
+    """
+
+    def __init__(self, paths, latency_scale=0.0):
+        super().__init__()
+        self.latency_scale = latency_scale
+        self.misses = collections.Counter()
+        self._entries = collections.defaultdict(list)
+        self._cursor = collections.Counter()
+        self._lock = threading.Lock()
+        for path in ([paths] if isinstance(paths, str) else paths):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry['key']].append(entry)
+
+    def install(self):
+        # data.initialize 會下載 discovery 文件；重播時不需要 Cloud API 資源
+        self._patch('_install_cloud_api_resource', lambda: None)
+        for name in RECORDED_CALLS:
+            self._patch(name, self._wrap(name))
+        return self
+
+    def _wrap(self, name):
+        def replayed(*args, **kwargs):
+            key = call_key(name, args, kwargs)
+            with self._lock:
+                entries = self._entries.get(key)
+                if not entries:
+                    self.misses[name] += 1
+                    raise ReplayMiss(f"重播紀錄中沒有此 {name} 呼叫（鍵 {key}）")
+                entry = entries[min(self._cursor[key], len(entries) - 1)]
+                self._cursor[key] += 1
+            delay = entry['latency'] * self.latency_scale
+            if delay:
+                time.sleep(delay)
+            self.stats.add(name, len(json.dumps(entry['response'])), delay)
+            return _response_from_json(name, entry['response'])
+        return replayed
+
+
+_active = None
+
+
+def active():
+    """目前安裝的 Recorder 或 ReplayBackend；未啟用時為 None。"""
+    return _active
+
+
+def install_from_env():
+    """依 MEOVV_EE_MODE（record / replay）安裝；重複呼叫不會重複安裝。"""
+    global _active
+    mode = os.environ.get('MEOVV_EE_MODE')
+    if _active is not None or mode not in ('record', 'replay'):
+        return _active
+    path = os.environ.get('MEOVV_EE_RECORDING', os.path.join(config.CACHE_DIR, 'recordings', 'session.jsonl'))
+    if mode == 'record':
+        _active = Recorder(path).install()
+    else:
+        latency = float(os.environ.get('MEOVV_EE_REPLAY_LATENCY', '0'))
+        _active = ReplayBackend(path.split(os.pathsep), latency_scale=latency).install()
+    return _active
@@ -0,0 +1,57 @@
+"""災害事件目錄（events.toml）的讀取。"""
+import os
+from dataclasses import dataclass, field
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+from core import config
+
+EVENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "events.toml")
+
+EVENT_TYPE_ICONS = {"typhoon": "🌪️", "earthquake": "🌋"}
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    name: str
+    type: str
+    year: int
+    pre: tuple
+    post: tuple
+    roi: tuple = tuple(config.ROI_COORDS)
+    point: tuple = tuple(config.POINT_COORDS)
+    thresholds: dict = field(default_factory=dict, hash=False, compare=False)
+
+    @property
+    def icon(self):
+        return EVENT_TYPE_ICONS.get(self.type, "⚠️")
+
+    def window_label(self, window):
+        start, end = window
+        return f"{start.replace('-', '/')}-{end[5:].replace('-', '/')}"
+
+
+def load_catalog(path=None):
+    """讀取事件目錄，回傳 Event 清單（依檔案中的順序）。"""
+    with open(path or EVENTS_PATH, "rb") as f:
+        data = tomllib.load(f)
+    defaults = data.get("defaults", {})
+    events = []
+    for item in data.get("events", []):
+        thresholds = {**defaults.get("thresholds", {}), **item.get("thresholds", {})}
+        events.append(Event(
+            id=item["id"],
+            name=item["name"],
+            type=item.get("type", "other"),
+            year=int(item["year"]),
+            pre=tuple(item["pre"]),
+            post=tuple(item["post"]),
+            roi=tuple(item.get("roi", defaults.get("roi", config.ROI_COORDS))),
+            point=tuple(item.get("point", defaults.get("point", config.POINT_COORDS))),
+            thresholds=thresholds,
+        ))
+    return events
@@ -0,0 +1,90 @@
+"""
+並行擷取：同時送出多個 Earth Engine 請求（場景查詢、map ID），限制同時數量、
+每個請求各自逾時，並回報部分失敗。頁面等待時間約等於最慢的單一請求。
+"""
+import math
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+
+@dataclass
+class FetchResult:
+    values: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def fetch_all(tasks, max_workers=8, timeout=60, deadline=None):
+    """
+    tasks: {名稱: 無參數的 callable}。
+    每個工作從實際開始執行起算 timeout 秒；逾時或拋出例外的工作記在 errors，其餘照常回傳。
+    deadline 為從呼叫起算的總時限（預設為 timeout 乘以排隊的批次數）；
+    執行中的工作卡住時，排隊中尚未開始的工作到期後也記為逾時，不會無限等待。
+    """
+    result = FetchResult()
+    if not tasks:
+        return result
+    workers = min(max_workers, len(tasks))
+    if deadline is None:
+        deadline = timeout * math.ceil(len(tasks) / workers)
+    started = {}
+
+    def run(name, task):
+        started[name] = time.monotonic()
+        return task()
+
+    t0 = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = {executor.submit(run, name, task): name for name, task in tasks.items()}
+        while pending:
+            done, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result.values[name] = future.result()
+                except Exception as e:
+                    result.errors[name] = e
+            now = time.monotonic()
+            for future, name in list(pending.items()):
+                # 執行緒無法強制中止，只放棄等待其結果
+                if name in started and now - started[name] > timeout:
+                    pending.pop(future)
+                    result.errors[name] = TimeoutError(f"{name} 超過 {timeout} 秒未完成")
+                elif now - t0 > deadline:
+                    pending.pop(future)
+                    future.cancel()
+                    result.errors[name] = TimeoutError(f"{name} 超過總時限 {deadline} 秒未完成")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    result.elapsed = time.monotonic() - t0
+    return result
+
+
+class FakeLatencyBackend:
+    """離線基準測試用：以 sleep 模擬 Earth Engine 延遲的場景查詢與 map ID。"""
+
+    def __init__(self, latency=0.5, jitter=0.2, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _sleep(self):
+        self.calls += 1
+        time.sleep(self.latency + self._random.uniform(0, self.jitter))
+
+    def lookup(self, query):
+        from core.scenes import SceneRecord
+        self._sleep()
+        return SceneRecord(f"FAKE/{query.start_date}", 0.0, 0, tuple(query.roi))
+
+    def tile_url(self, image, vis_params):
+        self._sleep()
+        return f"https://fake.invalid/{image}/{{z}}/{{x}}/{{y}}"
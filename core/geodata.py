@@ -0,0 +1,189 @@
+"""
+向量圖資載入（民宿點位、崩塌範圍）。
+
+1. 專案內附的 zip 直接讀取；沒有時才下載遠端檔案，並以 ETag / If-Modified-Since 重新驗證，
+   下載內容依內容雜湊寫入 .cache/geodata/downloads/<sha256>.zip（原子寫入，多個 session 不會互相覆寫）
+2. 以 zip:// 直接讀取壓縮檔內的 shapefile，不需解壓縮
+3. 轉成 EPSG:4326 後存成 GeoParquet（檔名含來源內容雜湊），之後只需一次欄式讀取
+
+prepare.py 產生的 artifacts/vectors/<名稱>.parquet 優先使用。
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+
+from core import artifacts, config
+from core.instrumentation import cache_hit, timed
+from core.storage import atomic_write_bytes, read_json, stable_key, write_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_BASE_URL = "https://raw.githubusercontent.com/Lwyi2929/MEOVV"
+
+# 遠端來源在這段時間內不重新驗證（秒）
+REVALIDATE_AFTER = 3600
+
+
+@dataclass(frozen=True)
+class GeoSource:
+    name: str
+    filename: str   # 專案內附的檔名
+    url: str        # 沒有內附檔案時的下載網址
+
+
+SOURCES = {
+    "hotels": GeoSource("hotels", "hotel_love.zip", f"{RAW_BASE_URL}/refs/heads/main/hotel_love.zip"),
+    "collapse110": GeoSource(
+        "collapse110", "collapse110.zip",
+        f"{RAW_BASE_URL}/474afe38979b8bf19bf640acce7289ad48d1f786/collapse110.zip",
+    ),
+}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GeoDataLoader:
+    """載入向量圖資並快取成 GeoParquet。"""
+
+    def __init__(self, cache_dir=None, root=ROOT, session=None, use_artifacts=True,
+                 revalidate_after=REVALIDATE_AFTER):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "geodata")
+        self.root = root
+        self.session = session or requests.Session()
+        self.use_artifacts = use_artifacts
+        self.revalidate_after = revalidate_after
+        self._hashes = {}   # (路徑, 大小, mtime) -> sha256
+        self._lock = threading.Lock()
+        self._source_locks = {}
+
+    def _source_lock(self, name):
+        with self._lock:
+            return self._source_locks.setdefault(name, threading.Lock())
+
+    def _content_hash(self, path):
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if signature not in self._hashes:
+            self._hashes[signature] = file_sha256(path)
+        return self._hashes[signature]
+
+    def download(self, url):
+        """
+        下載遠端檔案並回傳 (本機路徑, sha256)。已下載過時以條件式請求重新驗證；
+        網路失敗但先前下載過時沿用舊檔。
+        """
+        meta_path = os.path.join(self.cache_dir, "downloads", f"{stable_key(url)}.json")
+        meta = read_json(meta_path) or {}
+        cached = meta.get("sha256") and os.path.join(self.cache_dir, "downloads", f"{meta['sha256']}.zip")
+        if cached and not os.path.exists(cached):
+            meta, cached = {}, None
+        if cached and time.time() - meta.get("checked_at", 0) < self.revalidate_after:
+            return cached, meta["sha256"]
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            with timed("geodata.download"):
+                response = self.session.get(url, headers=headers, timeout=60)
+            if response.status_code == 304 and cached:
+                meta["checked_at"] = time.time()
+                write_json(meta_path, meta)
+                return cached, meta["sha256"]
+            response.raise_for_status()
+        except requests.RequestException:
+            if cached:
+                return cached, meta["sha256"]
+            raise
+
+        sha = hashlib.sha256(response.content).hexdigest()
+        path = os.path.join(self.cache_dir, "downloads", f"{sha}.zip")
+        if not os.path.exists(path):
+            atomic_write_bytes(path, response.content)
+        write_json(meta_path, {
+            "url": url,
+            "sha256": sha,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked_at": time.time(),
+        })
+        return path, sha
+
+    def resolve(self, source):
+        """回傳 (zip 路徑, sha256)：優先使用專案內附的檔案。"""
+        bundled = os.path.join(self.root, source.filename)
+        if os.path.exists(bundled):
+            return bundled, self._content_hash(bundled)
+        return self.download(source.url)
+
+    def load(self, name):
+        """回傳 EPSG:4326 的 GeoDataFrame。"""
+        import geopandas as gpd
+        source = SOURCES[name]
+        if self.use_artifacts:
+            gdf = artifacts.read_vector(name)
+            if gdf is not None:
+                cache_hit("geodata", True)
+                return gdf
+
+        with self._source_lock(name):
+            zip_path, sha = self.resolve(source)
+            parquet_path = os.path.join(self.cache_dir, f"{name}-{sha[:16]}.parquet")
+            if os.path.exists(parquet_path):
+                cache_hit("geodata", True)
+                return gpd.read_parquet(parquet_path)
+
+            cache_hit("geodata", False)
+            with timed("geodata.read_zip"):
+                gdf = to_wgs84(gpd.read_file(f"zip://{zip_path}"))
+            write_geoparquet(parquet_path, gdf)
+            return gdf
+
+
+def to_wgs84(gdf):
+    # 沒有 .prj 時假設為 WGS84 (EPSG:4326)
+    if gdf.crs is None:
+        return gdf.set_crs("EPSG:4326", allow_override=True)
+    if gdf.crs != "EPSG:4326":
+        return gdf.to_crs("EPSG:4326")
+    return gdf
+
+
+def write_geoparquet(path, gdf):
+    """先寫到同目錄暫存檔再 rename。"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".tmp-{os.getpid()}-{threading.get_ident()}.parquet")
+    try:
+        gdf.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+_default_loader = None
+_default_lock = threading.Lock()
+
+
+def default_loader():
+    global _default_loader
+    with _default_lock:
+        if _default_loader is None:
+            _default_loader = GeoDataLoader()
+        return _default_loader
+
+
+def load_vector(name):
+    return default_loader().load(name)
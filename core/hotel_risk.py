@@ -0,0 +1,195 @@
+"""
+合法民宿與崩塌區、土地覆蓋的空間分析。
+
+- 崩塌鄰近：民宿點位與崩塌多邊形轉成 TWD97 (EPSG:3826，公尺) 後以 shapely STRtree 建索引，
+  一次向量化查詢找出位於崩塌區內或 N 公尺內的民宿，以及到最近崩塌區的距離
+- 土地覆蓋：各年份的分類結果疊成多波段影像，所有民宿點位用一次 sampleRegions 取回；
+  本機模式則以影像的仿射轉換直接查表。結果依 (年份, 分類器鍵, 點位) 快取
+"""
+import os
+import threading
+
+import ee
+import numpy as np
+
+from core import artifacts, config
+from core.instrumentation import cache_hit, timed
+from core.shared_cache import single_flight_many
+from core.storage import read_json, stable_key, write_json
+
+METRIC_CRS = "EPSG:3826"
+POINT_ID = 'hid'
+
+
+def points_key(gdf):
+    """點位座標的雜湊，用於快取鍵。"""
+    return stable_key([[round(p.x, 6), round(p.y, 6)] for p in gdf.geometry])
+
+
+def landslide_proximity(hotels, landslides, distance_m=100):
+    """
+    回傳與 hotels 同順序的 (位於崩塌區內, 在 distance_m 公尺內, 到最近崩塌區的公尺數)。
+    hotels / landslides 為 EPSG:4326 的 GeoDataFrame。
+    """
+    from shapely import STRtree
+    n = len(hotels)
+    if landslides is None or landslides.empty:
+        return np.zeros(n, bool), np.zeros(n, bool), np.full(n, np.nan)
+    points = hotels.to_crs(METRIC_CRS).geometry.values
+    polygons = landslides.to_crs(METRIC_CRS).geometry.values
+    tree = STRtree(polygons)
+    with timed("hotel_risk.strtree"):
+        inside_idx, _ = tree.query(points, predicate="intersects")
+        near_idx, _ = tree.query(points, predicate="dwithin", distance=distance_m)
+        nearest_idx, distances = tree.query_nearest(points, return_distance=True, all_matches=False)
+    inside = np.zeros(n, bool)
+    inside[inside_idx] = True
+    near = np.zeros(n, bool)
+    near[near_idx] = True
+    distance = np.full(n, np.nan)
+    distance[nearest_idx[0]] = distances
+    return inside, near, distance
+
+
+def ee_sample(classified_by_year, lonlats, scale=10):
+    """所有年份、所有點位一次 sampleRegions：{年份: [類別或 None, ...]}。"""
+    years = sorted(classified_by_year)
+    stacked = ee.Image.cat([classified_by_year[y].select(0).rename(str(y)) for y in years])
+    points = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([lon, lat]), {POINT_ID: i}) for i, (lon, lat) in enumerate(lonlats)
+    ])
+    rows = stacked.sampleRegions(collection=points, properties=[POINT_ID], scale=scale, geometries=False)
+    features = rows.reduceColumns(
+        ee.Reducer.toList(len(years) + 1), [POINT_ID] + [str(y) for y in years]
+    ).get('list').getInfo()
+    result = {y: [None] * len(lonlats) for y in years}
+    for row in features:
+        for y, value in zip(years, row[1:]):
+            result[y][int(row[0])] = value
+    return result
+
+
+def local_sample(classes, transform, crs, lonlats, nodata=255):
+    """本機模式：由類別陣列與 GDAL 六參數查出每個點位的類別（範圍外為 None）。"""
+    from pyproj import Transformer
+    xs, ys = Transformer.from_crs("EPSG:4326", crs, always_xy=True).transform(*np.asarray(lonlats).T)
+    x0, dx, _, y0, _, dy = transform
+    cols = np.floor((np.asarray(xs) - x0) / dx).astype(int)
+    rows = np.floor((np.asarray(ys) - y0) / dy).astype(int)
+    height, width = classes.shape
+    valid = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    values = np.full(len(lonlats), nodata, dtype=np.int64)
+    values[valid] = np.asarray(classes)[rows[valid], cols[valid]]
+    return [None if v == nodata else int(v) for v in values]
+
+
+class LandCoverSampler:
+    """民宿點位各年份的土地覆蓋類別，快取在記憶體、磁碟與預先計算的成果。"""
+
+    def __init__(self, cache_dir=None, compute=None, use_artifacts=True):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "hotel_landcover")
+        self.compute = compute or ee_sample
+        self.use_artifacts = use_artifacts
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _key(self, year, classifier_key, points):
+        return stable_key([int(year), classifier_key, points])
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        record = read_json(os.path.join(self.cache_dir, f"{key}.json"))
+        if record is None and self.use_artifacts:
+            record = artifacts.lookup("hotel_landcover", key)
+        if record is not None:
+            with self._lock:
+                self._memory[key] = record
+        return record
+
+    def _store(self, key, values):
+        with self._lock:
+            self._memory[key] = values
+        write_json(os.path.join(self.cache_dir, f"{key}.json"), values)
+
+    def get(self, years, classifier_key, hotels, images):
+        """
+        回傳 {年份: [類別索引或 None, ...]}（與 hotels 同順序）。
+        images(缺少的年份) 回傳 {年份: 已分類的 ee.Image}，只有快取未命中時才會呼叫。
+        """
+        points = points_key(hotels)
+        lonlats = [(p.x, p.y) for p in hotels.geometry]
+        keys = {year: self._key(year, classifier_key, points) for year in years}
+        result = {}
+        for year, key in keys.items():
+            cached = self._lookup(key)
+            cache_hit("hotel_landcover", cached is not None)
+            if cached is not None:
+                result[year] = cached
+        missing = [year for year in years if year not in result]
+        if missing:
+            # 取影像與取樣都不持有鎖；同一個鍵在所有 process 中只計算一次，等待後重新讀取快取
+            with single_flight_many(f"hotel_landcover/{keys[year]}" for year in missing):
+                for year in list(missing):
+                    cached = self._lookup(keys[year])
+                    if cached is not None:
+                        missing.remove(year)
+                        result[year] = cached
+                if missing:
+                    classified = images(missing)
+                    with timed("hotel_landcover.sample"):
+                        sampled = self.compute({y: classified[y] for y in missing if y in classified}, lonlats)
+                    for year, values in sampled.items():
+                        self._store(keys[year], values)
+                        result[year] = values
+        return {year: result[year] for year in years if year in result}
+
+
+def risk_table(hotels, inside, near, distance, landcover):
+    """每家民宿一列：崩塌鄰近與各年份的土地覆蓋類別；依距離排序。"""
+    import pandas as pd
+    frame = pd.DataFrame({
+        '編號': range(1, len(hotels) + 1),
+        '經度': [round(p.x, 6) for p in hotels.geometry],
+        '緯度': [round(p.y, 6) for p in hotels.geometry],
+        '位於崩塌區': inside,
+        '鄰近崩塌區': near,
+        '距崩塌區 (公尺)': np.round(distance, 1),
+    })
+    for year, values in sorted(landcover.items()):
+        frame[f'{year} 土地覆蓋'] = [config.CLASS_NAMES[v] if v is not None else None for v in values]
+    return frame.sort_values('距崩塌區 (公尺)', na_position='last').reset_index(drop=True)
+
+
+def risk_layer(table, name="崩塌區鄰近民宿"):
+    """folium 圖層：位於崩塌區內為紅色，N 公尺內為橘色，其餘不顯示。"""
+    import folium
+    group = folium.FeatureGroup(name=name)
+    for row in table.itertuples(index=False):
+        inside, near = row[3], row[4]
+        if not (inside or near):
+            continue
+        color = 'red' if inside else 'orange'
+        distance = row[5]
+        folium.CircleMarker(
+            location=[row[2], row[1]],
+            radius=7,
+            color=color,
+            fill=True,
+            fill_opacity=0.9,
+            tooltip=f"民宿 {row[0]}：{'位於崩塌區內' if inside else f'距崩塌區 {distance:.0f} 公尺'}",
+        ).add_to(group)
+    return group
+
+
+_default_sampler = None
+_default_lock = threading.Lock()
+
+
+def default_sampler():
+    global _default_sampler
+    with _default_lock:
+        if _default_sampler is None:
+            _default_sampler = LandCoverSampler()
+        return _default_sampler
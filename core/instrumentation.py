@@ -0,0 +1,290 @@
+"""
+熱點計時與快取命中率。
+
+- timed(名稱)：計時 context manager / decorator（ee.Initialize、訓練、map ID、民宿資料、地圖輸出）
+- instrument_ee()：包住 ee.data 的 computeValue / getMapId / getInfo，計算每次呼叫的耗時；
+  除錯模式下另外計算回應大小（需要把回應序列化一次，平常不做）
+- cache_data / cache_resource：st.cache_data / st.cache_resource 的替代品，額外記錄命中與未命中
+
+每次 rerun 結束時呼叫 finish_rerun()：寫一行 log，並輸出 Prometheus 文字格式到
+.cache/metrics.prom（可給 node_exporter 的 textfile collector 讀取）。
+網址加上 ?debug=1 或設定 MEOVV_DEBUG=1 時，在側邊欄顯示除錯面板。
+
+數值為整個 process 的累計；面板與 log 顯示的是本次 rerun 開始後的增量
+（多個 session 同時執行時會混在一起，僅供除錯參考）。
+"""
+import collections
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from core import config
+from core.storage import atomic_write_bytes
+
+logger = logging.getLogger("meovv.metrics")
+
+INSTRUMENTED_EE_CALLS = ('computeValue', 'getMapId', 'getInfo')
+
+
+class Metrics:
+    """process 內共用的計時器、計數器與量測值。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timers = collections.defaultdict(lambda: [0, 0.0, 0.0])  # 次數, 總秒數, 最大秒數
+        self.counters = collections.Counter()
+        self.gauges = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self.timers[name]
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'timers': {k: list(v) for k, v in self.timers.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+            }
+
+
+metrics = Metrics()
+
+
+def diff(after, before):
+    """兩個 snapshot 之間的增量（量測值取最新值）。"""
+    timers = {}
+    for name, (count, total, peak) in after['timers'].items():
+        old = before['timers'].get(name, [0, 0.0, 0.0])
+        if count > old[0]:
+            timers[name] = [count - old[0], total - old[1], peak]
+    counters = {name: value - before['counters'].get(name, 0)
+                for name, value in after['counters'].items()
+                if value != before['counters'].get(name, 0)}
+    return {'timers': timers, 'counters': counters, 'gauges': after['gauges']}
+
+
+class timed:
+    """可當 context manager（with timed('x'):）或 decorator（@timed('x')）使用。"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        metrics.observe(self.name, time.perf_counter() - self._t0)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def cache_hit(cache, hit):
+    metrics.count(f"cache.{cache}.{'hit' if hit else 'miss'}")
+
+
+_ee_lock = threading.Lock()
+_ee_instrumented = False
+# 量測 Earth Engine 回應大小的截止時間；除錯模式的 rerun 開始時延長（並行擷取的執行緒讀不到 query_params）
+_ee_bytes_until = float("inf") if os.environ.get("MEOVV_DEBUG") == "1" else 0.0
+EE_BYTES_WINDOW = 120
+
+
+def _measure_ee_bytes():
+    return time.time() < _ee_bytes_until
+
+
+def instrument_ee():
+    """包住 ee.data 的呼叫（在錄製 / 重播之後安裝，所以也會計入重播的呼叫）。"""
+    global _ee_instrumented
+    with _ee_lock:
+        if _ee_instrumented:
+            return
+        import ee
+        for name in INSTRUMENTED_EE_CALLS:
+            original = getattr(ee.data, name)
+
+            def wrapper(*args, _name=name, _original=original, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    response = _original(*args, **kwargs)
+                finally:
+                    metrics.observe(f"ee.{_name}", time.perf_counter() - t0)
+                if _name != 'getMapId' and _measure_ee_bytes():
+                    metrics.count(f"ee.{_name}.bytes", len(json.dumps(response, default=str)))
+                return response
+
+            wrapper.__wrapped__ = original
+            setattr(ee.data, name, wrapper)
+        _ee_instrumented = True
+
+
+def _ttl_seconds(ttl):
+    if ttl is None:
+        return None
+    if hasattr(ttl, "total_seconds"):
+        return ttl.total_seconds()
+    if isinstance(ttl, (int, float)):
+        return float(ttl)
+    import pandas as pd
+    return pd.Timedelta(ttl).total_seconds()
+
+
+def _counted_cache(decorator, kind, func, kwargs, shared=False):
+    name = f"{kind}.{func.__qualname__}"
+    ttl = _ttl_seconds(kwargs.get("ttl")) if shared else None
+
+    @functools.wraps(func)
+    def body(*args, **kw):
+        # 只有快取未命中時才會執行到這裡
+        metrics.count(f"cache.{name}.miss")
+        store = None
+        if shared:
+            from core import shared_cache
+            store = shared_cache.default_cache()
+        if store is None:
+            return func(*args, **kw)
+        # 其他 process 已算好時直接取用；同時在算時等待它的結果。None 多半代表失敗，不寫入
+        return store.get_or_compute(shared_cache.function_key(func, args, kw), lambda: func(*args, **kw),
+                                    ttl=ttl, store=lambda value: value is not None)
+
+    cached = decorator(**kwargs)(body)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kw):
+        metrics.count(f"cache.{name}.call")
+        return cached(*args, **kw)
+
+    wrapper.clear = cached.clear
+    return wrapper
+
+
+def cache_data(func=None, shared=True, **kwargs):
+    """
+    與 st.cache_data 相同，另外記錄呼叫與未命中次數（命中 = 呼叫 - 未命中）。
+    未命中時再查 core.shared_cache（跨 process 共用，相同的計算只執行一次）；shared=False 時只用 st.cache_data。
+    """
+    import streamlit as st
+    if func is None:
+        return lambda f: _counted_cache(st.cache_data, "data", f, kwargs, shared)
+    return _counted_cache(st.cache_data, "data", func, kwargs, shared)
+
+
+def cache_resource(func=None, **kwargs):
+    """與 st.cache_resource 相同，另外記錄呼叫與未命中次數。"""
+    import streamlit as st
+    if func is None:
+        return lambda f: _counted_cache(st.cache_resource, "resource", f, kwargs)
+    return _counted_cache(st.cache_resource, "resource", func, kwargs)
+
+
+def debug_enabled():
+    if os.environ.get("MEOVV_DEBUG") == "1":
+        return True
+    import streamlit as st
+    try:
+        return st.query_params.get("debug") == "1"
+    except Exception:
+        return False
+
+
+_RERUN_KEY = "_meovv_metrics_start"
+
+
+def begin_rerun():
+    """頁面開頭呼叫：記下本次 rerun 開始時的累計值；除錯模式下開始量測 Earth Engine 回應大小。"""
+    global _ee_bytes_until
+    import streamlit as st
+    instrument_ee()
+    if debug_enabled():
+        _ee_bytes_until = max(_ee_bytes_until, time.time() + EE_BYTES_WINDOW)
+    st.session_state[_RERUN_KEY] = (time.perf_counter(), metrics.snapshot())
+
+
+def _metric_name(name):
+    return "meovv_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text(snapshot=None):
+    """Prometheus 文字格式（累計值）。"""
+    snapshot = snapshot or metrics.snapshot()
+    lines = []
+    for name, (count, total, peak) in sorted(snapshot['timers'].items()):
+        base = _metric_name(name) + "_seconds"
+        lines += [f"{base}_count {count}", f"{base}_sum {total:.6f}", f"{base}_max {peak:.6f}"]
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f"{_metric_name(name)}_total {value}")
+    for name, value in sorted(snapshot['gauges'].items()):
+        lines.append(f"{_metric_name(name)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _cache_rates(counters):
+    rates = {}
+    for name, calls in counters.items():
+        if name.startswith("cache.") and name.endswith(".call"):
+            cache = name[len("cache."):-len(".call")]
+            misses = counters.get(f"cache.{cache}.miss", 0)
+            rates[cache] = (calls - misses, misses)
+        elif name.startswith("cache.") and name.endswith(".hit"):
+            cache = name[len("cache."):-len(".hit")]
+            rates[cache] = (calls, counters.get(f"cache.{cache}.miss", 0))
+    return rates
+
+
+def finish_rerun():
+    """頁面結尾呼叫：寫 log 與 metrics.prom，除錯模式下顯示側邊欄面板。"""
+    import streamlit as st
+    started, before = st.session_state.get(_RERUN_KEY, (time.perf_counter(), metrics.snapshot()))
+    elapsed = time.perf_counter() - started
+    snapshot = metrics.snapshot()
+    delta = diff(snapshot, before)
+
+    logger.info("rerun %.3fs %s", elapsed, json.dumps(delta, ensure_ascii=False))
+    try:
+        atomic_write_bytes(os.path.join(config.CACHE_DIR, "metrics.prom"),
+                           prometheus_text(snapshot).encode("utf-8"))
+    except OSError:
+        pass
+
+    if not debug_enabled():
+        return
+    import pandas as pd
+    with st.sidebar.expander("🛠️ 效能除錯", expanded=True):
+        st.metric("本次 rerun", f"{elapsed:.2f} s")
+        if delta['timers']:
+            st.dataframe(pd.DataFrame(
+                [[name, count, round(total, 3), round(peak, 3)]
+                 for name, (count, total, peak) in sorted(delta['timers'].items(), key=lambda x: -x[1][1])],
+                columns=["呼叫", "次數", "總秒數", "最大秒數"],
+            ), hide_index=True)
+        rates = _cache_rates(snapshot['counters'])
+        if rates:
+            st.dataframe(pd.DataFrame(
+                [[name, hits, misses, f"{hits / max(hits + misses, 1):.0%}"] for name, (hits, misses) in sorted(rates.items())],
+                columns=["快取", "命中", "未命中", "命中率"],
+            ), hide_index=True)
+        html_sizes = {k: v for k, v in snapshot['gauges'].items() if k.startswith("map.html_bytes.")}
+        for name, size in html_sizes.items():
+            st.caption(f"{name[len('map.html_bytes.'):]}：{size / 1024:.0f} KB HTML")
+        st.code(prometheus_text(snapshot), language="text")
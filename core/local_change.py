@@ -0,0 +1,252 @@
+"""
+本機 NumPy 變遷偵測：以 core.raster_store 下載的波段陣列計算 NDVI / NBR / NDWI 差異、
+門檻遮罩與各類別受損面積，不需 Earth Engine。
+
+影像切成 tile_size × tile_size 的圖塊，由執行緒池平行處理（NumPy 運算期間會釋放 GIL），
+每次只有少數圖塊在記憶體中。差異影像依 (災前, 災後) 快取在 .cache/local_change/<鍵>.npy，
+調整門檻或類別時只需重新統計，不必重算差異。
+
+    python -m core.local_change kanu --threshold NDVI=-0.3 --png kanu-ndvi.png
+"""
+import argparse
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from core import config
+from core.change_detection import DIFF_VIS, INDICES
+from core.instrumentation import timed
+from core.storage import stable_key
+
+TILE_SIZE = 512
+# 與 DIFF_VIS 的 ['red', 'white', 'green'] 相同
+PALETTE_RGB = np.array([[255, 0, 0], [255, 255, 255], [0, 128, 0]], dtype=np.float32)
+
+
+def normalized_difference(a, b):
+    """(a - b) / (a + b)，分母為 0 時為 NaN。"""
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    total = a + b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total != 0, (a - b) / total, np.nan).astype(np.float32)
+
+
+def tiles(shape, tile_size=TILE_SIZE):
+    """(列起點, 行起點, 高, 寬) 的圖塊清單。"""
+    height, width = shape
+    return [
+        (row, col, min(tile_size, height - row), min(tile_size, width - col))
+        for row in range(0, height, tile_size)
+        for col in range(0, width, tile_size)
+    ]
+
+
+def colorize(values, vis=DIFF_VIS):
+    """依 vis 的 min/max 把數值線性對應到三色調色盤，NaN 為透明；回傳 RGBA uint8。"""
+    scaled = np.clip((values - vis['min']) / (vis['max'] - vis['min']), 0, 1) * (len(PALETTE_RGB) - 1)
+    scaled = np.nan_to_num(scaled, nan=0.0)
+    low = np.floor(scaled).astype(int).clip(0, len(PALETTE_RGB) - 2)
+    frac = (scaled - low)[..., None]
+    rgb = PALETTE_RGB[low] * (1 - frac) + PALETTE_RGB[low + 1] * frac
+    alpha = np.where(np.isnan(values), 0, 255)[..., None]
+    return np.concatenate([rgb, alpha], axis=-1).astype(np.uint8)
+
+
+@dataclass
+class LocalChange:
+    """一個事件的本機差異影像；stats 為 (指數, 類別) 的受損面積表。"""
+    key: str
+    path: str
+    roi: tuple
+    scale: int
+    stats: pd.DataFrame = None
+
+    def diff(self, index_name):
+        """記憶體映射的差異影像（列, 行）。"""
+        return np.load(self.path, mmap_mode='r')[list(INDICES).index(index_name)]
+
+    def overlay_png(self, index_name, vis=DIFF_VIS):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.fromarray(colorize(np.asarray(self.diff(index_name)), vis), mode='RGBA').save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def overlay_layer(self, index_name, name=None, vis=DIFF_VIS, opacity=0.8):
+        """folium 圖層；影像以 UTM 網格計算，在這個尺度下直接貼在 ROI 的經緯度範圍上。"""
+        import base64
+
+        import folium
+        west, south, east, north = self.roi
+        png = base64.b64encode(self.overlay_png(index_name, vis)).decode()
+        return folium.raster_layers.ImageOverlay(
+            image=f"data:image/png;base64,{png}",
+            bounds=[[south, west], [north, east]],
+            name=name or f"{index_name} 差異（本機）",
+            opacity=opacity,
+        )
+
+    def write_cog(self, path, index_name, transform, crs):
+        """把差異影像寫成單波段 COG（需要 rasterio）。"""
+        from core.raster_store import COG_BLOCKSIZE, _rasterio
+        rasterio = _rasterio()
+        data = np.asarray(self.diff(index_name))
+        with rasterio.open(path, 'w', driver='COG', height=data.shape[0], width=data.shape[1], count=1,
+                           dtype='float32', crs=crs, transform=rasterio.Affine.from_gdal(*transform),
+                           nodata=np.nan, compress='DEFLATE', blocksize=COG_BLOCKSIZE) as dst:
+            dst.write(data, 1)
+
+
+class LocalChangeEngine:
+    """以本機波段陣列計算差異與受損面積。"""
+
+    def __init__(self, cache_dir=None, tile_size=TILE_SIZE, max_workers=None):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "local_change")
+        self.tile_size = tile_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def _map(self, func, items):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def differences(self, pre, post):
+        """pre / post 為 RasterEntry；回傳 LocalChange（差異影像已存在時直接使用）。"""
+        key = stable_key([pre.key, post.key, list(INDICES.items())])
+        path = os.path.join(self.cache_dir, f"{key}.npy")
+        result = LocalChange(key, path, pre.roi, pre.scale)
+        if os.path.exists(path):
+            return result
+
+        # 兩個場景的網格相同，只有邊緣可能差一兩個像素
+        shape = (min(pre.shape[1], post.shape[1]), min(pre.shape[2], post.shape[2]))
+        bands = sorted({b for pair in INDICES.values() for b in pair})
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = os.path.join(self.cache_dir, f".tmp-{key}-{os.getpid()}-{threading.get_ident()}.npy")
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(len(INDICES), *shape))
+
+        def run(window):
+            row, col, height, width = window
+            before = dict(zip(bands, pre.read(bands, window)))
+            after = dict(zip(bands, post.read(bands, window)))
+            for i, (a, b) in enumerate(INDICES.values()):
+                out[i, row:row + height, col:col + width] = (
+                    normalized_difference(after[a], after[b]) - normalized_difference(before[a], before[b])
+                )
+
+        with timed("local_change.differences"):
+            self._map(run, tiles(shape, self.tile_size))
+        out.flush()
+        del out
+        os.replace(tmp_path, path)
+        return result
+
+    def statistics(self, change, thresholds, classes=None, class_names=None):
+        """
+        各指數差異低於門檻的面積（平方公里）。classes 為與差異影像同尺寸的類別陣列
+        （例如本機分類結果），有提供時依類別分列；class_names 為 {類別值: 名稱}。
+        """
+        data = np.load(change.path, mmap_mode='r')
+        shape = data.shape[1:]
+        pixel_km2 = change.scale ** 2 / 1e6
+        n_classes = int(classes.max()) + 1 if classes is not None else 1
+
+        def run(window):
+            row, col, height, width = window
+            counts = np.zeros((len(INDICES), n_classes), dtype=np.int64)
+            labels = (np.asarray(classes[row:row + height, col:col + width]).ravel()
+                      if classes is not None else None)
+            for i, name in enumerate(INDICES):
+                damaged = (np.asarray(data[i, row:row + height, col:col + width]) < thresholds[name]).ravel()
+                if labels is None:
+                    counts[i, 0] = damaged.sum()
+                else:
+                    counts[i] = np.bincount(labels[damaged], minlength=n_classes)
+            return counts
+
+        with timed("local_change.statistics"):
+            counts = sum(self._map(run, tiles(shape, self.tile_size)))
+        rows = []
+        for i, name in enumerate(INDICES):
+            for value in range(n_classes):
+                if classes is not None and not counts[i, value]:
+                    continue
+                label = (class_names or {}).get(value, value) if classes is not None else "全部"
+                rows.append([name, label, thresholds[name], round(counts[i, value] * pixel_km2, 4)])
+        change.stats = pd.DataFrame(rows, columns=['指數', '類別', '門檻', '受損面積 (平方公里)'])
+        return change.stats
+
+    def run(self, pre, post, thresholds, classes=None, class_names=None):
+        change = self.differences(pre, post)
+        self.statistics(change, thresholds, classes, class_names)
+        return change
+
+
+def main(argv=None):
+    import ee
+
+    from core.events import load_catalog
+    from core.raster_store import default_store
+    from core.scenes import find_scene
+    from core.session import ensure_ee
+
+    parser = argparse.ArgumentParser(description="以本機影像計算事件的變遷與受損面積")
+    parser.add_argument("event", help="events.toml 中的事件 ID")
+    parser.add_argument("--threshold", action="append", default=[], metavar="指數=門檻",
+                        help="覆寫門檻，例如 NDVI=-0.3（可重複）")
+    parser.add_argument("--png", help="把差異影像輸出成 PNG")
+    parser.add_argument("--index", default="NDVI", choices=list(INDICES))
+    args = parser.parse_args(argv)
+
+    events = {e.id: e for e in load_catalog()}
+    if args.event not in events:
+        parser.error(f"未知的事件 {args.event!r}；可用的事件：{', '.join(events)}")
+    event = events[args.event]
+    thresholds = dict(event.thresholds)
+    known = set(INDICES) | set(thresholds)
+    for item in args.threshold:
+        name, _, value = item.partition("=")
+        if name not in known:
+            parser.error(f"未知的指數 {name!r}；可用的指數：{', '.join(sorted(known))}")
+        try:
+            thresholds[name] = float(value)
+        except ValueError:
+            parser.error(f"--threshold {item!r} 的門檻不是數字")
+
+    windows = {"災前": event.pre, "災後": event.post}
+    store = default_store()
+
+    def load():
+        scenes = {label: find_scene(event.point, event.roi, *window) for label, window in windows.items()}
+        if None in scenes.values():
+            return scenes, None
+        return scenes, {label: store.get(scene) for label, scene in scenes.items()}
+
+    # 場景查詢與影像都有本機快取；快取沒有時才初始化 Earth Engine
+    try:
+        scenes, entries = load()
+    except ee.EEException:
+        ensure_ee()
+        scenes, entries = load()
+    if entries is None:
+        for label, scene in scenes.items():
+            if scene is None:
+                start, end = windows[label]
+                print(f"{label}期間 {start} ~ {end} 找不到場景")
+        return 1
+    pre_entry, post_entry = entries["災前"], entries["災後"]
+    change = LocalChangeEngine().run(pre_entry, post_entry, thresholds)
+    print(change.stats.to_string(index=False))
+    if args.png:
+        with open(args.png, "wb") as f:
+            f.write(change.overlay_png(args.index))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+本機隨機森林分類。
+
+與 core.classifier 使用相同的 ClassifierSpec：stratifiedSample 的樣本點（含各波段數值）
+只從 Earth Engine 匯出一次，在本機以 scikit-learn 訓練相同樹數與種子的隨機森林，
+再對 core.raster_store 下載的各年份影像逐圖塊預測。樣本、模型與分類結果都存在
+.cache/local_classifier/<分類器鍵>/，面積統計直接由分類結果陣列計算。
+
+需要 scikit-learn（pip install scikit-learn）。
+
+    python -m core.local_classifier --years 2016 2018 2024
+"""
+import argparse
+import io
+import os
+import pickle
+import sys
+import threading
+import time
+
+import numpy as np
+
+from core import config
+from core.classifier import EEClassifierBackend, default_spec
+from core.instrumentation import cache_hit, timed
+from core.session import ensure_ee
+from core.storage import atomic_write_bytes
+
+# 每次預測的列數；一個圖塊約 (TILE_ROWS × 寬) 個像素
+TILE_ROWS = 128
+# 所有波段皆為 0 的像素（ROI 外或無資料）
+NODATA = 255
+
+
+def _sklearn_forest():
+    try:
+        from sklearn.ensemble import RandomForestClassifier
+    except ImportError as e:
+        raise ImportError("本機分類需要 scikit-learn：pip install scikit-learn") from e
+    return RandomForestClassifier
+
+
+def ee_export_samples(spec):
+    """以 CSV 下載 stratifiedSample 的樣本點（getInfo 有 5000 筆上限，10000 點需用下載）。"""
+    import pandas as pd
+    import requests
+
+    backend = EEClassifierBackend()
+    bands = backend.reference_image(spec).bandNames().getInfo()
+    columns = bands + [config.LABEL_BAND, 'random']
+    url = backend.sample(spec).getDownloadURL(filetype='csv', selectors=columns)
+    response = requests.get(url, timeout=300)
+    response.raise_for_status()
+    frame = pd.read_csv(io.BytesIO(response.content))
+    return {
+        'bands': bands,
+        'features': frame[bands].to_numpy(np.float32),
+        'labels': frame[config.LABEL_BAND].to_numpy(np.uint8),
+        'random': frame['random'].to_numpy(np.float64),
+    }
+
+
+def select_bands(samples, bands=None):
+    """回傳 (波段名稱, 樣本特徵)；bands 為 None 時使用所有波段。"""
+    names = [str(b) for b in samples['bands']]
+    if not bands:
+        return names, samples['features']
+    return list(bands), samples['features'][:, [names.index(b) for b in bands]]
+
+
+class LocalClassifier:
+    """一組 ClassifierSpec 的本機樣本、模型與分類結果。"""
+
+    def __init__(self, spec=None, cache_dir=None, export=None, n_jobs=-1, tile_rows=TILE_ROWS):
+        self.spec = spec or default_spec()
+        self.key = self.spec.key()
+        self.directory = os.path.join(cache_dir or os.path.join(config.CACHE_DIR, "local_classifier"), self.key)
+        self.export = export or ee_export_samples
+        self.n_jobs = n_jobs
+        self.tile_rows = tile_rows
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def samples(self):
+        """匯出過的樣本（npz），沒有時向 Earth Engine 匯出一次。"""
+        path = self._path("samples.npz")
+        if not os.path.exists(path):
+            with timed("local_classifier.export"):
+                samples = self.export(self.spec)
+            buffer = io.BytesIO()
+            np.savez(buffer, bands=np.array(samples['bands']), features=samples['features'],
+                     labels=samples['labels'], random=samples['random'])
+            atomic_write_bytes(path, buffer.getvalue())
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    def model(self):
+        """訓練好的隨機森林；與 Earth Engine 相同，以 random <= 0.8 的樣本訓練。"""
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            path = self._path("model.pkl")
+            cache_hit("local_classifier", os.path.exists(path))
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    self._model = pickle.load(f)
+                return self._model
+            samples = self.samples()
+            bands, features = select_bands(samples, self.spec.bands)
+            train = samples['random'] <= 0.8
+            forest = _sklearn_forest()(n_estimators=self.spec.trees, random_state=self.spec.seed, n_jobs=self.n_jobs)
+            with timed("local_classifier.train"):
+                forest.fit(features[train], samples['labels'][train])
+            forest.feature_names = bands
+            atomic_write_bytes(path, pickle.dumps(forest))
+            self._model = forest
+            return forest
+
+    def classify(self, entry):
+        """
+        以 RasterEntry 的波段陣列預測類別索引（0~10，無資料為 NODATA），
+        結果以記憶體映射的 .npy 保存，再次呼叫時直接讀取。
+        """
+        path = self._path(f"{entry.key}.npy")
+        if os.path.exists(path):
+            return np.load(path, mmap_mode='r')
+
+        forest = self.model()
+        bands = forest.feature_names
+        height, width = entry.shape[1:]
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(f".tmp-{entry.key}-{os.getpid()}-{threading.get_ident()}.npy")
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=(height, width))
+        with timed("local_classifier.predict"):
+            for row in range(0, height, self.tile_rows):
+                rows = min(self.tile_rows, height - row)
+                pixels = np.asarray(entry.read(bands, (row, 0, rows, width)), dtype=np.float32)
+                pixels = pixels.reshape(len(bands), -1).T
+                valid = pixels.any(axis=1)
+                labels = np.full(len(pixels), NODATA, dtype=np.uint8)
+                if valid.any():
+                    # 每個圖塊一次向量化預測，樹之間由 n_jobs 平行
+                    labels[valid] = forest.predict(pixels[valid])
+                out[row:row + rows] = labels.reshape(rows, width)
+        out.flush()
+        del out
+        os.replace(tmp_path, path)
+        return np.load(path, mmap_mode='r')
+
+    def area_stats(self, entry):
+        """{類別索引: 平方公里}，與 core.area_stats 的格式相同。"""
+        classes = self.classify(entry)
+        counts = np.zeros(NODATA + 1, dtype=np.int64)
+        for row in range(0, classes.shape[0], self.tile_rows * 8):
+            counts += np.bincount(np.asarray(classes[row:row + self.tile_rows * 8]).ravel(), minlength=NODATA + 1)
+        pixel_km2 = entry.scale ** 2 / 1e6
+        return {index: float(counts[index] * pixel_km2)
+                for index in range(len(config.CLASS_VALUES)) if counts[index]}
+
+
+def main(argv=None):
+    from core.area_stats import to_frame
+    from core.raster_store import default_store, year_scenes
+
+    parser = argparse.ArgumentParser(description="本機隨機森林分類與面積統計")
+    parser.add_argument("--years", type=int, nargs="+", default=[2016, 2018, 2024])
+    args = parser.parse_args(argv)
+
+    ensure_ee()
+    local = LocalClassifier()
+    store = default_store()
+    stats = {}
+    for year, scene in year_scenes(args.years).items():
+        entry = store.get(scene)
+        t0 = time.time()
+        stats[year] = local.area_stats(entry)
+        print(f"{year}: {scene.id}，分類 {time.time() - t0:.1f} 秒")
+    print(to_frame(stats, min_area=0.1).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+圖磚網址（map ID）快取。
+
+以影像運算式的序列化結果與視覺化參數為鍵，保存 getMapId 回傳的 XYZ 網址與到期時間，
+依序查詢記憶體、磁碟（.cache/map_ids，跨 session 與頁面共用）與 prepare.py 的成果目錄。
+剩餘時間少於 REFRESH_BEFORE 時仍回傳目前的網址，並在背景重新取得；
+已到期或不存在時才同步請求，同一個鍵同時只送出一次。
+資料期間涵蓋最近幾天的圖層（例如當年度「雲量最低」的場景會隨新影像改變）另外記錄 tile_ttl，
+圖磚代理依此讓磁碟上的圖磚到期。
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import ee
+
+from core import artifacts, config
+from core.instrumentation import cache_hit, timed
+from core.storage import read_json, stable_key, write_json
+
+# 到期前多久開始背景更新（秒）
+REFRESH_BEFORE = 30 * 60
+# 剩餘時間少於此值時視為已到期，避免把即將失效的網址交給瀏覽器
+MIN_REMAINING = 60
+
+
+def layer_key(image, vis_params):
+    """圖層的鍵：影像運算式序列化後加上視覺化參數。"""
+    return stable_key([ee.Image(image).serialize(), vis_params or {}])
+
+
+def request_map_id(image, vis_params):
+    """向 Earth Engine 取得圖磚網址，回傳 {'url', 'expires_at'}。"""
+    with timed("map_ids.request"):
+        url = ee.Image(image).getMapId(vis_params)['tile_fetcher'].url_format
+    return {'url': url, 'expires_at': time.time() + artifacts.MAP_ID_TTL}
+
+
+class MapIdCache:
+    """圖磚網址的記憶體 + 磁碟快取，接近到期時背景更新。"""
+
+    def __init__(self, cache_dir=None, request=None, use_artifacts=True,
+                 refresh_before=REFRESH_BEFORE, max_workers=2):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "map_ids")
+        self.request = request or request_map_id
+        self.use_artifacts = use_artifacts
+        self.refresh_before = refresh_before
+        self._memory = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        # key -> [threading.Lock, 持有或等待中的數量]；最後一個離開時移除
+        self._key_locks = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="map-id-refresh")
+
+    @contextmanager
+    def _key_lock(self, key):
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def _lookup(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            entry = read_json(os.path.join(self.cache_dir, f"{key}.json"))
+            if entry is None and self.use_artifacts:
+                entry = artifacts.lookup("map_ids", key)
+            if entry is not None:
+                self._memory[key] = entry
+        return entry
+
+    def _store(self, key, entry):
+        self._memory[key] = entry
+        write_json(os.path.join(self.cache_dir, f"{key}.json"), entry)
+
+    def _fetch(self, key, image, vis_params, tile_ttl=None):
+        entry = self.request(image, vis_params)
+        stored = {'url': entry['url'], 'expires_at': entry['expires_at']}
+        if tile_ttl:
+            stored['tile_ttl'] = tile_ttl
+        self._store(key, stored)
+        return entry
+
+    def _refresh(self, key, image, vis_params, tile_ttl=None):
+        try:
+            self._fetch(key, image, vis_params, tile_ttl)
+        except Exception:
+            # 背景更新失敗時保留舊網址，到期後由同步請求重試
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key, image, vis_params, tile_ttl=None):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, image, vis_params, tile_ttl)
+
+    def url(self, image, vis_params, key=None, tile_ttl=None):
+        """
+        圖層的 XYZ 圖磚網址；key 為已算好的 layer_key。
+        tile_ttl 為圖磚代理保留此圖層圖磚的秒數（None 表示內容不會改變）。
+        """
+        key = key or layer_key(image, vis_params)
+        with self._key_lock(key):
+            entry = self._lookup(key)
+            remaining = entry['expires_at'] - time.time() if entry else 0
+            cache_hit("map_ids", remaining > MIN_REMAINING)
+            if remaining <= MIN_REMAINING:
+                return self._fetch(key, image, vis_params, tile_ttl)['url']
+            if entry.get('tile_ttl') != tile_ttl:
+                # 例如成果目錄的紀錄產生於年底前：補上（或移除）圖磚到期時間
+                entry = {'url': entry['url'], 'expires_at': entry['expires_at']}
+                if tile_ttl:
+                    entry['tile_ttl'] = tile_ttl
+                self._store(key, entry)
+        if remaining < self.refresh_before:
+            self._schedule_refresh(key, image, vis_params, tile_ttl)
+        return entry['url']
+
+    def cached(self, key):
+        """只查快取、不送出請求：未到期的網址，或 None（給圖磚代理使用）。"""
+        entry = self._lookup(key)
+        if entry and entry['expires_at'] - time.time() <= MIN_REMAINING:
+            # 其他 process 可能已更新磁碟上的紀錄
+            self._memory.pop(key, None)
+            entry = self._lookup(key)
+        if entry and entry['expires_at'] - time.time() > MIN_REMAINING:
+            return entry['url']
+        return None
+
+    def tile_ttl(self, key):
+        """圖層圖磚的保留秒數；None 表示不會到期。"""
+        entry = self._lookup(key)
+        return entry.get('tile_ttl') if entry else None
+
+    def keys(self):
+        """磁碟快取與成果目錄中所有圖層的鍵。"""
+        keys = set()
+        directories = [self.cache_dir]
+        if self.use_artifacts and artifacts.current_dir():
+            directories.append(os.path.join(artifacts.current_dir(), "map_ids"))
+        for directory in directories:
+            if os.path.isdir(directory):
+                keys.update(name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json"))
+        return sorted(keys)
+
+    def invalidate(self, image, vis_params):
+        key = layer_key(image, vis_params)
+        self._memory.pop(key, None)
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        if os.path.exists(path):
+            os.remove(path)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = MapIdCache()
+        return _default_cache
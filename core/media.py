@@ -0,0 +1,208 @@
+"""
+首頁與頁面的圖片、影片。
+
+Streamlit 開啟靜態檔服務（.streamlit/config.toml 的 server.enableStaticServing）後，
+static/ 底下的檔案以 app/static/<路徑> 直接提供，支援 HTTP Range，不經過 Python 記憶體：
+
+- 影片連結（硬連結，不支援時複製）到 static/media/，頁面只送出 <video preload="metadata">，
+  瀏覽器展開時才以 Range 分段下載
+- 圖片預先產生數種寬度的 AVIF / WebP（檔名含原檔雜湊，原檔改變時自動重建），
+  頁面以 <picture> 的 srcset 讓瀏覽器挑選合適的大小
+
+未開啟靜態檔服務時退回 st.image / st.video 讀取原檔。
+
+    python -m core.media build      # 預先產生所有圖片版本與影片連結
+"""
+import argparse
+import hashlib
+import html
+import io
+import os
+import shutil
+import sys
+import threading
+from urllib.parse import quote
+
+from core.instrumentation import cache_hit, timed
+from core.storage import atomic_write_bytes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT, "static")
+MEDIA_DIR = os.path.join(STATIC_DIR, "media")
+
+IMAGES = ("sheep.png", "tourists.png")
+VIDEOS = ("qingjing_true (1).mp4", "false_qingjing.mp4")
+IMAGE_WIDTHS = (640, 1280, 1920)
+# 依偏好順序；Pillow 不支援的格式會略過
+IMAGE_FORMATS = ("avif", "webp")
+IMAGE_QUALITY = {"avif": 60, "webp": 80}
+
+_lock = threading.Lock()
+_variants = {}
+
+
+def static_enabled():
+    import streamlit as st
+    try:
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+
+def static_url(path):
+    """static/ 底下檔案的相對網址（與頁面同一個 base path）。"""
+    return "app/static/" + quote(os.path.relpath(path, STATIC_DIR).replace(os.sep, "/"))
+
+
+def source_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def supported_formats(formats=IMAGE_FORMATS):
+    from PIL import features
+    return [fmt for fmt in formats if features.check(fmt)]
+
+
+def image_variants(source, widths=IMAGE_WIDTHS, formats=IMAGE_FORMATS, media_dir=None):
+    """
+    產生（或沿用）圖片的各寬度版本，回傳 {格式: [(寬度, 路徑), ...]}（寬度由小到大）。
+    超過（或接近）原圖寬度的版本只保留一個原寬度的版本。
+    """
+    from PIL import Image
+
+    media_dir = media_dir or MEDIA_DIR
+    source = os.path.join(ROOT, source) if not os.path.isabs(source) else source
+    stem = os.path.splitext(os.path.basename(source))[0]
+    digest = source_digest(source)
+    result = {}
+    with Image.open(source) as original:
+        full_width = original.width
+        sizes = sorted({width for width in widths if width < full_width * 0.9} | {min(max(widths), full_width)})
+        for fmt in supported_formats(formats):
+            result[fmt] = []
+            for width in sizes:
+                path = os.path.join(media_dir, f"{stem}-{digest}-{width}.{fmt}")
+                if not os.path.exists(path):
+                    height = round(original.height * width / full_width)
+                    resized = original if width == full_width else original.resize((width, height), Image.LANCZOS)
+                    buffer = io.BytesIO()
+                    resized.save(buffer, fmt.upper(), quality=IMAGE_QUALITY[fmt])
+                    atomic_write_bytes(path, buffer.getvalue())
+                result[fmt].append((width, path))
+    return result
+
+
+def link_video(source, media_dir=None):
+    """把影片放到 static/media/（硬連結，跨檔案系統時複製），回傳路徑；原檔不存在時回傳 None。"""
+    media_dir = media_dir or MEDIA_DIR
+    source = os.path.join(ROOT, source) if not os.path.isabs(source) else source
+    if not os.path.exists(source):
+        return None
+    path = os.path.join(media_dir, os.path.basename(source))
+    if os.path.exists(path) and os.path.getsize(path) == os.path.getsize(source) \
+            and os.path.getmtime(path) >= os.path.getmtime(source):
+        return path
+    os.makedirs(media_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _cached_variants(source):
+    """同一個行程內每張圖片只檢查一次版本。"""
+    with _lock:
+        cached = source in _variants
+        cache_hit("media", cached)
+        if not cached:
+            with timed("media.variants"):
+                _variants[source] = image_variants(source)
+        return _variants[source]
+
+
+def picture_html(variants, caption=None, alt=""):
+    """<picture>：各格式一個 <source srcset>，最後以最大的版本作為 <img>。"""
+    sources = "".join(
+        f'<source type="image/{fmt}" sizes="100vw" srcset="'
+        + ", ".join(f"{static_url(path)} {width}w" for width, path in sizes)
+        + '">'
+        for fmt, sizes in variants.items()
+    )
+    fallback_fmt = list(variants)[-1]
+    width, path = variants[fallback_fmt][-1]
+    figcaption = (f'<figcaption style="text-align:center;opacity:0.6;font-size:0.9em">'
+                  f'{html.escape(caption)}</figcaption>') if caption else ""
+    return (f'<figure style="margin:0"><picture>{sources}'
+            f'<img src="{static_url(path)}" alt="{html.escape(alt or caption or "")}" '
+            f'style="width:100%;height:auto" decoding="async"></picture>{figcaption}</figure>')
+
+
+def image(source, caption=None):
+    """以靜態檔的 AVIF / WebP 版本顯示圖片；無法使用時退回 st.image。"""
+    import streamlit as st
+    if static_enabled():
+        try:
+            variants = _cached_variants(source)
+        except Exception:
+            variants = None
+        if variants:
+            st.html(picture_html(variants, caption))
+            return
+    st.image(source, caption=caption, use_container_width=True)
+
+
+def video(source):
+    """以靜態檔網址播放影片（瀏覽器以 Range 分段下載）；無法使用時退回 st.video。"""
+    import streamlit as st
+    path = link_video(source) if static_enabled() else None
+    if path:
+        st.html(f'<video controls preload="metadata" style="width:100%" '
+                f'src="{static_url(path)}" type="video/mp4"></video>')
+        return
+    if not os.path.exists(os.path.join(ROOT, source)):
+        st.warning(f"找不到影片 {source}")
+        return
+    st.video(os.path.join(ROOT, source))
+
+
+def build(images=IMAGES, videos=VIDEOS):
+    """預先產生所有圖片版本與影片連結，回傳 [(原檔, 原始位元組, {版本路徑: 位元組})]。"""
+    report = []
+    for source in images:
+        variants = image_variants(source)
+        sizes = {path: os.path.getsize(path) for versions in variants.values() for _, path in versions}
+        report.append((source, os.path.getsize(os.path.join(ROOT, source)), sizes))
+    for source in videos:
+        path = link_video(source)
+        if path is None:
+            report.append((source, None, {}))
+        else:
+            report.append((source, os.path.getsize(path), {path: os.path.getsize(path)}))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="產生靜態圖片版本與影片連結")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="產生 static/media/")
+    parser.parse_args(argv)
+
+    for source, size, outputs in build():
+        if size is None:
+            print(f"{source}: 找不到原檔，略過")
+            continue
+        print(f"{source}: {size:,} bytes")
+        for path, out_size in outputs.items():
+            print(f"  {os.path.relpath(path, ROOT)}  {out_size:,} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+多年度 Sentinel-2 選圖與分類流程。
+
+年份清單以 ee.List 傳到伺服器端，在伺服器上對每個年份挑選雲量最低的影像並分類；
+所有年份的影像資訊只用一次請求取回，各圖層的 map ID 則同時送出，
+增加年份不會讓頁面多出一串依序阻塞的呼叫。
+"""
+from dataclasses import dataclass, field
+
+import ee
+
+from core import config, tile_proxy
+from core.fetch import fetch_all
+from core.instrumentation import timed
+from core.map_ids import default_cache, layer_key
+
+# source_id 是原始場景的資產 ID；fromImages 之後的 system:index 只是集合內的序號，不能用來找回場景
+META_FIELDS = ['year', 'source_id', 'CLOUDY_PIXEL_PERCENTAGE', 'system:time_start']
+
+
+def year_collection(years, point_coords=None, roi_coords=None, collection=None):
+    """在伺服器端對每個年份挑選雲量最低的影像；沒有影像的年份會被略過。"""
+    point = ee.Geometry.Point(point_coords or config.POINT_COORDS)
+    roi = ee.Geometry.Rectangle(roi_coords or config.ROI_COORDS)
+    collection = collection or config.S2_COLLECTION
+
+    def select(year):
+        year = ee.Number(year)
+        start = ee.Date.fromYMD(year, 1, 1)
+        candidates = (
+            ee.ImageCollection(collection)
+            .filterBounds(point)
+            .filterDate(start, start.advance(1, 'year'))
+        )
+        best = ee.Image(candidates.sort('CLOUDY_PIXEL_PERCENTAGE').first())
+        return ee.Algorithms.If(
+            candidates.size().gt(0),
+            best.set('source_id', best.get('system:id')).clip(roi).select('B.*').set('year', year),
+            None,
+        )
+
+    return ee.ImageCollection.fromImages(ee.List([int(y) for y in years]).map(select, dropNulls=True))
+
+
+def year_end(year):
+    """year_collection 選圖期間的結束日（不含）。"""
+    return f"{int(year) + 1}-01-01"
+
+
+def fetch_metadata(images):
+    """一次請求取回所有年份的影像資產 ID、雲量與日期：{年份: {...}}。"""
+    rows = images.reduceColumns(ee.Reducer.toList(len(META_FIELDS)), META_FIELDS).get('list').getInfo()
+    return {
+        int(year): {'id': source_id, 'cloud': cloud, 'time_start': time_start}
+        for year, source_id, cloud, time_start in rows
+    }
+
+
+def tile_url(image, vis_params, data_end=None):
+    """
+    圖層的 XYZ 圖磚網址（經過跨 session 共用、會背景更新的 map ID 快取）。
+    設定 MEOVV_TILE_PROXY 時改回傳本機圖磚代理的網址。
+    data_end 為影像資料期間的結束日；期間涵蓋最近幾天時，代理快取的圖磚會到期（見 core.tile_proxy.tile_ttl）。
+    """
+    key = layer_key(image, vis_params)
+    url = default_cache().url(image, vis_params, key=key, tile_ttl=tile_proxy.tile_ttl(data_end))
+    if tile_proxy.TILE_PROXY:
+        return tile_proxy.proxied_url(key)
+    return url
+
+
+def tile_urls(layers, max_workers=8, data_end=None):
+    """
+    同時取得多個圖層的圖磚網址。layers: {名稱: (ee.Image, vis_params)}；data_end: {名稱: 資料期間結束日}。
+    回傳 FetchResult：values 為成功取得的網址，errors 為失敗的圖層，失敗不影響其他圖層。
+    """
+    data_end = data_end or {}
+    return fetch_all({
+        name: (lambda image=image, vis=vis, end=data_end.get(name): tile_url(image, vis, end))
+        for name, (image, vis) in layers.items()
+    }, max_workers=max_workers)
+
+
+def tile_layer(url, name, shown=True, opacity=1.0):
+    """用已取得的圖磚網址建立 folium 圖層（與 geemap.ee_tile_layer 相同設定，但不再送出請求）。"""
+    # folium 連帶匯入 pandas，只在建立地圖時才需要
+    import folium
+    return folium.raster_layers.TileLayer(
+        tiles=url,
+        attr="Google Earth Engine",
+        name=name,
+        overlay=True,
+        control=True,
+        show=shown,
+        opacity=opacity,
+        max_zoom=24,
+    )
+
+
+@dataclass
+class YearlyClassification:
+    """
+    多年度流程的結果；images / classified 為 ee.Image，urls 以 (年份, 'image' | 'classified') 為鍵。
+    取得失敗的圖層不在 urls 中，錯誤記在 url_errors。
+    """
+    years: list
+    metadata: dict
+    images: dict = field(default_factory=dict)
+    classified: dict = field(default_factory=dict)
+    urls: dict = field(default_factory=dict)
+    url_errors: dict = field(default_factory=dict)
+
+
+def classify_years(years, classifier, vis_params=None, class_vis=None, with_tiles=True, metadata=None):
+    """
+    挑選並分類每個年份的影像；取回影像資訊（一次請求）與所有圖層的圖磚網址（並行）。
+    metadata 為先前 fetch_metadata 取回的結果時不再送出影像資訊的請求。
+    """
+    vis_params = vis_params or config.VIS_PARAMS
+    class_vis = class_vis or config.CLASS_VIS
+    if metadata is None:
+        with timed("pipeline.metadata"):
+            metadata = fetch_metadata(year_collection(years))
+    result = YearlyClassification([y for y in years if int(y) in metadata], metadata)
+    for year in result.years:
+        # 單一年份的運算式與所選年份清單無關，圖磚網址可跨頁面、跨選擇共用
+        image = ee.Image(year_collection([year]).first())
+        result.images[year] = image
+        result.classified[year] = image.classify(classifier)
+    if with_tiles:
+        layers = {}
+        data_end = {}
+        for year in result.years:
+            layers[(year, 'image')] = (result.images[year], vis_params)
+            layers[(year, 'classified')] = (result.classified[year], class_vis)
+            # 當年度的「雲量最低」場景會隨新影像改變
+            data_end[(year, 'image')] = data_end[(year, 'classified')] = year_end(year)
+        fetched = tile_urls(layers, data_end=data_end)
+        result.urls, result.url_errors = fetched.values, fetched.errors
+    return result
+
+
+def roi_center(roi_coords=None):
+    """ROI 中心點 (lon, lat)，用 set_center 定位地圖時不需 centerObject 的 getInfo。"""
+    west, south, east, north = roi_coords or config.ROI_COORDS
+    return (west + east) / 2, (south + north) / 2
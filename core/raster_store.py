@@ -0,0 +1,271 @@
+"""
+本機影像庫：把頁面用到的 Sentinel-2 場景（ROI 範圍內的所有波段）下載成本機檔案，
+之後的像素運算不需再向 Earth Engine 請求。
+
+每個 (場景 ID, ROI, 解析度, 波段) 只下載一次，存成兩份：
+
+    .cache/rasters/<鍵>.tif   Cloud-Optimized GeoTIFF（256 圖塊、deflate、含縮圖層），給 GIS 工具與縮圖讀取
+    .cache/rasters/<鍵>.npy   (波段, 列, 行) 的未壓縮陣列，以 np.load(mmap_mode='r') 做記憶體映射的視窗讀取
+    .cache/rasters/index.json 以場景 ID 與日期查詢的索引
+
+下載與轉檔需要 rasterio（pip install rasterio）；讀取 .npy 只需要 NumPy。
+
+    python -m core.raster_store pull              # 下載第 1 頁事件與第 3 頁各年份的場景
+    python -m core.raster_store list
+"""
+import argparse
+import datetime
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import requests
+
+from core import config
+from core.instrumentation import cache_hit, timed
+from core.session import ensure_ee
+from core.shared_cache import single_flight
+from core.storage import atomic_write_bytes, read_json, stable_key, write_json
+
+# 台灣位於 UTM 51N；以公尺為單位的投影才能得到正方形的 10 公尺像素
+STORE_CRS = "EPSG:32651"
+STORE_SCALE = 10
+STORE_BANDS = ('B1', 'B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B8A', 'B9', 'B10', 'B11', 'B12')
+COG_BLOCKSIZE = 256
+
+
+def _rasterio():
+    try:
+        import rasterio
+    except ImportError as e:
+        raise ImportError("下載與轉檔需要 rasterio：pip install rasterio") from e
+    return rasterio
+
+
+@dataclass(frozen=True)
+class RasterEntry:
+    """影像庫中的一個場景；transform 為 GDAL 六參數。"""
+    key: str
+    scene_id: str
+    date: str
+    roi: tuple
+    scale: int
+    crs: str
+    bands: tuple
+    shape: tuple
+    transform: tuple
+    cog: str
+    array: str
+
+    def band_index(self, bands):
+        return [self.bands.index(b) for b in bands]
+
+    def read(self, bands=None, window=None):
+        """
+        記憶體映射的讀取（不會整個載入記憶體）。
+        window 為 (列起點, 行起點, 高, 寬)；回傳 (波段, 高, 寬) 的陣列視圖。
+        """
+        data = np.load(self.array, mmap_mode='r')
+        if window is not None:
+            row, col, height, width = window
+            data = data[:, row:row + height, col:col + width]
+        if bands is not None:
+            data = data[self.band_index(bands)]
+        return data
+
+    def read_overview(self, bands=None, factor=4):
+        """由 COG 的縮圖層讀取縮小 factor 倍的影像（需要 rasterio）。"""
+        rasterio = _rasterio()
+        from rasterio.enums import Resampling
+        indexes = [i + 1 for i in self.band_index(bands or self.bands)]
+        with rasterio.open(self.cog) as src:
+            return src.read(
+                indexes,
+                out_shape=(len(indexes), src.height // factor, src.width // factor),
+                resampling=Resampling.average,
+            )
+
+
+def ee_download(scene_id, roi_coords, bands, scale, crs):
+    """以 getDownloadURL 取得 ROI 範圍的多波段 GeoTIFF 位元組。"""
+    import ee
+    url = ee.Image(scene_id).select(list(bands)).getDownloadURL({
+        'region': ee.Geometry.Rectangle(list(roi_coords)),
+        'scale': scale,
+        'crs': crs,
+        'format': 'GEO_TIFF',
+        'filePerBand': False,
+    })
+    response = requests.get(url, timeout=300)
+    response.raise_for_status()
+    return response.content
+
+
+class RasterStore:
+    """場景影像的本機儲存與索引；download(scene_id, roi, bands, scale, crs) 回傳 GeoTIFF 位元組。"""
+
+    def __init__(self, root=None, download=None):
+        self.root = root or os.path.join(config.CACHE_DIR, "rasters")
+        self.download = download or ee_download
+
+    @property
+    def index_path(self):
+        return os.path.join(self.root, "index.json")
+
+    def _index(self):
+        return read_json(self.index_path) or {}
+
+    def _entry(self, record):
+        record = dict(record)
+        for name in ('roi', 'bands', 'shape', 'transform'):
+            record[name] = tuple(record[name])
+        return RasterEntry(**record)
+
+    def entries(self):
+        return [self._entry(record) for record in self._index().values()]
+
+    def find(self, scene_id=None, date=None):
+        """以場景 ID 或日期（YYYY-MM-DD）查詢已下載的場景。"""
+        return [
+            entry for entry in self.entries()
+            if (scene_id is None or entry.scene_id == scene_id) and (date is None or entry.date == date)
+        ]
+
+    def get(self, scene, bands=STORE_BANDS, scale=STORE_SCALE, crs=STORE_CRS):
+        """
+        scene 為 core.scenes.SceneRecord；回傳 RasterEntry，沒有時下載並轉檔。
+        同一場景在所有 process 中只下載一次（single_flight）；index.json 的讀取、修改、寫回
+        以 single_flight("rasters/index") 排隊，不同場景同時完成時不會互相覆蓋索引。
+        """
+        bands = tuple(bands)
+        key = stable_key([scene.id, list(scene.roi), scale, crs, list(bands)])
+        with single_flight(f"rasters/{key}"):
+            record = self._index().get(key)
+            if record and os.path.exists(record['array']) and os.path.exists(record['cog']):
+                cache_hit("rasters", True)
+                return self._entry(record)
+            cache_hit("rasters", False)
+            with timed("rasters.download"):
+                data = self.download(scene.id, scene.roi, bands, scale, crs)
+            with timed("rasters.convert"):
+                entry = self._ingest(key, scene, bands, scale, crs, data)
+            with single_flight("rasters/index"):
+                index = self._index()
+                index[key] = asdict(entry)
+                write_json(self.index_path, index)
+            return entry
+
+    def _ingest(self, key, scene, bands, scale, crs, data):
+        rasterio = _rasterio()
+        from rasterio.shutil import copy as copy_raster
+        os.makedirs(self.root, exist_ok=True)
+        suffix = f"{os.getpid()}-{threading.get_ident()}"
+        raw_path = os.path.join(self.root, f".tmp-{key}-{suffix}.tif")
+        cog_path = os.path.join(self.root, f"{key}.tif")
+        npy_path = os.path.join(self.root, f"{key}.npy")
+        atomic_write_bytes(raw_path, data)
+        try:
+            with rasterio.open(raw_path) as src:
+                shape = (src.count, src.height, src.width)
+                transform = tuple(src.transform.to_gdal())
+                # 未壓縮的 .npy 供記憶體映射讀取
+                tmp_npy = os.path.join(self.root, f".tmp-{key}-{suffix}.npy")
+                array = np.lib.format.open_memmap(tmp_npy, mode='w+', dtype=src.dtypes[0], shape=shape)
+                for _, window in src.block_windows(1):
+                    array[:, window.row_off:window.row_off + window.height,
+                          window.col_off:window.col_off + window.width] = src.read(window=window)
+                array.flush()
+                del array
+                os.replace(tmp_npy, npy_path)
+
+            tmp_cog = os.path.join(self.root, f".tmp-{key}-{suffix}.cog.tif")
+            copy_raster(raw_path, tmp_cog, driver="COG", compress="DEFLATE",
+                        blocksize=COG_BLOCKSIZE, overview_resampling="AVERAGE")
+            os.replace(tmp_cog, cog_path)
+        finally:
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+
+        date = datetime.datetime.fromtimestamp(scene.time_start / 1000, datetime.timezone.utc).strftime('%Y-%m-%d')
+        return RasterEntry(
+            key=key, scene_id=scene.id, date=date, roi=tuple(scene.roi), scale=scale, crs=crs,
+            bands=bands, shape=shape, transform=transform, cog=cog_path, array=npy_path,
+        )
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = RasterStore()
+        return _default_store
+
+
+def event_scenes():
+    """第 1 頁各事件的災前、災後場景。"""
+    from core.events import load_catalog
+    from core.scenes import find_scene
+
+    scenes = []
+    for event in load_catalog():
+        for window in (event.pre, event.post):
+            scene = find_scene(event.point, event.roi, *window)
+            if scene:
+                scenes.append(scene)
+    return scenes
+
+
+def year_scenes(years):
+    """第 3 頁各年份選出的場景：{年份: SceneRecord}（與 core.pipeline.year_collection 的選圖相同）。"""
+    from core.pipeline import fetch_metadata, year_collection
+    from core.scenes import SceneRecord
+
+    return {
+        year: SceneRecord(meta['id'], meta['cloud'],
+                          meta['time_start'], tuple(config.ROI_COORDS))
+        for year, meta in sorted(fetch_metadata(year_collection(years)).items())
+    }
+
+
+def page_scenes(years):
+    """頁面場景查詢選出的場景：第 1 頁各事件的災前災後，與第 3 頁各年份的影像。"""
+    return event_scenes() + list(year_scenes(years).values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本機 Sentinel-2 影像庫")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pull = sub.add_parser("pull", help="下載頁面用到的場景")
+    pull.add_argument("--years", type=int, nargs="+", default=list(range(2016, 2026)))
+    sub.add_parser("list", help="列出已下載的場景")
+    args = parser.parse_args(argv)
+
+    store = default_store()
+    if args.command == "list":
+        for entry in sorted(store.entries(), key=lambda e: e.date):
+            print(f"{entry.date}  {entry.scene_id}  {entry.shape}  {entry.cog}")
+        return 0
+
+    ensure_ee()
+    t0 = time.time()
+    failed = 0
+    for scene in page_scenes(args.years):
+        try:
+            entry = store.get(scene)
+            print(f"{entry.date}  {scene.id}  {entry.shape}")
+        except Exception as e:
+            failed += 1
+            print(f"失敗 {scene.id}: {e}")
+    print(f"完成，{time.time() - t0:.1f} 秒")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Sentinel-2 場景查詢。
+
+把 (中心點, ROI, 日期區間, 雲量條件) 解析成單純的場景 ID 與少數屬性，只送出一次輕量查詢；
+快取中只保存可序列化的紀錄（先記憶體、再磁碟，附 TTL），需要時再由 ID 重建 ee.Image。
+"""
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import ee
+
+from core import artifacts, config
+from core.instrumentation import cache_hit, timed
+from core.shared_cache import single_flight
+from core.storage import read_json, stable_key, write_json
+
+SCENE_FIELDS = ['system:id', 'CLOUDY_PIXEL_PERCENTAGE', 'system:time_start']
+
+
+@dataclass(frozen=True)
+class SceneQuery:
+    point: tuple
+    roi: tuple
+    start_date: str
+    end_date: str
+    max_cloud: float = None
+    collection: str = config.S2_COLLECTION
+
+    def key(self):
+        return stable_key(asdict(self))
+
+
+@dataclass(frozen=True)
+class SceneRecord:
+    """雲量最低的場景；可安全放進 st.cache_data 或寫入磁碟。"""
+    id: str
+    cloud: float
+    time_start: int
+    roi: tuple
+
+    def to_image(self):
+        return ee.Image(self.id).clip(ee.Geometry.Rectangle(list(self.roi))).select('B.*')
+
+
+def ee_lookup(query):
+    """只取回一筆場景的 ID、雲量與時間；找不到時回傳 None。"""
+    collection = (
+        ee.ImageCollection(query.collection)
+        .filterBounds(ee.Geometry.Point(list(query.point)))
+        .filterDate(query.start_date, query.end_date)
+    )
+    if query.max_cloud is not None:
+        collection = collection.filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', query.max_cloud))
+    rows = (
+        collection.limit(1, 'CLOUDY_PIXEL_PERCENTAGE')
+        .reduceColumns(ee.Reducer.toList(len(SCENE_FIELDS)), SCENE_FIELDS)
+        .get('list')
+        .getInfo()
+    )
+    if not rows:
+        return None
+    scene_id, cloud, time_start = rows[0]
+    return SceneRecord(scene_id, cloud, time_start, tuple(query.roi))
+
+
+class SceneResolver:
+    """場景查詢快取：記憶體 → 磁碟 → 預先計算的成果 → Earth Engine。找不到場景的結果也會快取。"""
+
+    def __init__(self, cache_dir=None, ttl=24 * 3600, lookup=None, use_artifacts=True):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "scenes")
+        self.ttl = ttl
+        self.lookup = lookup or ee_lookup
+        self.use_artifacts = use_artifacts
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _fresh(self, entry):
+        return entry is not None and time.time() - entry['fetched_at'] < self.ttl
+
+    def resolve(self, query):
+        key = query.key()
+        with self._lock:
+            entry = self._memory.get(key)
+            if not self._fresh(entry):
+                entry = read_json(self._path(key))
+                if not self._fresh(entry) and self.use_artifacts:
+                    entry = artifacts.lookup("scenes", key)
+                if self._fresh(entry):
+                    self._memory[key] = entry
+        cache_hit("scenes", self._fresh(entry))
+        if not self._fresh(entry):
+            # 查詢不持有鎖，讓不同場景可以同時查詢；同一個場景在所有 process 中只查詢一次
+            with single_flight(f"scenes/{key}"):
+                entry = read_json(self._path(key))
+                if not self._fresh(entry):
+                    with timed("scenes.lookup"):
+                        record = self.lookup(query)
+                    entry = {'fetched_at': time.time(), 'record': asdict(record) if record else None}
+                    write_json(self._path(key), entry)
+            with self._lock:
+                self._memory[key] = entry
+        record = entry['record']
+        if record is None:
+            return None
+        return SceneRecord(record['id'], record['cloud'], record['time_start'], tuple(record['roi']))
+
+    def invalidate(self, query):
+        key = query.key()
+        with self._lock:
+            self._memory.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+_default_resolver = None
+_default_lock = threading.Lock()
+
+
+def default_resolver():
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            _default_resolver = SceneResolver()
+        return _default_resolver
+
+
+def find_scene(point_coords, roi_coords, start_date, end_date, max_cloud=None):
+    """便利函式：以預設快取解析場景，回傳 SceneRecord 或 None。"""
+    query = SceneQuery(tuple(point_coords), tuple(roi_coords), start_date, end_date, max_cloud)
+    return default_resolver().resolve(query)
@@ -0,0 +1,84 @@
+"""
+頁面分段與延遲繪製。
+
+- lazy_tabs(標籤, key)：st.tabs(on_change="rerun")，只有開啟中的分頁 .open 為 True，
+  頁面只在 `if tab.open:` 裡做該分頁的 Earth Engine 呼叫與地圖輸出
+- cached_map(key, build)：地圖 HTML 依 key 存在 session_state；同一個 session 再次顯示
+  （切回分頁、其他區段的互動）時直接輸出，不再呼叫 build()（Earth Engine 與 folium 輸出都略過）
+
+區段內的互動元件則放在 @st.fragment 函式中，操作時只重跑該區段。
+"""
+import collections
+import time
+
+from core.instrumentation import cache_hit, debug_enabled, metrics, timed
+
+# map ID 約 4 小時到期；超過此秒數的地圖 HTML 重新建立，取得仍有效的圖磚網址
+MAP_HTML_MAX_AGE = 3600
+# 每個 session 保留的地圖 HTML 數
+MAP_HTML_LIMIT = 16
+
+_STATE_KEY = "_meovv_map_html"
+
+
+def lazy_tabs(labels, key):
+    """延遲執行的分頁；舊版 Streamlit 不支援時以水平選項代替。"""
+    import streamlit as st
+    try:
+        return st.tabs(labels, key=key, on_change="rerun")
+    except TypeError:
+        selected = st.radio(key, labels, horizontal=True, key=key, label_visibility="collapsed")
+        containers = []
+        for label in labels:
+            container = st.container()
+            container.open = label == selected
+            containers.append(container)
+        return containers
+
+
+def _map_html(map_object):
+    if hasattr(map_object, "add_layer_control"):
+        map_object.add_layer_control()
+    if hasattr(map_object, "to_html"):
+        return map_object.to_html()
+    return map_object.get_root().render()
+
+
+def _show_html(html, height):
+    import streamlit as st
+    if hasattr(st, "iframe"):
+        st.iframe(html, height=height)
+    else:
+        import streamlit.components.v1 as components
+        components.html(html, height=height)
+
+
+def cached_map(key, build, height=600, name="map", max_age=MAP_HTML_MAX_AGE):
+    """
+    顯示 build() 回傳的地圖；key 需包含會改變地圖內容的參數（年份、指數、分類器鍵等）。
+    build() 只在這個 session 第一次顯示、或 HTML 超過 max_age 秒時才會呼叫。
+    """
+    import streamlit as st
+
+    store = st.session_state.setdefault(_STATE_KEY, collections.OrderedDict())
+    entry = store.get(key)
+    hit = entry is not None and time.time() - entry[0] < max_age
+    cache_hit("map_html", hit)
+    if hit:
+        store.move_to_end(key)
+        html = entry[1]
+    else:
+        with timed("map.build"):
+            map_object = build()
+            if map_object is None:
+                return
+            html = _map_html(map_object)
+        store[key] = (time.time(), html)
+        while len(store) > MAP_HTML_LIMIT:
+            store.popitem(last=False)
+    with timed("map.to_streamlit"):
+        _show_html(html, height)
+    if debug_enabled():
+        size = len(html.encode("utf-8"))
+        metrics.gauge(f"map.html_bytes.{name}", size)
+        metrics.count("map.html_bytes", size)
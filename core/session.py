@@ -0,0 +1,193 @@
+"""
+Earth Engine 連線與延遲匯入。
+
+- ensure_ee()：每個 process 只在第一次呼叫時讀取金鑰並 ee.Initialize（其中的 getAlgorithms
+  是一次網路請求），之後直接返回；憑證到期時先更新，更新失敗再重新初始化，
+  失敗後 REFRESH_BACKOFF 秒內不再重試
+- require_ee()：頁面用；初始化失敗時顯示錯誤並停止頁面
+- health()：以最小的 getInfo 檢查連線（結果保留 HEALTH_TTL 秒），遇到授權錯誤時重新初始化一次再試
+- lazy_import(名稱)：第一次存取屬性時才匯入模組（例如 geemap.foliumap），並記錄匯入耗時
+
+金鑰依序讀取環境變數 GEE_SERVICE_ACCOUNT（JSON 字串或檔案路徑）、Streamlit secrets
+與 .streamlit/secrets.toml 的 [GEE_SERVICE_ACCOUNT]。
+
+    python -m core.session check     # 初始化並檢查連線
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from core.instrumentation import timed
+
+logger = logging.getLogger("meovv.session")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCOPES = ["https://www.googleapis.com/auth/earthengine"]
+HEALTH_TTL = 300
+# 憑證更新失敗後，這段秒數內不再更新或重新初始化
+REFRESH_BACKOFF = 60
+# 視為授權失敗、需要重新初始化的錯誤訊息片段
+AUTH_ERRORS = ("401", "UNAUTHENTICATED", "invalid_grant", "credentials", "Not signed up", "not initialized")
+
+_lock = threading.Lock()
+_state = {"credentials": None, "initialized_at": None, "health": None, "refresh_failed_at": None}
+
+
+def service_account_info():
+    value = os.environ.get("GEE_SERVICE_ACCOUNT")
+    if value:
+        if os.path.exists(value):
+            with open(value, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return json.loads(value)
+    try:
+        import streamlit as st
+        return dict(st.secrets["GEE_SERVICE_ACCOUNT"])
+    except Exception:
+        # 不在 Streamlit 中或沒有 secrets：改讀專案內的 secrets.toml
+        pass
+    try:
+        import tomllib
+    except ModuleNotFoundError:  # Python < 3.11
+        import tomli as tomllib
+    with open(os.path.join(ROOT, ".streamlit", "secrets.toml"), "rb") as f:
+        return tomllib.load(f)["GEE_SERVICE_ACCOUNT"]
+
+
+def _initialize():
+    import ee
+    from google.oauth2 import service_account
+    credentials = service_account.Credentials.from_service_account_info(service_account_info(), scopes=SCOPES)
+    with timed("ee.initialize"):
+        ee.Initialize(credentials)
+    _state.update(credentials=credentials, initialized_at=time.time(), health=None)
+
+
+def _refresh_if_expired():
+    """
+    憑證到期（或即將到期）時更新；更新失敗時記錄錯誤並重新初始化一次。
+    失敗後 REFRESH_BACKOFF 秒內直接沿用現有的連線，不會每次呼叫都重試。
+    """
+    credentials = _state["credentials"]
+    if credentials is None or credentials.valid:
+        return
+    failed_at = _state["refresh_failed_at"]
+    if failed_at is not None and time.time() - failed_at < REFRESH_BACKOFF:
+        return
+    from google.auth.transport.requests import Request
+    try:
+        with timed("ee.refresh_credentials"):
+            credentials.refresh(Request())
+    except Exception:
+        logger.warning("Earth Engine 憑證更新失敗，重新初始化", exc_info=True)
+        _state["refresh_failed_at"] = time.time()
+        _initialize()
+    else:
+        _state["refresh_failed_at"] = None
+
+
+def ensure_ee():
+    """初始化 Earth Engine（每個 process 一次），回傳初始化的時間。"""
+    with _lock:
+        if _state["initialized_at"] is None:
+            _initialize()
+        else:
+            _refresh_if_expired()
+        return _state["initialized_at"]
+
+
+def require_ee():
+    """頁面開頭呼叫：初始化失敗時顯示錯誤並停止頁面。"""
+    import streamlit as st
+    try:
+        ensure_ee()
+    except Exception as e:
+        st.error(f"Earth Engine 初始化失敗：請檢查您的 GEE_SERVICE_ACCOUNT 設定。錯誤訊息: {e}")
+        st.stop()
+
+
+def reset():
+    """下一次 ensure_ee() 重新初始化。"""
+    with _lock:
+        _state.update(credentials=None, initialized_at=None, health=None, refresh_failed_at=None)
+
+
+def _is_auth_error(error):
+    return any(text.lower() in str(error).lower() for text in AUTH_ERRORS)
+
+
+def _probe():
+    import ee
+    t0 = time.perf_counter()
+    with timed("ee.health"):
+        ee.Number(1).getInfo()
+    return time.perf_counter() - t0
+
+
+def health(max_age=HEALTH_TTL):
+    """{'ok', 'latency', 'error', 'initialized_at', 'checked_at'}；max_age 秒內重複呼叫時回傳上次結果。"""
+    cached = _state["health"]
+    if cached is not None and time.time() - cached["checked_at"] < max_age:
+        return cached
+    result = {"ok": False, "latency": None, "error": None}
+    try:
+        ensure_ee()
+        try:
+            result["latency"] = _probe()
+        except Exception as e:
+            if not _is_auth_error(e):
+                raise
+            # 授權失敗：重新初始化一次再試
+            reset()
+            ensure_ee()
+            result["latency"] = _probe()
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e)
+    result.update(initialized_at=_state["initialized_at"], checked_at=time.time())
+    _state["health"] = result
+    return result
+
+
+class _LazyModule:
+    """第一次存取屬性時才匯入的模組。"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with timed(f"import.{self._name}"):
+                self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}{' (loaded)' if self._module else ''}>"
+
+
+def lazy_import(name):
+    return _LazyModule(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Earth Engine 連線檢查")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("check", help="初始化並檢查連線")
+    parser.parse_args(argv)
+
+    result = health(max_age=0)
+    if result["ok"]:
+        print(f"Earth Engine 連線正常，延遲 {result['latency'] * 1000:.0f} ms")
+        return 0
+    print(f"Earth Engine 連線失敗：{result['error']}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""
+跨 process 共用的結果快取與 single-flight。
+
+多個 Streamlit 副本（或同一台機器上的多個 process）共用 config.CACHE_DIR 時：
+
+- SharedCache：以內容雜湊為鍵的結果快取，後端為 SQLite（預設，.cache/shared/cache.sqlite）
+  或目錄（.cache/shared/objects/），支援 TTL 與總大小上限（依最後存取時間淘汰）
+- single_flight(名稱)：以檔案鎖（fcntl.flock）讓同一個名稱在所有 process 與執行緒中同時只有一個在執行；
+  其他呼叫者等待後重新讀取快取，不會重複送出相同的 Earth Engine 計算
+
+core.instrumentation.cache_data 在 st.cache_data（process 內的記憶體快取）未命中時改查這裡，
+頁面的 @cache_data 函式不需修改。場景查詢與分類器訓練則在重新計算前以 single_flight 排隊。
+
+    MEOVV_SHARED_CACHE=sqlite | dir | off        # 後端（預設 sqlite）
+    MEOVV_SHARED_CACHE_MAX_MB=512                # 總大小上限
+    python -m core.shared_cache stats | clear
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from core import config
+from core.instrumentation import cache_hit, timed
+from core.storage import atomic_write_bytes
+
+try:
+    import fcntl
+except ImportError:  # Windows：只在 process 內排隊
+    fcntl = None
+
+BACKEND = os.environ.get("MEOVV_SHARED_CACHE", "sqlite")
+MAX_BYTES = int(float(os.environ.get("MEOVV_SHARED_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+MISSING = object()
+
+
+def shared_dir():
+    return os.path.join(config.CACHE_DIR, "shared")
+
+
+def _encode(obj, digest):
+    """把參數加入雜湊：ee 物件用序列化後的運算式，其他物件用 pickle（無法 pickle 時用 repr）。"""
+    ee = sys.modules.get("ee")
+    if ee is not None and isinstance(obj, ee.ComputedObject):
+        digest.update(b"ee:" + obj.serialize().encode("utf-8"))
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f"{type(obj).__name__}:{len(obj)}".encode())
+        for item in obj:
+            _encode(item, digest)
+    elif isinstance(obj, dict):
+        digest.update(f"dict:{len(obj)}".encode())
+        for k in sorted(obj, key=repr):
+            _encode(k, digest)
+            _encode(obj[k], digest)
+    else:
+        try:
+            digest.update(pickle.dumps(obj, protocol=4))
+        except Exception:
+            digest.update(repr(obj).encode("utf-8"))
+
+
+def content_key(namespace, *parts):
+    """namespace 與各部分內容的 sha256（32 個十六進位字元）。"""
+    digest = hashlib.sha256(namespace.encode("utf-8"))
+    for part in parts:
+        _encode(part, digest)
+    return digest.hexdigest()[:32]
+
+
+def function_key(func, args, kwargs):
+    """函式（含程式碼）與參數的內容雜湊；程式碼改變時鍵也會改變。"""
+    code = getattr(func, "__code__", None)
+    return content_key(f"{func.__module__}.{func.__qualname__}",
+                       code.co_code if code else b"", code.co_consts if code else (), args, kwargs)
+
+
+# name -> [threading.Lock, 持有或等待中的數量]；最後一個離開時移除，避免累積每個用過的鍵
+_name_locks = {}
+_name_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _name_lock(name):
+    with _name_locks_guard:
+        entry = _name_locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _name_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _name_locks[name]
+
+
+@contextmanager
+def single_flight(name, lock_dir=None):
+    """同一個 name 在所有 process 與執行緒中同時只有一個在執行。"""
+    lock_dir = lock_dir or os.path.join(shared_dir(), "locks")
+    with _name_lock(name):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f"{content_key(name)}.lock"), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # 其他 process 正在計算：等它完成（process 結束時鎖會自動釋放）
+                with timed("shared_cache.wait"):
+                    fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def single_flight_many(names):
+    """多個名稱的 single_flight（例如合併成一次請求的多個鍵）；依名稱排序取得，避免互相等待。"""
+    with ExitStack() as stack:
+        for name in sorted(set(names)):
+            stack.enter_context(single_flight(name))
+        yield
+
+
+class SQLiteBackend:
+    """單一 SQLite 檔（WAL 模式，多個 process 可同時讀取）。"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                       "size INTEGER NOT NULL, expires REAL, accessed REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        db = self._db()
+        row = db.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] < time.time():
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def set(self, key, value, expires):
+        self._db().execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                           (key, sqlite3.Binary(value), len(value), expires, time.time()))
+
+    def delete(self, key):
+        self._db().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self, max_bytes):
+        """刪除過期項目，再依最後存取時間刪到總大小不超過 max_bytes；回傳刪除的筆數。"""
+        db = self._db()
+        removed = db.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?",
+                             (time.time(),)).rowcount
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= max_bytes:
+            return removed
+        stale = []
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if total <= max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        db.executemany("DELETE FROM entries WHERE key = ?", stale)
+        return removed + len(stale)
+
+    def stats(self):
+        count, total = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": total}
+
+    def clear(self):
+        self._db().execute("DELETE FROM entries")
+
+
+class DirectoryBackend:
+    """每個項目一個檔案：8 位元組的到期時間（0 為不過期）+ 內容；修改時間作為最後存取時間。"""
+
+    HEADER = struct.Struct("<d")
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.bin")
+
+    def _files(self):
+        if not os.path.isdir(self.root):
+            return
+        for directory in os.listdir(self.root):
+            for name in os.listdir(os.path.join(self.root, directory)):
+                if name.endswith(".bin"):
+                    yield os.path.join(self.root, directory, name)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        (expires,) = self.HEADER.unpack_from(data)
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data[self.HEADER.size:]
+
+    def set(self, key, value, expires):
+        atomic_write_bytes(self._path(key), self.HEADER.pack(expires or 0.0) + value)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def evict(self, max_bytes):
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self._files():
+            try:
+                with open(path, "rb") as f:
+                    (expires,) = self.HEADER.unpack(f.read(self.HEADER.size))
+                stat = os.stat(path)
+            except (OSError, struct.error):
+                continue
+            if expires and expires < now:
+                os.remove(path)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        sizes = [os.path.getsize(path) for path in self._files()]
+        return {"entries": len(sizes), "bytes": sum(sizes)}
+
+    def clear(self):
+        for path in list(self._files()):
+            os.remove(path)
+
+
+class SharedCache:
+    """以內容雜湊為鍵的跨 process 結果快取；值以 pickle 儲存。"""
+
+    def __init__(self, backend, max_bytes=MAX_BYTES, evict_every=32):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        try:
+            data = self.backend.get(key)
+        except Exception:
+            return MISSING
+        if data is None:
+            return MISSING
+        try:
+            return pickle.loads(data)
+        except Exception:
+            self.backend.delete(key)
+            return MISSING
+
+    def set(self, key, value, ttl=None):
+        """無法 pickle 的值不儲存；每 evict_every 次寫入檢查一次大小上限。"""
+        try:
+            data = pickle.dumps(value, protocol=4)
+        except Exception:
+            return False
+        expires = time.time() + ttl if ttl else None
+        try:
+            self.backend.set(key, data, expires)
+        except Exception:
+            return False
+        with self._lock:
+            self._writes += 1
+            evict = (self._writes - 1) % self.evict_every == 0
+        if evict:
+            self.backend.evict(self.max_bytes)
+        return True
+
+    def get_or_compute(self, key, compute, ttl=None, store=None):
+        """
+        快取中有結果時直接回傳；否則在 single_flight 中重新檢查後才計算，
+        同時在計算的其他呼叫者（任何 process）會等待並讀取這次的結果。
+        store(value) 回傳 False 時不寫入快取。
+        """
+        value = self.get(key)
+        cache_hit("shared", value is not MISSING)
+        if value is not MISSING:
+            return value
+        with single_flight(key):
+            value = self.get(key)
+            if value is not MISSING:
+                return value
+            value = compute()
+            if store is None or store(value):
+                self.set(key, value, ttl)
+            return value
+
+    def stats(self):
+        return self.backend.stats()
+
+    def clear(self):
+        self.backend.clear()
+
+
+def make_backend(kind=None, root=None):
+    kind = kind or BACKEND
+    root = root or shared_dir()
+    if kind == "off":
+        return None
+    if kind == "dir":
+        return DirectoryBackend(os.path.join(root, "objects"))
+    return SQLiteBackend(os.path.join(root, "cache.sqlite"))
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """預設的共用快取；MEOVV_SHARED_CACHE=off 時為 None。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            backend = make_backend()
+            if backend is None:
+                return None
+            _default_cache = SharedCache(backend)
+        return _default_cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="跨 process 共用快取")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="項目數與總大小")
+    sub.add_parser("evict", help="刪除過期項目並套用大小上限")
+    sub.add_parser("clear", help="清空")
+    args = parser.parse_args(argv)
+
+    cache = default_cache()
+    if cache is None:
+        print("共用快取已停用（MEOVV_SHARED_CACHE=off）")
+        return 1
+    if args.command == "evict":
+        print(f"刪除 {cache.backend.evict(cache.max_bytes)} 筆")
+    elif args.command == "clear":
+        cache.clear()
+    stats = cache.stats()
+    print(f"{BACKEND}：{stats['entries']} 筆，{stats['bytes'] / 1024 / 1024:.1f} MB（上限 {cache.max_bytes / 1024 / 1024:.0f} MB）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
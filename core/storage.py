@@ -0,0 +1,39 @@
+"""本機快取用的小工具：穩定雜湊鍵與原子寫入。"""
+import hashlib
+import json
+import os
+import tempfile
+
+
+def stable_key(obj, length=16):
+    """將可 JSON 序列化的物件轉成穩定的雜湊字串（鍵順序不影響結果）。"""
+    payload = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:length]
+
+
+def atomic_write_bytes(path, data):
+    """先寫入同目錄暫存檔再 rename，避免多個 session 同時寫入造成檔案損毀。"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json(path, obj):
+    atomic_write_bytes(path, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+
+def read_json(path):
+    """讀取 JSON；檔案不存在或內容損毀時回傳 None。"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
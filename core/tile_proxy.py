@@ -0,0 +1,388 @@
+"""
+本機 XYZ 圖磚代理（選用）。
+
+頁面把 Earth Engine 圖層網址換成 http://<代理>/tiles/<圖層鍵>/{z}/{x}/{y}.png，
+代理依圖層鍵從 map ID 快取（core.map_ids，與頁面共用 .cache/map_ids 與 artifacts/）查出上游網址，
+圖磚以 (圖層鍵, z, x, y) 存在 .cache/tiles，同一張圖磚同時只向上游請求一次。
+圖層鍵是影像運算式與視覺化參數的雜湊，運算式不變時圖磚內容通常也不變；但資料期間涵蓋最近
+RECENT_DAYS 天的圖層（例如當年度的「雲量最低」場景）會隨新影像改變，這類圖層在 map ID 快取中
+記錄 tile_ttl，磁碟上的圖磚超過此時間（以檔案修改時間為取得時間）後重新向上游請求。
+磁碟快取總大小超過 MEOVV_TILE_CACHE_MAX_MB 時，依最後讀取時間淘汰。
+
+    python -m core.tile_proxy serve --port 8765      # 啟動代理
+    MEOVV_TILE_PROXY=http://localhost:8765 streamlit run app.py
+    python -m core.tile_proxy seed --zooms 12 15     # 預先下載 ROI 範圍內所有圖層的圖磚
+    python -m core.tile_proxy evict                  # 刪除過期圖磚並套用大小上限
+
+代理同時以 /vectors/<鍵>.geojson 與 /vectors/<鍵>.fgb 提供 core.vector_layers 編碼好的向量圖層。
+"""
+import argparse
+import math
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from core import config
+from core.fetch import fetch_all
+from core.instrumentation import cache_hit, timed
+from core.storage import atomic_write_bytes
+
+TILE_PROXY = os.environ.get("MEOVV_TILE_PROXY")
+SEED_ZOOMS = (12, 15)
+# 資料期間的結束日在最近 RECENT_DAYS 天內（或在未來）的圖層，圖磚保留 RECENT_TILE_TTL 秒
+RECENT_DAYS = 30
+RECENT_TILE_TTL = 24 * 3600
+MAX_BYTES = int(float(os.environ.get("MEOVV_TILE_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+TILE_PATH = re.compile(r"^/tiles/(?P<layer>[0-9a-f]+)/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.png$")
+# core.vector_layers 編碼好的向量圖層
+VECTOR_PATH = re.compile(r"^/vectors/(?P<name>[0-9a-f]+-z\d+)\.(?P<ext>geojson|fgb)$")
+VECTOR_TYPES = {"geojson": "application/geo+json", "fgb": "application/octet-stream"}
+
+
+class TileNotFound(Exception):
+    """圖層鍵不在 map ID 快取中，或 map ID 已到期。"""
+
+
+def proxied_url(layer, proxy=None):
+    """圖層經過代理的 XYZ 網址樣板。"""
+    return f"{(proxy or TILE_PROXY).rstrip('/')}/tiles/{layer}/{{z}}/{{x}}/{{y}}.png"
+
+
+def vector_url(key, proxy=None, ext="geojson"):
+    """core.vector_layers 圖層經過代理的網址。"""
+    return f"{(proxy or TILE_PROXY).rstrip('/')}/vectors/{key}.{ext}"
+
+
+def tile_ttl(data_end, now=None):
+    """
+    資料期間結束於 data_end（'YYYY-MM-DD'，不含當日）的圖層，其圖磚的保留秒數；
+    期間已結束超過 RECENT_DAYS 天時內容不會再改變，回傳 None。
+    """
+    if data_end is None:
+        return None
+    end = time.mktime(time.strptime(str(data_end)[:10], "%Y-%m-%d"))
+    if end < (now or time.time()) - RECENT_DAYS * 86400:
+        return None
+    return RECENT_TILE_TTL
+
+
+def tile_xy(lon, lat, zoom):
+    """經緯度所在的 Web Mercator 圖磚編號。"""
+    n = 2 ** zoom
+    lat = math.radians(lat)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def roi_tiles(roi_coords=None, zooms=SEED_ZOOMS):
+    """ROI 在各縮放層級涵蓋的圖磚 (z, x, y)；zooms 為 (最小, 最大)，含兩端。"""
+    west, south, east, north = roi_coords or config.ROI_COORDS
+    tiles = []
+    for z in range(zooms[0], zooms[1] + 1):
+        x0, y0 = tile_xy(west, north, z)
+        x1, y1 = tile_xy(east, south, z)
+        tiles += [(z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+    return tiles
+
+
+def _no_ttl(layer):
+    return None
+
+
+class TileCache:
+    """
+    圖磚的磁碟快取；resolve(圖層鍵) 回傳上游網址樣板或 None，layer_ttl(圖層鍵) 回傳圖磚保留秒數或 None。
+    兩者預設都查 map ID 快取；只指定 resolve 時圖磚不會到期。
+    """
+
+    def __init__(self, cache_dir=None, resolve=None, session=None, timeout=30, layer_ttl=None,
+                 max_bytes=MAX_BYTES, evict_every=256):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "tiles")
+        if resolve is None:
+            from core.map_ids import default_cache
+            resolve = default_cache().cached
+            layer_ttl = layer_ttl or default_cache().tile_ttl
+        self.resolve = resolve
+        self.layer_ttl = layer_ttl or _no_ttl
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.upstream_requests = 0
+        self._writes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def path(self, layer, z, x, y):
+        return os.path.join(self.cache_dir, layer, str(z), str(x), f"{y}.png")
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _read_tile(self, layer, path):
+        """
+        磁碟上未到期的圖磚，或 None。修改時間是取得時間；讀取時只更新存取時間，作為淘汰的依據
+        （不依賴檔案系統的 atime 設定）。
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        ttl = self.layer_ttl(layer)
+        if ttl and time.time() - stat.st_mtime > ttl:
+            return None
+        data = self._read(path)
+        if data is not None:
+            try:
+                os.utime(path, (time.time(), stat.st_mtime))
+            except OSError:
+                pass
+        return data
+
+    def _fetch(self, layer, z, x, y):
+        template = self.resolve(layer)
+        if not template:
+            raise TileNotFound(layer)
+        with self._lock:
+            self.upstream_requests += 1
+        with timed("tiles.upstream"):
+            response = self.session.get(template.format(z=z, x=x, y=y), timeout=self.timeout)
+        response.raise_for_status()
+        atomic_write_bytes(self.path(layer, z, x, y), response.content)
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self.evict()
+        return response.content
+
+    def get(self, layer, z, x, y):
+        """回傳 PNG 位元組；同一張圖磚的同時請求共用一次上游請求。"""
+        path = self.path(layer, z, x, y)
+        data = self._read_tile(layer, path)
+        cache_hit("tiles", data is not None)
+        if data is not None:
+            return data
+
+        key = (layer, z, x, y)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            # 等待鎖的期間可能已有其他請求寫入
+            data = self._read_tile(layer, path) or self._fetch(layer, z, x, y)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _files(self):
+        """(圖層鍵, 路徑) 的清單。"""
+        files = []
+        if not os.path.isdir(self.cache_dir):
+            return files
+        for layer in os.listdir(self.cache_dir):
+            for directory, _, names in os.walk(os.path.join(self.cache_dir, layer)):
+                files += [(layer, os.path.join(directory, name)) for name in names if name.endswith(".png")]
+        return files
+
+    def evict(self, max_bytes=None):
+        """刪除已到期的圖磚，再依最後讀取時間刪到總大小不超過 max_bytes；回傳刪除的張數。"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        now = time.time()
+        ttls = {}
+        entries = []
+        removed = 0
+        for layer, path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if layer not in ttls:
+                ttls[layer] = self.layer_ttl(layer)
+            if ttls[layer] and now - stat.st_mtime > ttls[layer]:
+                os.remove(path)
+                removed += 1
+            else:
+                entries.append((stat.st_atime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def seed(self, layers, roi_coords=None, zooms=SEED_ZOOMS, max_workers=8):
+        """預先下載 ROI 範圍內各圖層的圖磚，回傳 fetch_all 的結果。"""
+        return fetch_all({
+            (layer, *tile): partial(self.get, layer, *tile)
+            for layer in layers
+            for tile in roi_tiles(roi_coords, zooms)
+        }, max_workers=max_workers)
+
+
+def make_handler(cache, vector_dir=None):
+    vector_dir = vector_dir or os.path.join(config.CACHE_DIR, "vector_layers")
+
+    class TileProxyHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            vector = VECTOR_PATH.match(path)
+            if vector:
+                self._send_vector(vector["name"], vector["ext"])
+                return
+            match = TILE_PATH.match(path)
+            if not match:
+                self.send_error(404)
+                return
+            try:
+                data = cache.get(match["layer"], int(match["z"]), int(match["x"]), int(match["y"]))
+            except TileNotFound:
+                self.send_error(404, "unknown or expired layer")
+                return
+            except requests.HTTPError as e:
+                self.send_error(e.response.status_code if e.response is not None else 502)
+                return
+            except Exception as e:
+                self.send_error(502, str(e))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Cache-Control", "public, max-age=86400")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_vector(self, name, ext):
+            # 檔名是資料雜湊與縮放層級，內容不會改變
+            data = cache._read(os.path.join(vector_dir, f"{name}.{ext}"))
+            if data is None:
+                self.send_error(404, "unknown vector layer")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", VECTOR_TYPES[ext])
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return TileProxyHandler
+
+
+def make_server(cache, host="127.0.0.1", port=8765, vector_dir=None):
+    return ThreadingHTTPServer((host, port), make_handler(cache, vector_dir))
+
+
+class FakeTileServer:
+    """測試用的上游圖磚伺服器：回傳 z/x/y 組成的假 PNG，並計算請求次數。"""
+
+    PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __enter__(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                data = fake.PNG_HEADER + self.path.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url_template(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/{{z}}/{{x}}/{{y}}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Earth Engine 圖磚代理")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="啟動代理")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    seed = sub.add_parser("seed", help="預先下載 ROI 範圍的圖磚")
+    seed.add_argument("--layers", nargs="+", help="圖層鍵（預設為 map ID 快取中所有未到期的圖層）")
+    seed.add_argument("--zooms", type=int, nargs=2, default=SEED_ZOOMS, metavar=("MIN", "MAX"))
+    seed.add_argument("--workers", type=int, default=8)
+    evict = sub.add_parser("evict", help="刪除過期圖磚並套用大小上限")
+    evict.add_argument("--max-mb", type=float, help=f"大小上限（預設 {MAX_BYTES / 1024 / 1024:.0f}）")
+    args = parser.parse_args(argv)
+
+    cache = TileCache()
+    if args.command == "evict":
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+        print(f"刪除 {cache.evict(max_bytes)} 張圖磚")
+        return 0
+    if args.command == "serve":
+        server = make_server(cache, args.host, args.port)
+        print(f"圖磚代理 http://{args.host}:{args.port}/tiles/<圖層鍵>/{{z}}/{{x}}/{{y}}.png", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    from core.map_ids import default_cache
+    layers = args.layers or [key for key in default_cache().keys() if cache.resolve(key)]
+    t0 = time.time()
+    result = cache.seed(layers, zooms=tuple(args.zooms), max_workers=args.workers)
+    print(f"圖層 {len(layers)} 個，圖磚 {len(result.values)} 張（上游請求 {cache.upstream_requests} 次），"
+          f"失敗 {len(result.errors)} 張，{time.time() - t0:.1f} 秒")
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
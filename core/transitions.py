@@ -0,0 +1,206 @@
+"""
+土地覆蓋轉移矩陣。
+
+兩個年份的分類結果編碼成單一波段（前期類別 × 11 + 後期類別），一次以轉移代碼分組的
+ee.Image.pixelArea() 加總就得到所有 (前期 → 後期) 的面積，不需 121 次個別請求；
+多組年份再合併成一次 getInfo。本機模式則對兩個類別陣列做一次 np.bincount。
+結果以 (年份對, 分類器鍵, ROI) 快取在記憶體與磁碟；年份對一律以 (較早, 較晚) 查詢與快取，
+反向的年份對是同一個矩陣的轉置，在本機換算。
+"""
+import os
+import threading
+
+import ee
+import numpy as np
+
+from core import artifacts, config
+from core.instrumentation import cache_hit, timed
+from core.shared_cache import single_flight_many
+from core.storage import read_json, stable_key, write_json
+
+N_CLASSES = len(config.CLASS_VALUES)
+CODE_BAND = 'transition'
+
+
+def transition_image(classified_from, classified_to):
+    """轉移代碼影像：前期類別 * N_CLASSES + 後期類別。"""
+    return (
+        classified_from.select(0).multiply(N_CLASSES)
+        .add(classified_to.select(0))
+        .rename(CODE_BAND).toInt16()
+    )
+
+
+def grouped_transitions(classified_from, classified_to, roi, scale=10):
+    """ee.Dictionary：{'groups': [{'transition': 代碼, 'sum': 平方公里}, ...]}。"""
+    return (
+        ee.Image.pixelArea().divide(1e6)
+        .addBands(transition_image(classified_from, classified_to))
+        .reduceRegion(
+            reducer=ee.Reducer.sum().group(groupField=1, groupName=CODE_BAND),
+            geometry=roi,
+            scale=scale,
+            maxPixels=1e10,
+        )
+    )
+
+
+def decode(code):
+    return divmod(int(code), N_CLASSES)
+
+
+def ee_compute(pairs, roi_coords, scale):
+    """pairs: {(前期年份, 後期年份): (ee.Image, ee.Image)}，合併成一次請求。"""
+    roi = ee.Geometry.Rectangle(list(roi_coords))
+    batch = ee.Dictionary({
+        f"{a}-{b}": grouped_transitions(image_a, image_b, roi, scale)
+        for (a, b), (image_a, image_b) in pairs.items()
+    })
+    result = batch.getInfo()
+    return {
+        pair: {decode(g[CODE_BAND]): g['sum'] for g in result[f"{pair[0]}-{pair[1]}"].get('groups', [])}
+        for pair in pairs
+    }
+
+
+def transpose(matrix):
+    """(後期 → 前期) 的轉移面積：{(後期類別, 前期類別): 平方公里}。"""
+    return {(b, a): area for (a, b), area in matrix.items()}
+
+
+def local_matrix(classes_from, classes_to, scale=10, nodata=255):
+    """本機模式：兩個同尺寸類別陣列的轉移面積 {(前期, 後期): 平方公里}。"""
+    a = np.asarray(classes_from).ravel().astype(np.int32)
+    b = np.asarray(classes_to).ravel().astype(np.int32)
+    valid = (a != nodata) & (b != nodata)
+    counts = np.bincount(a[valid] * N_CLASSES + b[valid], minlength=N_CLASSES * N_CLASSES)
+    pixel_km2 = scale ** 2 / 1e6
+    return {decode(code): float(count * pixel_km2) for code, count in enumerate(counts) if count}
+
+
+class TransitionEngine:
+    """依 (前期年份, 後期年份, 分類器鍵, ROI) 快取轉移面積。"""
+
+    def __init__(self, cache_dir=None, compute=None, use_artifacts=True):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, "transitions")
+        self.compute = compute or ee_compute
+        self.use_artifacts = use_artifacts
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _key(self, pair, classifier_key, roi_coords, scale):
+        return stable_key([list(pair), classifier_key, list(roi_coords), scale])
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        record = read_json(os.path.join(self.cache_dir, f"{key}.json"))
+        if record is None and self.use_artifacts:
+            record = artifacts.lookup("transitions", key)
+        if record is not None:
+            record = {(int(a), int(b)): area for a, b, area in record}
+            with self._lock:
+                self._memory[key] = record
+        return record
+
+    def _store(self, key, matrix):
+        with self._lock:
+            self._memory[key] = matrix
+        write_json(os.path.join(self.cache_dir, f"{key}.json"),
+                   [[a, b, area] for (a, b), area in sorted(matrix.items())])
+
+    def get(self, classified_by_year, pairs, classifier_key, roi_coords=None, scale=10):
+        """
+        classified_by_year: {年份: 已分類的 ee.Image}；pairs: [(前期年份, 後期年份), ...]。
+        回傳 {(前期, 後期): {(前期類別, 後期類別): 平方公里}}；未命中的年份對合併成一次請求。
+        """
+        roi_coords = roi_coords or config.ROI_COORDS
+        pairs = [tuple(pair) for pair in pairs]
+        canonical = {pair: tuple(sorted(pair)) for pair in pairs}
+        keys = {pair: self._key(pair, classifier_key, roi_coords, scale) for pair in canonical.values()}
+        matrices = {}
+        missing = {}
+        for pair, key in keys.items():
+            cached = self._lookup(key)
+            cache_hit("transitions", cached is not None)
+            if cached is None:
+                missing[pair] = (classified_by_year[pair[0]], classified_by_year[pair[1]])
+            else:
+                matrices[pair] = cached
+        if missing:
+            # 遠端加總不持有鎖；同一個鍵在所有 process 中只計算一次，等待後重新讀取快取
+            with single_flight_many(f"transitions/{keys[pair]}" for pair in missing):
+                for pair in list(missing):
+                    cached = self._lookup(keys[pair])
+                    if cached is not None:
+                        del missing[pair]
+                        matrices[pair] = cached
+                if missing:
+                    with timed("transitions.compute"):
+                        computed = self.compute(missing, roi_coords, scale)
+                    for pair, matrix in computed.items():
+                        self._store(keys[pair], matrix)
+                        matrices[pair] = matrix
+        return {
+            pair: matrices[canonical[pair]] if pair == canonical[pair] else transpose(matrices[canonical[pair]])
+            for pair in pairs
+        }
+
+
+def to_frame(matrix, min_area=0.0):
+    """轉移矩陣表格：列為前期類別、欄為後期類別（平方公里）；略過總面積小於 min_area 的類別。"""
+    import pandas as pd
+    grid = np.zeros((N_CLASSES, N_CLASSES))
+    for (a, b), area in matrix.items():
+        grid[a, b] = area
+    keep = [i for i in range(N_CLASSES) if max(grid[i].sum(), grid[:, i].sum()) > min_area]
+    return pd.DataFrame(
+        grid[np.ix_(keep, keep)].round(2),
+        index=[config.CLASS_NAMES[i] for i in keep],
+        columns=[config.CLASS_NAMES[i] for i in keep],
+    )
+
+
+def changes_frame(matrix, min_area=0.01):
+    """只列出類別有改變的轉移，依面積排序。"""
+    import pandas as pd
+    rows = [
+        [config.CLASS_NAMES[a], config.CLASS_NAMES[b], round(area, 3)]
+        for (a, b), area in sorted(matrix.items(), key=lambda item: -item[1])
+        if a != b and area >= min_area
+    ]
+    return pd.DataFrame(rows, columns=['前期類別', '後期類別', '面積 (平方公里)'])
+
+
+def sankey_figure(matrix, label_from, label_to, min_area=0.01):
+    """plotly Sankey 圖；顏色沿用 CLASS_VIS 的調色盤。"""
+    import plotly.graph_objects as go
+    palette = [f"#{color}" for color in config.CLASS_VIS['palette']]
+    links = [(a, b, area) for (a, b), area in sorted(matrix.items()) if area >= min_area]
+    used_from = sorted({a for a, _, _ in links})
+    used_to = sorted({b for _, b, _ in links})
+    nodes = [f"{config.CLASS_NAMES[i]} ({label_from})" for i in used_from] + \
+            [f"{config.CLASS_NAMES[i]} ({label_to})" for i in used_to]
+    colors = [palette[i] for i in used_from] + [palette[i] for i in used_to]
+    return go.Figure(go.Sankey(
+        node=dict(label=nodes, color=colors, pad=12),
+        link=dict(
+            source=[used_from.index(a) for a, _, _ in links],
+            target=[len(used_from) + used_to.index(b) for _, b, _ in links],
+            value=[area for _, _, area in links],
+            color=[palette[a] + "80" for a, _, _ in links],
+        ),
+    ))
+
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+
+def default_engine():
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = TransitionEngine()
+        return _default_engine
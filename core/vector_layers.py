@@ -0,0 +1,127 @@
+"""
+縮小地圖向量圖層的 HTML 負擔。
+
+- 多邊形依地圖縮放層級簡化（容許誤差約半個像素），座標量化到該層級需要的小數位數，
+  只保留指定的屬性欄位，以精簡的 GeoJSON 編碼
+- 編碼結果依 (資料雜湊, 縮放層級, 欄位) 快取在 .cache/vector_layers/，同時輸出 FlatGeobuf
+- 設定 MEOVV_TILE_PROXY 時，圖層改由本機代理的 /vectors/<鍵>.geojson 提供，瀏覽器另外下載並快取，
+  不再內嵌在每次 rerun 的 HTML 中
+- 密集點位以 FastMarkerCluster 在瀏覽器端叢集，只傳送 [緯度, 經度] 陣列
+
+    python -m benchmarks.bench_vectors     # 比較 add_gdf 與精簡圖層的 HTML 大小
+"""
+import hashlib
+import json
+import math
+import os
+
+from core import config
+from core.instrumentation import cache_hit, timed
+from core.storage import atomic_write_bytes
+
+# Web Mercator 在赤道、縮放層級 0 時每個像素的公尺數
+METERS_PER_PIXEL_Z0 = 156543.03
+DEFAULT_ZOOM = 15
+
+
+def cache_dir():
+    return os.path.join(config.CACHE_DIR, "vector_layers")
+
+
+def data_hash(gdf, columns=()):
+    """幾何（WKB）與指定欄位內容的雜湊。"""
+    digest = hashlib.sha256()
+    for geometry in gdf.geometry.to_wkb():
+        digest.update(geometry)
+    for column in columns:
+        digest.update(json.dumps(gdf[column].tolist(), default=str, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def tolerance_degrees(zoom, latitude=24.05):
+    """該縮放層級半個像素對應的經緯度距離。"""
+    meters = METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / 2 ** zoom / 2
+    return meters / 111320
+
+
+def decimals_for_zoom(zoom):
+    """量化的小數位數：約為該層級像素大小的十分之一。"""
+    return max(0, min(7, int(math.ceil(math.log10(1 / (tolerance_degrees(zoom) / 5))))))
+
+
+def reduce(gdf, zoom=DEFAULT_ZOOM, columns=()):
+    """簡化並量化後的 GeoDataFrame（EPSG:4326），只保留 columns 欄位。"""
+    import shapely
+    reduced = gdf[list(columns) + [gdf.geometry.name]].to_crs("EPSG:4326")
+    geometry = reduced.geometry
+    if not geometry.geom_type.isin(["Point", "MultiPoint"]).all():
+        geometry = geometry.simplify(tolerance_degrees(zoom), preserve_topology=True)
+    geometry = shapely.force_2d(geometry.values)
+    geometry = shapely.set_precision(geometry, 10 ** -decimals_for_zoom(zoom))
+    reduced = reduced.set_geometry(list(geometry), crs="EPSG:4326")
+    return reduced[~reduced.geometry.is_empty]
+
+
+def encode(gdf):
+    """精簡的 GeoJSON 字串（無空白、無 bbox）。"""
+    return json.dumps(json.loads(gdf.to_json(drop_id=False)), separators=(",", ":"), ensure_ascii=False)
+
+
+def encoded_layer(gdf, zoom=DEFAULT_ZOOM, columns=()):
+    """回傳 (鍵, GeoJSON 字串)；相同資料與層級只編碼一次。"""
+    key = f"{data_hash(gdf, columns)}-z{zoom}"
+    path = os.path.join(cache_dir(), f"{key}.geojson")
+    if os.path.exists(path):
+        cache_hit("vector_layers", True)
+        with open(path, "r", encoding="utf-8") as f:
+            return key, f.read()
+    cache_hit("vector_layers", False)
+    with timed("vector_layers.encode"):
+        reduced = reduce(gdf, zoom, columns)
+        text = encode(reduced)
+    atomic_write_bytes(path, text.encode("utf-8"))
+    write_flatgeobuf(os.path.join(cache_dir(), f"{key}.fgb"), reduced)
+    return key, text
+
+
+def write_flatgeobuf(path, gdf):
+    """另存 FlatGeobuf 給 GIS 工具與串流讀取的用戶端；不支援時略過。"""
+    # 副檔名必須是 .fgb，否則驅動程式會建立資料夾
+    tmp_path = f"{path[:-len('.fgb')]}.{os.getpid()}.tmp.fgb"
+    try:
+        gdf.to_file(tmp_path, driver="FlatGeobuf")
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def geojson_layer(gdf, name, zoom=DEFAULT_ZOOM, columns=(), style=None, tooltip=None):
+    """
+    精簡的 folium.GeoJson 圖層。設定 MEOVV_TILE_PROXY 時以網址載入（不內嵌），
+    否則內嵌精簡後的 GeoJSON。
+    """
+    import folium
+
+    from core import tile_proxy
+    key, text = encoded_layer(gdf, zoom, columns)
+    style = style or {"color": "#d7301f", "weight": 1, "fillOpacity": 0.3}
+    options = dict(
+        name=name,
+        style_function=lambda _: style,
+        tooltip=folium.GeoJsonTooltip(fields=list(columns)) if tooltip and columns else None,
+    )
+    if tile_proxy.TILE_PROXY:
+        return folium.GeoJson(tile_proxy.vector_url(key), embed=False, **options)
+    return folium.GeoJson(json.loads(text), **options)
+
+
+def point_cluster_layer(gdf, name):
+    """密集點位的叢集圖層：只傳送座標陣列，由瀏覽器端叢集。"""
+    from folium.plugins import FastMarkerCluster
+    points = gdf.to_crs("EPSG:4326").geometry
+    decimals = decimals_for_zoom(18)
+    return FastMarkerCluster(
+        data=[[round(p.y, decimals), round(p.x, decimals)] for p in points],
+        name=name,
+    )
@@ -1,246 +1,179 @@
 import streamlit as st
-import ee
-from google.oauth2 import service_account
-import geemap.foliumap as geemap
-import geopandas as gpd
-import requests
-import zipfile
-import os
-
-# --- 1. GEE 初始化與工具函式 ---
-@st.cache_resource
-def initialize_gee():
-    try:
-        service_account_info = st.secrets["GEE_SERVICE_ACCOUNT"]
-        credentials = service_account.Credentials.from_service_account_info(
-            service_account_info,
-            scopes=["https://www.googleapis.com/auth/earthengine"]
-        )
-        ee.Initialize(credentials)
-    except Exception as e:
-        st.error(f"Earth Engine 初始化失敗：請檢查您的 GEE_SERVICE_ACCOUNT 設定。錯誤訊息: {e}")
-        st.stop() # 如果 GEE 無法初始化，則停止應用程式運行
-
-@st.cache_data
-def get_sentinel_image(point_coords, roi_coords, start_date, end_date): # 參數名稱變更為更明確的 coords
+from functools import partial
+
+from core.change_detection import DIFF_VIS, INDICES, change_image, default_engine, diff_band
+from core.events import load_catalog
+from core.fetch import fetch_all
+from core.instrumentation import begin_rerun, finish_rerun
+from core.pipeline import roi_center, tile_layer, tile_url
+from core.scenes import find_scene
+from core.sections import cached_map, lazy_tabs
+from core.session import lazy_import, require_ee
+
+# 地圖套件很大，第一次建立地圖時才匯入
+geemap = lazy_import("geemap.foliumap")
+
+# --- 1. 工具函式 ---
+def get_sentinel_scenes(queries):
     """
-    獲取指定日期範圍內雲量最低的 Sentinel-2 影像。
-    使用 st.cache_data 緩存 GEE 影像查詢結果。
-    現在接受座標列表作為 point 和 roi 的輸入。
+    同時查詢多個日期範圍內雲量最低的 Sentinel-2 場景。
+    queries: {名稱: (point_coords, roi_coords, start_date, end_date)}；回傳 {名稱: SceneRecord 或 None}。
+    場景查詢只取回場景 ID 與少數屬性，並快取在記憶體與磁碟（附 TTL）；
+    快取的是可序列化的紀錄，ee.Image 由 ID 重建，不需 pickle。
     """
-    try:
-        # 將座標列表轉換回 ee.Geometry 物件
-        point = ee.Geometry.Point(point_coords)
-        roi = ee.Geometry.Rectangle(roi_coords)
-
-        image = (
-            ee.ImageCollection('COPERNICUS/S2_HARMONIZED')
-            .filterBounds(point)
-            .filterDate(start_date, end_date)
-            .sort('CLOUDY_PIXEL_PERCENTAGE')
-            .first()
-            .clip(roi)
-            .select('B.*')
-        )
-        # 檢查影像是否為 None，如果沒有找到合適的影像，first() 可能返回 None
-        if image.getInfo() is None:
+    fetched = fetch_all({
+        name: partial(find_scene, *query) for name, query in queries.items()
+    }, max_workers=4, timeout=60)
+
+    scenes = {}
+    for name, (_, _, start_date, end_date) in queries.items():
+        scene = fetched.values.get(name)
+        if name in fetched.errors:
+            st.error(f"獲取 Sentinel 影像失敗 ({start_date} - {end_date}): {fetched.errors[name]}")
+        elif scene is None:
             st.warning(f"在 {start_date} 到 {end_date} 期間，指定區域內未找到 Sentinel-2 影像。")
-            return None
-        return image
-    except Exception as e:
-        st.error(f"獲取 Sentinel 影像失敗 ({start_date} - {end_date}): {e}")
-        return None
+        scenes[name] = scene
+    return scenes
+
+def get_tile_urls(layers):
+    """
+    同時取得所有圖層的圖磚網址。layers: {名稱: (ee.Image, vis_params)}。
+    失敗的圖層只顯示錯誤，不影響其他圖層。
+    """
+    fetched = fetch_all({
+        name: partial(tile_url, image, vis)
+        for name, (image, vis) in layers.items()
+    }, max_workers=8, timeout=60)
+    for name, error in fetched.errors.items():
+        st.error(f"取得圖層失敗 ({name}): {error}")
+    return fetched.values
+
 # --- 3. 地圖顯示函式 ---
-def display_split_map(map_object, left_ee_image, left_name, right_ee_image, right_name, vis_params):
+def display_split_map(map_object, left_url, left_name, right_url, right_name):
     """
-    顯示左右分開的地圖。
+    顯示左右分開的地圖（使用預先取得的圖磚網址）。
     """
-    if left_ee_image and right_ee_image:
-        left_layer = geemap.ee_tile_layer(left_ee_image, vis_params, left_name)
-        right_layer = geemap.ee_tile_layer(right_ee_image, vis_params, right_name)
-        map_object.split_map(left_layer, right_layer)
-    elif left_ee_image:
-        map_object.addLayer(left_ee_image, vis_params, left_name)
-    elif right_ee_image:
-        map_object.addLayer(right_ee_image, vis_params, right_name)
+    if left_url and right_url:
+        map_object.split_map(tile_layer(left_url, left_name), tile_layer(right_url, right_name))
+    elif left_url:
+        tile_layer(left_url, left_name).add_to(map_object)
+    elif right_url:
+        tile_layer(right_url, right_name).add_to(map_object)
     else:
         st.warning("沒有影像可以顯示。")
 
-# --- 4. Streamlit 應用程式主體 ---
+def build_change_map(change_url, center, index_name):
+    change_map = geemap.Map()
+    change_map.set_center(*center, 13)
+    tile_layer(change_url, f'{index_name} 差異圖 (災後 - 災前)').add_to(change_map)
+    change_map.add_colorbar(DIFF_VIS, label=f"{index_name} 差異", orientation="horizontal", layer_name=f'{index_name} 差異')
+    return change_map
+
+def event_scenes(event):
+    scenes = get_sentinel_scenes({
+        (event.id, phase): (event.point, event.roi, *window)
+        for phase, window in (('pre', event.pre), ('post', event.post))
+    })
+    return scenes[(event.id, 'pre')], scenes[(event.id, 'post')]
+
+# --- 4. 各區段（只有開啟中的分頁會執行） ---
+def damage_section(events):
+    """受損面積總表：所有事件的前後場景同時查詢，統計合併成一次請求並快取。"""
+    scenes = get_sentinel_scenes({
+        (event.id, phase): (event.point, event.roi, *window)
+        for event in events
+        for phase, window in (('pre', event.pre), ('post', event.post))
+    })
+    changes = {}
+    for event in events:
+        pre, post = scenes[(event.id, 'pre')], scenes[(event.id, 'post')]
+        if pre and post:
+            # 每個事件一張多波段差異影像，所有指數共用同一次統計請求
+            changes[event.id] = (event, change_image(pre.to_image(), post.to_image()), (pre.id, post.id))
+    try:
+        damage = default_engine().statistics(changes) if changes else {}
+    except Exception as e:
+        st.error(f"統計受損面積失敗: {e}")
+        return
+    import pandas as pd
+    if not damage:
+        st.info("沒有可統計的事件。")
+        return
+    st.header("📊 各事件受損面積 (平方公里)")
+    st.dataframe(pd.DataFrame(
+        [[event.name, event.year] + [round(damage[event.id].get(n, 0.0), 2) for n in INDICES]
+         for event in events if event.id in damage],
+        columns=['事件', '年份'] + [f'{n} < 門檻' for n in INDICES],
+    ))
+
+def event_section(event, vis_params):
+    """事件前後對照；地圖 HTML 在 session 內保留，切換分頁不再重新建立。"""
+    pre_label = f"{event.name}前 ({event.window_label(event.pre)})"
+    post_label = f"{event.name}後 ({event.window_label(event.post)})"
+    st.header(f"{event.icon} {event.name}影響 ({event.year})")
+    st.write("影像：Harmonized Sentinel-2")
+    st.write("---")
+
+    pre, post = event_scenes(event)
+
+    def build_event_map():
+        # 前後影像的圖層網址同時取得
+        urls = get_tile_urls({phase: (scene.to_image(), vis_params)
+                              for phase, scene in (('pre', pre), ('post', post)) if scene})
+        event_map = geemap.Map()
+        event_map.set_center(*roi_center(event.roi), 13 if pre else 12)
+        display_split_map(event_map, urls.get('pre'), pre_label, urls.get('post'), post_label)
+        return event_map
+
+    scene_ids = (pre.id if pre else None, post.id if post else None)
+    cached_map(("event", event.id, scene_ids), build_event_map, height=600, name=f"event.{event.id}")
+    change_section(event, pre, post)
+
+@st.fragment
+def change_section(event, pre, post):
+    """差異圖；切換指數只重跑這個區段。"""
+    index_name = st.radio("差異指數", list(INDICES), horizontal=True, key=f"index.{event.id}",
+                          help="NDVI：植生；NBR：裸露/燒毀；NDWI：水體")
+    st.header(f"🌿 {event.name}造成 {index_name} 值變化差異圖")
+    if not (pre and post):
+        st.info(f"由於缺乏{event.name}前後影像，無法顯示差異圖。")
+        return
+
+    def build():
+        change = change_image(pre.to_image(), post.to_image()).select(diff_band(index_name))
+        change_url = get_tile_urls({'change': (change, DIFF_VIS)}).get('change')
+        return build_change_map(change_url, roi_center(event.roi), index_name) if change_url else None
+
+    cached_map(("change", event.id, pre.id, post.id, index_name), build, height=600, name=f"change.{index_name}")
+    thresholds = "、".join(f"{n} < {event.thresholds[n]}" for n in INDICES)
+    st.caption(f"受損判定門檻（災後 - 災前）：{thresholds}")
+
+# --- 5. Streamlit 應用程式主體 ---
 def main():
     st.set_page_config(layout="wide")
+    begin_rerun()
     st.title("🌀自然災害影響監測")
 
-    # GEE 初始化
-    initialize_gee()
-
-    # 定義常用的 ROI 和中心點
-    default_roi_coords = [121.116451, 24.020390, 121.21, 24.09]
-    default_point_coords = [121.1617, 24.0495]
-
-    # 在這裡創建 GEE 幾何物件，僅用於地圖初始化和顯示
-    default_roi = ee.Geometry.Rectangle(default_roi_coords)
-    default_point = ee.Geometry.Point(default_point_coords)
+    # GEE 初始化（每個 process 一次，見 core.session）
+    require_ee()
 
     vis_params = {'min': 100, 'max': 3500, 'bands': ['B11', 'B8', 'B3']} # 假彩色紅外影像
 
-    # --- 卡努颱風區塊 ---
-    st.header("🌪️ 卡努颱風影響 (2023)")
-    st.write("影像：Harmonized Sentinel-2")
-    st.write("---")
-
-    # 獲取卡努颱風前後影像
-    with st.spinner("正在載入卡努颱風前影像..."):
-        kanu_img_bef = get_sentinel_image(default_point_coords, default_roi_coords, '2023-06-01', '2023-07-31')
-    with st.spinner("正在載入卡努颱風後影像..."):
-        kanu_img_aft = get_sentinel_image(default_point_coords, default_roi_coords, '2023-08-01', '2023-09-30')
-
-    kanu_map = geemap.Map()
-    if kanu_img_bef:
-        kanu_map.centerObject(kanu_img_bef.geometry(), 13)
-    else:
-        kanu_map.centerObject(default_roi, 12) # 如果沒有影像，則中心定位到預設 ROI
-
-    display_split_map(kanu_map, kanu_img_bef, '卡努颱風前 (2023/06/01-07/31)',
-                      kanu_img_aft, '卡努颱風後 (2023/08/01-09/30)', vis_params)
-    kanu_map.to_streamlit(height=600)
-# --- NDVI 差異圖區塊 (卡努颱風) ---
-    st.header("🌿 卡努颱風造成 NDVI 值變化差異圖")
-    if kanu_img_bef and kanu_img_aft:
-        ndvi_bef = kanu_img_bef.normalizedDifference(['B8', 'B4']).rename('NDVI_Before')
-        ndvi_aft = kanu_img_aft.normalizedDifference(['B8', 'B4']).rename('NDVI_After')
-        ndvi_diff = ndvi_aft.subtract(ndvi_bef).rename('NDVI_Diff')
-
-        ndvi_vis = {
-            'min': -1,
-            'max': 1,
-            'palette': ['red', 'white', 'green'] # 紅色表示減少，綠色表示增加
-        }
-
-        ndvi_map = geemap.Map()
-        ndvi_map.centerObject(ndvi_diff.geometry(), 13)
-        ndvi_map.addLayer(ndvi_diff, ndvi_vis, 'NDVI 差異圖 (災後 - 災前)')
-        ndvi_map.add_colorbar(ndvi_vis, label="NDVI 差異", orientation="horizontal", layer_name='NDVI 差異')
-        ndvi_map.to_streamlit(height=600)
-    else:
-        st.info("由於缺乏卡努颱風前後影像，無法顯示 NDVI 差異圖。")
-    st.markdown("---") # 分隔線
-
-    # --- 康芮颱風區塊 ---
-    st.header("🌪️ 康芮颱風影響 (2024)")
-    st.write("影像：Harmonized Sentinel-2")
-    st.write("---")
-
-    # 獲取康芮颱風前後影像
-    with st.spinner("正在載入康芮颱風前影像..."):
-        kangrui_img_bef = get_sentinel_image(default_point_coords, default_roi_coords, '2024-09-01', '2024-10-29')
-    with st.spinner("正在載入康芮颱風後影像..."):
-        kangrui_img_aft = get_sentinel_image(default_point_coords, default_roi_coords, '2024-10-30', '2024-12-30')
-
-    kangrui_map = geemap.Map()
-    if kangrui_img_bef:
-        kangrui_map.centerObject(kangrui_img_bef.geometry(), 13)
-    else:
-        kangrui_map.centerObject(default_roi, 12) # 如果沒有影像，則中心定位到預設 ROI
-
-    display_split_map(kangrui_map, kangrui_img_bef, '康芮颱風前 (2024/09/01-10/29)',
-                      kangrui_img_aft, '康芮颱風後 (2024/10/30-12/30)', vis_params)
-    kangrui_map.to_streamlit(height=600)
-
-    st.markdown("---") # 分隔線
-
-    # --- NDVI 差異圖區塊 (康芮颱風) ---
-    st.header("🌿 康芮颱風造成 NDVI 值變化差異圖")
-    if kangrui_img_bef and kangrui_img_aft:
-        ndvi_bef = kangrui_img_bef.normalizedDifference(['B8', 'B4']).rename('NDVI_Before')
-        ndvi_aft = kangrui_img_aft.normalizedDifference(['B8', 'B4']).rename('NDVI_After')
-        ndvi_diff = ndvi_aft.subtract(ndvi_bef).rename('NDVI_Diff')
-
-        ndvi_vis = {
-            'min': -1,
-            'max': 1,
-            'palette': ['red', 'white', 'green'] # 紅色表示減少，綠色表示增加
-        }
-
-        ndvi_map = geemap.Map()
-        ndvi_map.centerObject(ndvi_diff.geometry(), 13)
-        ndvi_map.addLayer(ndvi_diff, ndvi_vis, 'NDVI 差異圖 (災後 - 災前)')
-        ndvi_map.add_colorbar(ndvi_vis, label="NDVI 差異", orientation="horizontal", layer_name='NDVI 差異')
-        ndvi_map.to_streamlit(height=600)
-    else:
-        st.info("由於缺乏康芮颱風前後影像，無法顯示 NDVI 差異圖。")
-
-    st.markdown("---") # 分隔線
-
-@st.cache_data
-def load_and_process_hotel_shp(url):
-    zip_path = "hotel_love.zip" # 直接在當前工作目錄下載
-    extract_dir = "hotel_data" # 創建一個專門的資料夾來解壓縮
-
-    # 確保下載目錄存在（如果 Streamlit Cloud 清理 /tmp 以外的目錄）
-    os.makedirs(extract_dir, exist_ok=True)
-
-    # 下載 ZIP 文件
-    try:
-        r = requests.get(url, stream=True)
-        r.raise_for_status() # 檢查 HTTP 請求是否成功
-        with open(zip_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-    except requests.exceptions.RequestException as e:
-        st.error(f"下載失敗: {e}")
-        return None
-
-    # 解壓縮 ZIP 文件
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-    except zipfile.BadZipFile:
-        st.error(f"'{zip_path}' 不是一個有效的 ZIP 文件。")
-        return None
-    except Exception as e:
-        st.error(f"解壓縮失敗: {e}")
-        return None
-
-    # 尋找 .shp 文件
-    shp_file_path = None
-    for root, _, files in os.walk(extract_dir):
-        for file in files:
-            if file.endswith(".shp"):
-                shp_file_path = os.path.join(root, file)
-                break
-        if shp_file_path:
-            break
-
-    if shp_file_path is None:
-        st.error("在解壓縮的資料夾中找不到 .shp 文件。")
-        return None
-
-    # 讀取 GeoDataFrame 並處理 CRS
-    try:
-        gdf = gpd.read_file(shp_file_path)
-        # CRS 轉換
-        if gdf.crs is None:
-            # 假設您的民宿資料是WGS84 (EPSG:4326)，如果不是，請修改這裡
-            gdf = gdf.set_crs("EPSG:4326", allow_override=True)
-        elif gdf.crs != "EPSG:4326":
-            gdf = gdf.to_crs("EPSG:4326")
-        return gdf
-    except Exception as e:
-        st.error(f"讀取或處理 SHP 文件失敗: {e}")
-        return None
-        
-    st.header("⛰️ 崩塌範圍圖層")
-    st.write("---")
-    collapse110_zip_url = "https://raw.githubusercontent.com/Lwyi2929/MEOVV/474afe38979b8bf19bf640acce7289ad48d1f786/collapse110.zip"
-    gdf_collapse110 = load_and_process_shp(collapse110_zip_url)
-    if gdf_collapse110 is not None:
-        my_Map.add_gdf(gdf_collapse110, layer_name='崩塌範圍 (110年)', zoom_to_layer=False)
-    else:
-        st.warning("未能載入崩塌圖資，地圖上可能不會顯示。")
-
-    # 顯示地圖
-    my_Map.to_streamlit(height=600)
+    # 事件清單由 events.toml 設定；每個事件一個分頁，只有開啟中的分頁會查詢場景與輸出地圖
+    events = load_catalog()
+    tabs = lazy_tabs([f"{event.icon} {event.name} ({event.year})" for event in events] + ["📊 受損面積總表"],
+                     key="event_tab")
+    for event, tab in zip(events, tabs):
+        if tab.open:
+            with tab:
+                with st.spinner("正在載入災前災後影像..."):
+                    event_section(event, vis_params)
+    if tabs[-1].open:
+        with tabs[-1]:
+            with st.spinner("正在統計受損面積..."):
+                damage_section(events)
+
+    finish_rerun()
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,20 @@
 import streamlit as st
-import ee
-from google.oauth2 import service_account
-import geemap.foliumap as geemap
-import geopandas as gpd # 由於您需要讀取 shp，geopandas 還是需要的
-import requests
-import zipfile
-import os
+
+from core import media
+from core.classifier import default_service, default_spec
+from core.config import POINT_COORDS
+from core.geodata import load_vector
+from core.hotel_risk import default_sampler, landslide_proximity, risk_layer, risk_table
+from core.instrumentation import begin_rerun, cache_data, finish_rerun, timed
+from core.pipeline import classify_years, tile_layer
+from core.sections import cached_map
+from core.session import lazy_import, require_ee
+from core.vector_layers import geojson_layer, point_cluster_layer
+
+# 地圖套件很大，第一次建立地圖時才匯入
+geemap = lazy_import("geemap.foliumap")
+
+begin_rerun()
 
 st.title("⛰️ 清境農場歷年遊憩據點人次統計")
 st.subheader("""
@@ -15,49 +24,20 @@ st.write("""
 資料來源:交通部觀光署觀光統計資料庫
 """)
 # Display the image
-st.image("tourists.png", caption="Annual tourist visits to Qingjing Farm",use_container_width=True)
-
-
-# 從 Streamlit Secrets 讀取 GEE 服務帳戶金鑰 JSON
-service_account_info = st.secrets["GEE_SERVICE_ACCOUNT"]
+media.image("tourists.png", caption="Annual tourist visits to Qingjing Farm")
 
-# 使用 google-auth 進行 GEE 授權
-credentials = service_account.Credentials.from_service_account_info(
-    service_account_info,
-    scopes=["https://www.googleapis.com/auth/earthengine"]
-)
 
-# 初始化 Earth Engine
-ee.Initialize(credentials)
+# 初始化 Earth Engine（每個 process 一次，見 core.session）
+require_ee()
 
 st.title("民宿點位")
 
-# 定義研究區域
-roi = ee.Geometry.Rectangle([121.116451, 24.020390, 121.21, 24.09])
-my_point = ee.Geometry.Point([121.1617, 24.0495]);
-# 擷取 Sentinel-2 影像
-image = (
-    ee.ImageCollection("COPERNICUS/S2_HARMONIZED")
-    .filterBounds(my_point)
-    .filterDate("2021-01-01", "2022-01-01")
-    .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-    .sort("CLOUDY_PIXEL_PERCENTAGE")
-    .first()
-    .clip(roi)
-    .select('B.*')
-)
+# 民宿土地覆蓋比較的年份
+HOTEL_YEARS = [2016, 2018, 2024]
 
 # 可視化參數
 vis_params = {'min': 100, 'max': 3500, 'bands': ['B11', 'B8', 'B3']}
 
-# 讀取 ESA WorldCover 2021 土地覆蓋圖層
-my_lc = ee.Image('ESA/WorldCover/v200/2021').clip(roi)
-
-# Remap 土地覆蓋類別
-classValues = [10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 100]
-remapValues = ee.List.sequence(0, 10)
-my_lc = my_lc.remap(classValues, remapValues, bandName='Map').rename('lc').toByte()
-
 # 土地覆蓋視覺化參數
 classVis = {
     'min': 0,
@@ -67,123 +47,100 @@ classVis = {
         'b4b4b4', 'f0f0f0', '0064c8', '0096a0', '00cf75', 'fae6a0'
     ]
 }
-#隨機採樣
-label = 'lc'
-sample = image.addBands(my_lc).stratifiedSample(**{
-        'numPoints': 10000,
-        'classBand': label,
-        'region': roi,
-        'scale': 10,
-        'geometries': True
-    })
-#訓練
-sample = sample.randomColumn()
-trainingSample = sample.filter('random <= 0.8')
-validationSample = sample.filter('random > 0.8')
-
-my_trainedClassifier = ee.Classifier.smileRandomForest(numberOfTrees=100).train(**{
-    'features': trainingSample,
-    'classProperty': 'lc',
-    'inputProperties': image.bandNames()
-})
-# 取得 2024 年影像並進行處理
-my_newimg_2024 = (
-    ee.ImageCollection('COPERNICUS/S2_HARMONIZED')
-    .filterBounds(my_point)
-    .filterDate('2024-01-01', '2024-12-31')
-    .sort('CLOUDY_PIXEL_PERCENTAGE')
-    .first()
-    .clip(roi)
-    .select('B.*')
-)
-# 分類
-my_newimgClassified2024 = my_newimg_2024.classify(my_trainedClassifier)
-
-# --- 地圖創建與圖層添加 ---
-my_Map = geemap.Map() # 創建 geemap 的地圖物件
-my_Map.centerObject(my_newimg_2024, 15) # 將地圖中心設置到 2024 影像上
-
-# 添加 Earth Engine 圖層 (geemap 的 addLayer 是 add_ee_layer 的別名)
-my_Map.addLayer(my_newimg_2024, vis_params, "Sentinel-2")
-my_Map.addLayer(my_newimgClassified2024, classVis, 'Classified_smileRandomForest')
-
-
-# --- 下載並處理合法民宿 SHP 文件 ---
-# 使用 st.cache_data 緩存下載和處理過程，避免每次執行都重複下載解壓縮
-@st.cache_data
-def load_and_process_hotel_shp(url):
-    zip_path = "hotel_love.zip" # 直接在當前工作目錄下載
-    extract_dir = "hotel_data" # 創建一個專門的資料夾來解壓縮
-
-    # 確保下載目錄存在（如果 Streamlit Cloud 清理 /tmp 以外的目錄）
-    os.makedirs(extract_dir, exist_ok=True)
-
-    # 下載 ZIP 文件
-    try:
-        r = requests.get(url, stream=True)
-        r.raise_for_status() # 檢查 HTTP 請求是否成功
-        with open(zip_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-    except requests.exceptions.RequestException as e:
-        st.error(f"下載失敗: {e}")
-        return None
+# 訓練好的分類器存在共用的 registry，rerun 與其他頁面不需重新取樣、訓練
+trained = default_service().get(default_spec())
+my_trainedClassifier = trained.classifier
 
-    # 解壓縮 ZIP 文件
+
+# --- 合法民宿點位 ---
+# 共用的圖資載入器：優先讀取專案內附的 zip，轉換後的 GeoParquet 快取在 .cache/geodata
+# （本機檔案已經由各 process 共用，不另外放進跨 process 快取）
+@cache_data(shared=False)
+def load_hotels():
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-    except zipfile.BadZipFile:
-        st.error(f"'{zip_path}' 不是一個有效的 ZIP 文件。")
-        return None
+        return load_vector("hotels")
     except Exception as e:
-        st.error(f"解壓縮失敗: {e}")
+        st.error(f"載入合法民宿點位失敗: {e}")
         return None
 
-    # 尋找 .shp 文件
-    shp_file_path = None
-    for root, _, files in os.walk(extract_dir):
-        for file in files:
-            if file.endswith(".shp"):
-                shp_file_path = os.path.join(root, file)
-                break
-        if shp_file_path:
-            break
-
-    if shp_file_path is None:
-        st.error("在解壓縮的資料夾中找不到 .shp 文件。")
-        return None
+with timed("hotels.load"):
+    gdf_hotels = load_hotels()
+if gdf_hotels is None:
+    st.warning("未能載入合法民宿點位，地圖上可能不會顯示。")
 
-    # 讀取 GeoDataFrame 並處理 CRS
+
+# --- 民宿與崩塌區、土地覆蓋 ---
+@cache_data(shared=False)
+def load_landslides():
     try:
-        gdf = gpd.read_file(shp_file_path)
-        # CRS 轉換
-        if gdf.crs is None:
-            # 假設您的民宿資料是WGS84 (EPSG:4326)，如果不是，請修改這裡
-            gdf = gdf.set_crs("EPSG:4326", allow_override=True)
-        elif gdf.crs != "EPSG:4326":
-            gdf = gdf.to_crs("EPSG:4326")
-        return gdf
+        return load_vector("collapse110")
     except Exception as e:
-        st.error(f"讀取或處理 SHP 文件失敗: {e}")
+        st.warning(f"未能載入崩塌圖資: {e}")
         return None
 
-# 調用緩存的函數來獲取 gdf
-hotel_zip_url = "https://raw.githubusercontent.com/Lwyi2929/MEOVV/refs/heads/main/hotel_love.zip"
-gdf_hotels = load_and_process_hotel_shp(hotel_zip_url)
+gdf_landslides = load_landslides()
 
-if gdf_hotels is not None:
-    # 使用 geemap 的 add_gdf 方法添加 GeoDataFrame
-    # geemap 內部會處理 folium 的 GeoJson
-    my_Map.add_gdf(gdf_hotels, layer_name='合法民宿')
-else:
-    st.warning("未能載入合法民宿點位，地圖上可能不會顯示。")
 
-# 添加圖例
-my_Map.add_legend(title='ESA Land Cover Type', builtin_legend='ESA_WorldCover')
+def build_hotel_map(hotel_table):
+    # 取得 2024 年影像並分類（與第 3 頁共用同一個多年度流程）
+    yearly = classify_years([2024], my_trainedClassifier, vis_params, classVis)
+    if 2024 not in yearly.metadata:
+        st.error("2024 年在指定區域內未找到 Sentinel-2 影像。")
+        return None
 
-# 顯示地圖
-my_Map.to_streamlit(height=600)
+    # --- 地圖創建與圖層添加 ---
+    my_Map = geemap.Map() # 創建 geemap 的地圖物件
+    my_Map.set_center(*POINT_COORDS, 15) # 將地圖中心設置到研究區域中心點
+
+    # 圖層網址已由流程並行取得，直接建立圖磚圖層；失敗的圖層只顯示錯誤
+    for name, error in yearly.url_errors.items():
+        st.error(f"取得圖層失敗 ({name}): {error}")
+    for name, title in [((2024, 'image'), "Sentinel-2"), ((2024, 'classified'), 'Classified_smileRandomForest')]:
+        if name in yearly.urls:
+            tile_layer(yearly.urls[name], title).add_to(my_Map)
+
+    if gdf_hotels is not None:
+        # 點位只傳送座標陣列，由瀏覽器端叢集
+        point_cluster_layer(gdf_hotels, '合法民宿').add_to(my_Map)
+    if gdf_landslides is not None:
+        # 依地圖縮放層級簡化、量化後的精簡 GeoJSON；設定圖磚代理時改由代理提供，不內嵌在頁面中
+        geojson_layer(gdf_landslides, '崩塌範圍 (110年)', zoom=15).add_to(my_Map)
+    if hotel_table is not None:
+        risk_layer(hotel_table).add_to(my_Map)
+
+    # 添加圖例
+    my_Map.add_legend(title='ESA Land Cover Type', builtin_legend='ESA_WorldCover')
+    return my_Map
+
+
+@st.fragment
+def hotel_section():
+    """鄰近距離只影響這個區段：拖動滑桿時只重跑此處，地圖 HTML 依距離保留在 session 內。"""
+    hotel_table = None
+    distance_m = None
+    if gdf_hotels is not None:
+        distance_m = st.slider("崩塌區鄰近距離（公尺）", 0, 500, 100, step=25)
+        inside, near, distance = landslide_proximity(gdf_hotels, gdf_landslides, distance_m)
+        # 各年份土地覆蓋以一次 sampleRegions 取回並快取；只有未命中時才建立分類影像
+        hotel_landcover = default_sampler().get(
+            HOTEL_YEARS, trained.key, gdf_hotels,
+            lambda years: classify_years(years, my_trainedClassifier, with_tiles=False).classified,
+        )
+        hotel_table = risk_table(gdf_hotels, inside, near, distance, hotel_landcover)
+
+    # 顯示地圖
+    cached_map(("hotels", distance_m, trained.key), lambda: build_hotel_map(hotel_table),
+               height=600, name="hotels")
+
+    if hotel_table is not None:
+        st.subheader(f"崩塌區 {distance_m} 公尺內的民宿：{int(hotel_table['鄰近崩塌區'].sum())} 家"
+                     f"（位於崩塌區內 {int(hotel_table['位於崩塌區'].sum())} 家）")
+        st.dataframe(hotel_table, hide_index=True)
+
+
+hotel_section()
 st.write("""
 資料來源:政府開放資料平台
 """)
+
+finish_rerun()
@@ -1,19 +1,25 @@
 import streamlit as st
 import ee
-from google.oauth2 import service_account
-import geemap.foliumap as geemap
 
-# 從 Streamlit Secrets 讀取 GEE 服務帳戶金鑰 JSON
-service_account_info = st.secrets["GEE_SERVICE_ACCOUNT"]
+from core.accuracy import confusion_frame, f1_frame
+from core.accuracy import summary as accuracy_summary
+from core.area_stats import default_engine, format_areas, to_frame
+from core.classifier import default_service, default_spec
+from core.instrumentation import begin_rerun, cache_data, finish_rerun
+from core.pipeline import classify_years, fetch_metadata, roi_center, tile_layer, tile_urls, year_collection
+from core.sections import cached_map, lazy_tabs
+from core.session import lazy_import, require_ee
+from core.transitions import changes_frame, sankey_figure
+from core.transitions import default_engine as default_transition_engine
+from core.transitions import to_frame as transition_frame
 
-# 使用 google-auth 進行 GEE 授權
-credentials = service_account.Credentials.from_service_account_info(
-    service_account_info,
-    scopes=["https://www.googleapis.com/auth/earthengine"]
-)
+# 地圖套件很大，第一次建立地圖時才匯入
+geemap = lazy_import("geemap.foliumap")
+
+begin_rerun()
 
-# 初始化 Earth Engine
-ee.Initialize(credentials)
+# 初始化 Earth Engine（每個 process 一次，見 core.session）
+require_ee()
 
 # Streamlit 設定
 st.set_page_config(layout="wide")
@@ -59,178 +65,202 @@ classVis = {
     ]
 }
 
-# 建立地圖並添加圖層
-my_Map = geemap.Map()
-left_layer = geemap.ee_tile_layer(image, vis_params, 'Sentinel-2 false color')
-right_layer = geemap.ee_tile_layer(my_lc, classVis, "ESA WorldCover")
-my_Map.split_map(left_layer, right_layer)
-my_Map.add_legend(title='ESA Land Cover Type', builtin_legend='ESA_WorldCover')
-my_Map.centerObject(roi, 12)
+st.title("歷年土地利用分類")
 
-# 顯示地圖
-my_Map.to_streamlit(height=600)
+# 各年份說明
+year_captions = {
+    2016: "禁限建令施行後",
+    2018: "禁限建令解禁",
+    2024: "禁限建令解禁後多年",
+}
+selected_years = st.multiselect(
+    "選擇年份",
+    options=list(range(2016, 2026)),
+    default=[2016, 2018, 2024],
+)
+selected_years = sorted(selected_years)
 
-st.title("2016/2018/2024年土地利用分類")
 
+# 各年份影像資訊（一次請求）；同一組年份在所有 process 共用（core.shared_cache），分頁切換與 rerun 不再送出
+@cache_data(ttl=3600)
+def year_metadata(years):
+    return fetch_metadata(year_collection(list(years)))
 
-st.write("""
-🌍2016年土地利用分析_禁限建令施行後
-""")
 
-#隨機採樣
-label = 'lc' 
-sample = image.addBands(my_lc).stratifiedSample(**{
-        'numPoints': 10000,
-        'classBand': label,
-        'region': roi,            # ✅ 使用 roi
-        'scale': 10,
-        'geometries': True
-    })
-#訓練
-sample = sample.randomColumn()
-trainingSample = sample.filter('random <= 0.8')
-validationSample = sample.filter('random > 0.8')
-
-my_trainedClassifier = ee.Classifier.smileRandomForest(numberOfTrees=100).train(**{
-    'features': trainingSample,
-    'classProperty': 'lc',
-    'inputProperties': image.bandNames()
-})
-# 取得 2016 年影像並進行處理
-my_newimg_2016 = (
-    ee.ImageCollection('COPERNICUS/S2_HARMONIZED')
-    .filterBounds(my_point)
-    .filterDate('2016-01-01', '2016-12-31')
-    .sort('CLOUDY_PIXEL_PERCENTAGE')
-    .first()
-    .clip(roi)
-    .select('B.*')
-)
-# 分類
-my_newimgClassified2016 = my_newimg_2016.classify(my_trainedClassifier)
+# 訓練好的分類器存在共用的 registry，rerun 與其他頁面不需重新取樣、訓練
+trained = default_service().get(default_spec())
+my_trainedClassifier = trained.classifier
 
-# 顯示地圖
-my_Map = geemap.Map()
-my_Map.centerObject(my_newimg_2016, 12)
-my_Map.addLayer(my_newimg_2016, vis_params, "Sentinel-2")
-my_Map.addLayer(my_newimgClassified2016, classVis, 'Classified_smileRandomForest')
-my_Map.add_legend(title='ESA Land Cover Type', builtin_legend='ESA_WorldCover')
-my_Map.to_streamlit(height=600)
+metadata = year_metadata(tuple(selected_years)) if selected_years else {}
+for year in selected_years:
+    if year not in metadata:
+        st.warning(f"{year} 年在指定區域內未找到 Sentinel-2 影像。")
+available_years = [year for year in selected_years if year in metadata]
 
-st.write("""
-10 Tree:60.22平方公里 ；30 Grassland:11.43平方公里 :40 Cropland:0.85平方公里 ；50 Built-up:0.66平方公里 ；80 Open Water:0.19平方公里
 
-""")
+def classified_years(years):
+    """選定年份的分類影像（只建立運算式，不取圖磚網址）。"""
+    return classify_years(years, my_trainedClassifier, with_tiles=False, metadata=metadata)
 
-st.write("""
-🌍2018年土地利用分析_禁限建令解禁
-""")
-# 取得 2018 年影像並進行處理
-my_newimg_2018 = (
-    ee.ImageCollection('COPERNICUS/S2_HARMONIZED')
-    .filterBounds(my_point)
-    .filterDate('2018-01-01', '2018-12-31')
-    .sort('CLOUDY_PIXEL_PERCENTAGE')
-    .first()
-    .clip(roi)
-    .select('B.*')
-)
-# 分類
-my_newimgClassified2018 = my_newimg_2018.classify(my_trainedClassifier)
-
-# 顯示地圖
-my_Map = geemap.Map()
-my_Map.centerObject(my_newimg_2018, 12)
-my_Map.addLayer(my_newimg_2018, vis_params, "Sentinel-2")
-my_Map.addLayer(my_newimgClassified2018, classVis, 'Classified_smileRandomForest')
-my_Map.add_legend(title='ESA Land Cover Type', builtin_legend='ESA_WorldCover')
-my_Map.to_streamlit(height=600)
-st.write("""
-10 Tree:58.88平方公里 ；30 Grassland:12.86平方公里 :40 Cropland:0.91平方公里 ；50 Built-up:0.53平方公里 ；80 Open Water:0.18平方公里
 
-""")
-st.write("""
-🌍2024年土地利用分析_禁限建令解禁後多年
-""")
-# 取得 2024 年影像並進行處理
-my_newimg_2024 = (
-    ee.ImageCollection('COPERNICUS/S2_HARMONIZED')
-    .filterBounds(my_point)
-    .filterDate('2024-01-01', '2024-12-31')
-    .sort('CLOUDY_PIXEL_PERCENTAGE')
-    .first()
-    .clip(roi)
-    .select('B.*')
-)
-# 分類
-my_newimgClassified2024 = my_newimg_2024.classify(my_trainedClassifier)
-
-# 顯示地圖
-my_Map = geemap.Map()
-my_Map.centerObject(my_newimg_2024, 12)
-my_Map.addLayer(my_newimg_2024, vis_params, "Sentinel-2")
-my_Map.addLayer(my_newimgClassified2024, classVis, 'Classified_smileRandomForest')
-my_Map.add_legend(title='ESA Land Cover Type', builtin_legend='ESA_WorldCover')
-my_Map.to_streamlit(height=600)
-st.write("""
-10 Tree:51.40平方公里 ；30 Grassland:16.12平方公里 :40 Cropland:3.93平方公里 ；50 Built-up:1.55平方公里 ；80 Open Water:0.35平方公里
+def yearly_area_stats():
+    # 各年份各類別面積：所有年份合併成一次請求，並依 (年份, 分類器, ROI) 快取
+    yearly = classified_years(available_years)
+    return default_engine().get(yearly.classified, trained.key) if yearly.years else {}
 
-""")
 
+def build_reference_map():
+    # 圖磚網址經過 map ID 快取，rerun 不會重新送出 getMapId
+    reference = tile_urls({
+        'image': (image, vis_params),
+        'lc': (my_lc, classVis),
+    })
+    for name, error in reference.errors.items():
+        st.error(f"取得圖層失敗 ({name}): {error}")
+    reference_map = geemap.Map()
+    layers = [
+        tile_layer(reference.values[name], title)
+        for name, title in [('image', 'Sentinel-2 false color'), ('lc', "ESA WorldCover")]
+        if name in reference.values
+    ]
+    if len(layers) == 2:
+        reference_map.split_map(*layers)
+    elif layers:
+        layers[0].add_to(reference_map)
+    reference_map.add_legend(title='ESA Land Cover Type', builtin_legend='ESA_WorldCover')
+    reference_map.set_center(*roi_center(), 12)
+    return reference_map
+
+
+def build_year_map(year):
+    yearly = classify_years([year], my_trainedClassifier, vis_params, classVis, metadata=metadata)
+    year_map = geemap.Map()
+    year_map.set_center(*roi_center(), 12)
+    for name, error in yearly.url_errors.items():
+        st.error(f"取得圖層失敗 ({name}): {error}")
+    for name, title in [((year, 'image'), "Sentinel-2"), ((year, 'classified'), 'Classified_smileRandomForest')]:
+        if name in yearly.urls:
+            tile_layer(yearly.urls[name], title).add_to(year_map)
+    year_map.add_legend(title='ESA Land Cover Type', builtin_legend='ESA_WorldCover')
+    return year_map
+
+
+@st.fragment
+def year_section(years):
+    """一次顯示一個年份的分類地圖；切換年份只重跑這個區段。"""
+    year = st.radio("年份", years, horizontal=True, key="year_map")
+    st.write(f"""
+🌍{year}年土地利用分析{"_" + year_captions[year] if year in year_captions else ""}
+""")
+    cached_map(("year", year, trained.key), lambda: build_year_map(year), height=600, name=f"year.{year}")
+    areas = yearly_area_stats().get(year)
+    if areas:
+        st.write(format_areas(areas))
+    else:
+        st.info(f"{year} 年沒有面積統計結果。")
+
+
+@st.fragment
+def transition_section(years):
+    """土地覆蓋轉移：兩個年份的所有 (前期 → 後期) 面積由一次分組加總取得；選擇年份只重跑這個區段。"""
+    col_from, col_to = st.columns(2)
+    year_from = col_from.selectbox("前期年份", years, index=0)
+    year_to = col_to.selectbox("後期年份", years, index=len(years) - 1)
+    if year_from == year_to:
+        st.info("請選擇兩個不同的年份。")
+        return
+    pair = (year_from, year_to)
+    classified = classified_years([year_from, year_to]).classified
+    matrix = default_transition_engine().get(classified, [pair], trained.key)[pair]
+    st.plotly_chart(sankey_figure(matrix, year_from, year_to), use_container_width=True)
+    st.write(f"{year_from} → {year_to} 類別改變的面積（平方公里）")
+    st.dataframe(changes_frame(matrix), hide_index=True)
+    with st.expander("📋 完整轉移矩陣（列：前期，欄：後期）"):
+        st.dataframe(transition_frame(matrix, min_area=0.01))
+
+
+# 只有開啟中的分頁會送出 Earth Engine 請求與輸出地圖；地圖 HTML 在 session 內保留
+tab_years, tab_reference, tab_change, tab_transition = lazy_tabs(
+    ["🌍 歷年土地利用分類", "🗺️ 參考影像與 WorldCover", "📈 環境變遷分析", "🔀 土地覆蓋轉移"],
+    key="landuse_tab",
+)
 
-#環境變遷
-import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as font_manager
-import numpy as np
-import os
-
-
-# 標題
-st.title("🌍 環境變遷分析：土地使用變化")
-
-# 資料建立
-data = {
-    '類別': ['10 Trees', '30 Grassland', '40 Cropland', '50 Built-up', '80 Open water'],
-    '2016': [60.22, 11.43, 0.85, 0.66, 0.19],
-    '2018': [58.88, 12.86, 0.91, 0.53, 0.18],
-    '2024': [51.40, 16.12, 3.93, 1.55, 0.35]
-}
-df = pd.DataFrame(data)
-
-# 畫圖
-fig, ax = plt.subplots(figsize=(10, 6))
-x = np.arange(len(df['類別']))
-width = 0.25
-
-bars1 = ax.bar(x - width, df['2016'], width, label='2016')
-bars2 = ax.bar(x, df['2018'], width, label='2018')
-bars3 = ax.bar(x + width, df['2024'], width, label='2024')
-
-ax.set_xlabel("Land classification")
-ax.set_ylabel("Area (square kilometers)")
-ax.set_xticks(x)
-ax.set_xticklabels(df['類別'])
-ax.legend(title="Year")
-
-# 數值標註
-def add_labels(bars):
-    for bar in bars:
-        height = bar.get_height()
-        ax.annotate(f'{height:.2f}',
-                    xy=(bar.get_x() + bar.get_width() / 2, height),
-                    xytext=(0, 3),
-                    textcoords="offset points",
-                    ha='center', va='bottom')
-
-add_labels(bars1)
-add_labels(bars2)
-add_labels(bars3)
-
-plt.tight_layout()
-st.pyplot(fig)
-
-# 顯示原始資料表
-with st.expander("📋 顯示原始資料表"):
-    st.dataframe(df)
+if tab_years.open:
+    with tab_years:
+        if available_years:
+            year_section(available_years)
+
+        # 驗證樣本（random > 0.8）的精度與訓練一起取回，隨分類器快取
+        if trained.accuracy:
+            with st.expander("🎯 分類精度（驗證樣本）"):
+                overall, kappa, count = accuracy_summary(trained.accuracy)
+                col_oa, col_kappa, col_count = st.columns(3)
+                col_oa.metric("整體精度", f"{overall:.1%}")
+                col_kappa.metric("Kappa", f"{kappa:.3f}")
+                col_count.metric("驗證樣本數", count or "-")
+                st.dataframe(f1_frame(trained.accuracy), hide_index=True)
+                st.write("混淆矩陣（列：實際類別，欄：預測類別）")
+                st.dataframe(confusion_frame(trained.accuracy))
+
+if tab_reference.open:
+    with tab_reference:
+        # 顯示地圖
+        cached_map("reference", build_reference_map, height=600, name="reference")
+
+if tab_change.open:
+    with tab_change:
+        #環境變遷
+        import matplotlib.pyplot as plt
+        import numpy as np
+
+        # 標題
+        st.title("🌍 環境變遷分析：土地使用變化")
+        area_stats = yearly_area_stats()
+        if not area_stats:
+            st.info("請至少選擇一個有影像的年份。")
+        else:
+            # 資料建立（由面積統計產生，不再手動輸入）
+            df = to_frame(area_stats, min_area=0.1)
+            years = [str(year) for year in area_stats]
+
+            # 畫圖
+            fig, ax = plt.subplots(figsize=(10, 6))
+            x = np.arange(len(df['類別']))
+            width = 0.8 / len(years)
+
+            # 數值標註
+            def add_labels(bars):
+                for bar in bars:
+                    height = bar.get_height()
+                    ax.annotate(f'{height:.2f}',
+                                xy=(bar.get_x() + bar.get_width() / 2, height),
+                                xytext=(0, 3),
+                                textcoords="offset points",
+                                ha='center', va='bottom')
+
+            for i, year in enumerate(years):
+                bars = ax.bar(x + (i - (len(years) - 1) / 2) * width, df[year], width, label=year)
+                add_labels(bars)
+
+            ax.set_xlabel("Land classification")
+            ax.set_ylabel("Area (square kilometers)")
+            ax.set_xticks(x)
+            ax.set_xticklabels(df['類別'])
+            ax.legend(title="Year")
+
+            plt.tight_layout()
+            st.pyplot(fig)
+
+            # 顯示原始資料表
+            with st.expander("📋 顯示原始資料表"):
+                st.dataframe(df)
+
+if tab_transition.open:
+    with tab_transition:
+        st.title("🔀 土地覆蓋轉移")
+        if len(available_years) >= 2:
+            transition_section(available_years)
+        else:
+            st.info("請至少選擇兩個有影像的年份。")
+
+finish_rerun()
@@ -0,0 +1,196 @@
+"""
+預先計算各頁面需要的 Earth Engine 成果，寫入 artifacts/ 的新版本目錄。
+
+頁面會先讀取這些成果，只有缺少時才即時計算，讓第一位訪客也不必等待。
+可由 cron 定期執行，例如每 3 小時（map ID 約 4 小時後到期）：
+
+    0 */3 * * *  cd /path/to/MEOVV && python prepare.py
+
+Earth Engine 金鑰依序讀取環境變數 GEE_SERVICE_ACCOUNT（JSON 字串或檔案路徑）
+與 .streamlit/secrets.toml 的 [GEE_SERVICE_ACCOUNT]（見 core.session）。
+"""
+import argparse
+import os
+import sys
+import time
+from functools import partial
+
+import ee
+import requests
+
+from core import config, media
+from core.area_stats import AreaStatsEngine
+from core.artifacts import ArtifactWriter
+from core.change_detection import DIFF_VIS, INDICES, ChangeDetectionEngine, change_image, diff_band
+from core.classifier import ClassifierService, default_spec
+from core.events import load_catalog
+from core.fetch import fetch_all
+from core.geodata import GeoDataLoader
+from core.map_ids import layer_key, request_map_id
+from core.pipeline import classify_years, year_end
+from core.scenes import SceneQuery, SceneResolver
+from core.session import ensure_ee
+from core.tile_proxy import tile_ttl
+from core.transitions import TransitionEngine
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def initialize_ee():
+    # 與頁面共用 core.session：每個 process 只初始化一次
+    ensure_ee()
+
+
+def log(message):
+    print(f"[prepare {time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+def prepare_events(writer):
+    """第 1 頁：事件場景、受損面積統計，回傳需要 map ID 與縮圖的圖層。"""
+    resolver = SceneResolver(cache_dir=writer.kind_dir("scenes"), use_artifacts=False)
+    events = load_catalog()
+    queries = {
+        (event.id, phase): SceneQuery(event.point, event.roi, *window)
+        for event in events
+        for phase, window in (("pre", event.pre), ("post", event.post))
+    }
+    fetched = fetch_all({name: partial(resolver.resolve, q) for name, q in queries.items()}, max_workers=4)
+    for name, error in fetched.errors.items():
+        log(f"場景查詢失敗 {name}: {error}")
+    writer.note("scenes", len(fetched.values))
+
+    layers, changes = {}, {}
+    for event in events:
+        pre, post = fetched.values.get((event.id, "pre")), fetched.values.get((event.id, "post"))
+        for phase, scene in (("pre", pre), ("post", post)):
+            if scene:
+                layers[f"{event.id}-{phase}"] = (scene.to_image(), config.VIS_PARAMS)
+        if pre and post:
+            change = change_image(pre.to_image(), post.to_image())
+            changes[event.id] = (event, change, (pre.id, post.id))
+            for index_name in INDICES:
+                layers[f"{event.id}-{index_name}"] = (change.select(diff_band(index_name)), DIFF_VIS)
+    if changes:
+        ChangeDetectionEngine(cache_dir=writer.kind_dir("change_stats"), use_artifacts=False).statistics(changes)
+        writer.note("change_stats", len(changes))
+    log(f"事件 {len(events)} 個，圖層 {len(layers)} 個")
+    return layers
+
+
+def prepare_classification(writer, years):
+    """第 2、3 頁：訓練分類器、多年度分類與面積統計。"""
+    service = ClassifierService(registry_dir=writer.kind_dir("classifiers"), use_artifacts=False)
+    trained = service.get(default_spec())
+    writer.note("classifiers")
+    yearly = classify_years(years, trained.classifier, with_tiles=False)
+    missing = sorted(set(years) - set(yearly.years))
+    if missing:
+        log(f"找不到影像的年份: {missing}")
+    if yearly.years:
+        AreaStatsEngine(cache_dir=writer.kind_dir("area_stats"), use_artifacts=False).get(
+            yearly.classified, trained.key)
+        writer.note("area_stats", len(yearly.years))
+        # 第 3 頁可任選兩個年份，所有年份對合併成一次請求
+        pairs = [(a, b) for i, a in enumerate(yearly.years) for b in yearly.years[i + 1:]]
+        if pairs:
+            TransitionEngine(cache_dir=writer.kind_dir("transitions"), use_artifacts=False).get(
+                yearly.classified, pairs, trained.key)
+            writer.note("transitions", len(pairs))
+
+    layers = {}
+    data_end = {}
+    for year in yearly.years:
+        layers[f"{year}-image"] = (yearly.images[year], config.VIS_PARAMS)
+        layers[f"{year}-classified"] = (yearly.classified[year], config.CLASS_VIS)
+        data_end[f"{year}-image"] = data_end[f"{year}-classified"] = year_end(year)
+    log(f"分類年份 {yearly.years}")
+    return layers, data_end
+
+
+def prepare_map_ids(writer, layers, data_end=None):
+    """data_end: {圖層名稱: 資料期間結束日}，涵蓋最近幾天的圖層另外記錄圖磚代理的 tile_ttl。"""
+    data_end = data_end or {}
+    fetched = fetch_all({
+        name: partial(request_map_id, image, vis) for name, (image, vis) in layers.items()
+    }, max_workers=8)
+    for name, (image, vis) in layers.items():
+        if name in fetched.values:
+            entry = {"name": name, **fetched.values[name]}
+            ttl = tile_ttl(data_end.get(name))
+            if ttl:
+                entry["tile_ttl"] = ttl
+            writer.write_json("map_ids", layer_key(image, vis), entry)
+        else:
+            log(f"map ID 失敗 {name}: {fetched.errors[name]}")
+
+
+def download_thumbnail(image, vis, size):
+    url = ee.Image(image).getThumbURL({
+        **vis,
+        "dimensions": size,
+        "region": ee.Geometry.Rectangle(config.ROI_COORDS),
+        "format": "png",
+    })
+    response = requests.get(url, timeout=60)
+    response.raise_for_status()
+    return response.content
+
+
+def prepare_thumbnails(writer, layers, size):
+    fetched = fetch_all({
+        name: partial(download_thumbnail, image, vis, size) for name, (image, vis) in layers.items()
+    }, max_workers=8)
+    for name, data in fetched.values.items():
+        writer.write_bytes("thumbnails", f"{name}.png", data)
+    for name, error in fetched.errors.items():
+        log(f"縮圖失敗 {name}: {error}")
+
+
+def prepare_vectors(writer):
+    """第 2 頁：合法民宿點位與崩塌範圍。"""
+    loader = GeoDataLoader(use_artifacts=False)
+    for name, label in [("hotels", "合法民宿"), ("collapse110", "崩塌範圍 (110年)")]:
+        gdf = loader.load(name)
+        writer.write_vector(name, gdf)
+        log(f"{label} {len(gdf)} 筆")
+
+
+def prepare_media():
+    """首頁與頁面的圖片版本、影片連結（static/media/，不屬於 artifacts 版本）。"""
+    for source, size, outputs in media.build():
+        if size is None:
+            log(f"找不到 {source}，略過")
+        else:
+            log(f"{source}: {size:,} bytes → {', '.join(f'{s:,}' for s in outputs.values())}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="預先計算各頁面的 Earth Engine 成果")
+    parser.add_argument("--years", type=int, nargs="+", default=list(range(2016, 2026)),
+                        help="要預先分類的年份（預設 2016~2025，與第 3 頁的選項相同）")
+    parser.add_argument("--thumbnail-size", type=int, default=512)
+    parser.add_argument("--no-thumbnails", action="store_true")
+    parser.add_argument("--keep", type=int, default=3, help="保留的版本數")
+    args = parser.parse_args(argv)
+
+    t0 = time.time()
+    initialize_ee()
+    writer = ArtifactWriter(keep=args.keep)
+    log(f"寫入 {writer.directory}")
+
+    prepare_media()
+    prepare_vectors(writer)
+    layers = prepare_events(writer)
+    classified, data_end = prepare_classification(writer, args.years)
+    layers.update(classified)
+    prepare_map_ids(writer, layers, data_end)
+    if not args.no_thumbnails:
+        prepare_thumbnails(writer, layers, args.thumbnail_size)
+
+    writer.commit()
+    log(f"完成 {writer.version}，共 {time.time() - t0:.1f} 秒：{writer.manifest['items']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+import pytest
+
+from core import config
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """每個測試使用自己的 .cache（single_flight 的鎖檔、共用快取等都寫在這裡）。"""
+    path = tmp_path / "cache"
+    monkeypatch.setattr(config, "CACHE_DIR", str(path))
+    return path
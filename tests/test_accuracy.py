@@ -0,0 +1,27 @@
+from core import config
+from core.accuracy import confusion_frame, f1_frame, local_accuracy, summary
+from core.classifier import ClassifierService, FakeClassifierBackend
+
+
+def test_fake_backend_accuracy_renders(tmp_path):
+    trained = ClassifierService(registry_dir=str(tmp_path), backend=FakeClassifierBackend(),
+                                use_artifacts=False).get()
+    frame = f1_frame(trained.accuracy)
+    assert list(frame['類別']) == list(config.CLASS_NAMES)
+    assert (frame['F1'] == 1.0).all()
+    assert confusion_frame(trained.accuracy).shape == (len(config.CLASS_NAMES),) * 2
+    assert summary(trained.accuracy) == (1.0, 1.0, len(config.CLASS_VALUES))
+
+
+def test_f1_frame_skips_missing_classes():
+    accuracy = local_accuracy([0, 0, 1, 1, 1], [0, 1, 1, 1, 1])
+    frame = f1_frame(accuracy)
+    assert list(frame['類別']) == list(config.CLASS_NAMES[:2])
+    assert list(frame['驗證樣本數']) == [2, 3]
+    assert confusion_frame(accuracy).shape == (2, 2)
+
+
+def test_f1_frame_smaller_matrix():
+    # 類別數少於 CLASS_NAMES 的矩陣（例如舊的紀錄）不會越界
+    accuracy = {'matrix': [[3, 1], [0, 2]], 'f1': [0.857, 0.8], 'overall': 0.83, 'kappa': 0.67, 'count': 6}
+    assert list(f1_frame(accuracy)['F1']) == [0.857, 0.8]
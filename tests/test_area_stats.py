@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.area_stats import AreaStatsEngine
+
+
+class SlowCompute:
+    """假的分組加總：year 在 block 中時等待 release，記錄每次請求的年份。"""
+
+    def __init__(self, block=()):
+        self.block = set(block)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.requests = []
+
+    def __call__(self, classified_by_year, roi_coords, scale):
+        self.requests.append(sorted(classified_by_year))
+        if self.block & set(classified_by_year):
+            self.started.set()
+            assert self.release.wait(5)
+        return {year: {0: float(year)} for year in classified_by_year}
+
+
+def make_engine(tmp_path, compute):
+    return AreaStatsEngine(cache_dir=str(tmp_path / "area_stats"), compute=compute, use_artifacts=False)
+
+
+def test_missing_years_are_batched_and_cached(tmp_path):
+    compute = SlowCompute()
+    engine = make_engine(tmp_path, compute)
+    assert engine.get({2016: None, 2024: None}, "clf") == {2016: {0: 2016.0}, 2024: {0: 2024.0}}
+    engine.get({2016: None, 2020: None}, "clf")
+    make_engine(tmp_path, compute).get({2020: None, 2024: None}, "clf")
+    assert compute.requests == [[2016, 2024], [2020]]
+
+
+def test_compute_does_not_block_other_keys(tmp_path):
+    compute = SlowCompute(block=[2024])
+    engine = make_engine(tmp_path, compute)
+    engine.get({2016: None}, "clf")
+    with ThreadPoolExecutor(4) as executor:
+        slow = [executor.submit(engine.get, {2024: None}, "clf") for _ in range(2)]
+        assert compute.started.wait(5)
+        # 計算 2024 期間，快取命中與其他年份的計算都不需等待
+        assert executor.submit(engine.get, {2016: None}, "clf").result(timeout=1)
+        assert executor.submit(engine.get, {2020: None}, "clf").result(timeout=1)
+        compute.release.set()
+        assert [future.result(timeout=5) for future in slow] == [{2024: {0: 2024.0}}] * 2
+    # 同時請求 2024 的兩個呼叫只計算一次
+    assert compute.requests.count([2024]) == 1
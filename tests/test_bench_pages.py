@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks import bench_pages
+
+
+def test_missing_recording_points_to_record(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        bench_pages.main(["--recording", str(tmp_path / "pages.jsonl")])
+    assert "--record" in capsys.readouterr().err
+
+
+def test_missing_baseline(tmp_path, capsys):
+    recording = tmp_path / "pages.jsonl"
+    recording.write_text("")
+    with pytest.raises(SystemExit):
+        bench_pages.main(["--recording", str(recording), "--baseline", str(tmp_path / "baseline.json")])
+    assert "--output" in capsys.readouterr().err
+
+
+def test_compare_reports_regressions():
+    baseline = {"pages": [{"page": "app.py", "cold_s": 1.0, "warm_s": 0.10, "cold_calls": 4}]}
+    results = {"pages": [{"page": "app.py", "cold_s": 1.5, "warm_s": 0.14, "cold_calls": 4}]}
+    # warm_s 的差距小於 MIN_TIME_DELTA，不算退步
+    assert bench_pages.compare(results, baseline, 0.2) == ["app.py cold_s: 1.0 -> 1.5"]
@@ -0,0 +1,41 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.change_detection import ChangeDetectionEngine
+from core.events import load_catalog
+
+
+class SlowCompute:
+    """假的受損面積統計：事件在 block 中時等待 release。"""
+
+    def __init__(self, block=()):
+        self.block = set(block)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.requests = []
+
+    def __call__(self, requests, scale):
+        self.requests.append(sorted(requests))
+        if self.block & set(requests):
+            self.started.set()
+            assert self.release.wait(5)
+        return {eid: {"NDVI": 1.0} for eid in requests}
+
+
+def changes(*ids):
+    events = {event.id: event for event in load_catalog()}
+    return {eid: (events[eid], None, (f"{eid}-pre", f"{eid}-post")) for eid in ids}
+
+
+def test_statistics_do_not_block_other_events(tmp_path):
+    compute = SlowCompute(block=["kanu"])
+    engine = ChangeDetectionEngine(cache_dir=str(tmp_path), compute=compute, use_artifacts=False)
+    engine.statistics(changes("gaemi"))
+    with ThreadPoolExecutor(4) as executor:
+        slow = [executor.submit(engine.statistics, changes("kanu")) for _ in range(2)]
+        assert compute.started.wait(5)
+        assert executor.submit(engine.statistics, changes("gaemi")).result(timeout=1)
+        assert executor.submit(engine.statistics, changes("kong-rey")).result(timeout=1)
+        compute.release.set()
+        assert [future.result(timeout=5) for future in slow] == [{"kanu": {"NDVI": 1.0}}] * 2
+    assert compute.requests == [["gaemi"], ["kanu"], ["kong-rey"]]
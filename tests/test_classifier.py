@@ -0,0 +1,109 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import classifier
+from core.classifier import ClassifierService, FakeClassifierBackend, default_spec
+
+
+def make_service(tmp_path, backend=None):
+    return ClassifierService(registry_dir=str(tmp_path / "registry"), backend=backend or FakeClassifierBackend(),
+                             use_artifacts=False)
+
+
+def test_miss_then_memory_hit(tmp_path):
+    service = make_service(tmp_path)
+    first = service.get()
+    second = service.get()
+    assert service.backend.train_calls == 1
+    assert second is first
+    assert first.key == default_spec().key()
+
+
+def test_disk_hit_in_new_service(tmp_path):
+    backend = FakeClassifierBackend()
+    make_service(tmp_path, backend).get()
+    # 新的服務（例如另一個 process）沒有記憶體快取，從磁碟 registry 讀取
+    trained = make_service(tmp_path, backend).get()
+    assert backend.train_calls == 1
+    assert trained.input_bands == ['B1', 'B2', 'B3']
+    assert trained.accuracy['overall'] == 1.0
+
+
+def test_specs_are_cached_separately(tmp_path):
+    service = make_service(tmp_path)
+    service.get(default_spec(seed=1))
+    service.get(default_spec(seed=2))
+    service.get(default_spec(seed=1))
+    assert service.backend.train_calls == 2
+
+
+def test_invalidate_retrains(tmp_path):
+    service = make_service(tmp_path)
+    service.get()
+    service.invalidate()
+    service.get()
+    assert service.backend.train_calls == 2
+
+
+def test_registry_version_mismatch_retrains(tmp_path):
+    service = make_service(tmp_path)
+    key = service.get().key
+    path = service._path(key)
+    with open(path, "r", encoding="utf-8") as f:
+        record = json.load(f)
+    record['version'] = classifier.REGISTRY_VERSION - 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+    fresh = make_service(tmp_path, service.backend)
+    fresh.get()
+    assert service.backend.train_calls == 2
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f)['version'] == classifier.REGISTRY_VERSION
+
+
+def test_missing_accuracy_is_assessed_without_retraining(tmp_path):
+    service = make_service(tmp_path)
+    key = service.get().key
+    path = service._path(key)
+    with open(path, "r", encoding="utf-8") as f:
+        record = json.load(f)
+    del record['accuracy']
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+    trained = make_service(tmp_path, service.backend).get()
+    assert service.backend.train_calls == 1
+    assert trained.accuracy is not None
+
+
+class SlowBackend(FakeClassifierBackend):
+    """訓練時等待 release，用來檢查訓練期間其他呼叫是否被擋住。"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def train(self, spec):
+        if spec.seed == 1:
+            self.started.set()
+            assert self.release.wait(5)
+        return super().train(spec)
+
+
+def test_training_does_not_block_other_specs(tmp_path):
+    backend = SlowBackend()
+    service = make_service(tmp_path, backend)
+    service.get(default_spec(seed=2))
+    with ThreadPoolExecutor(4) as executor:
+        slow = [executor.submit(service.get, default_spec(seed=1)) for _ in range(2)]
+        assert backend.started.wait(5)
+        # 訓練 seed=1 期間，記憶體命中與其他參數的訓練都不需等待
+        assert executor.submit(service.get, default_spec(seed=2)).result(timeout=1)
+        assert executor.submit(service.get, default_spec(seed=3)).result(timeout=1)
+        backend.release.set()
+        first, second = [future.result(timeout=5) for future in slow]
+    assert first is second
+    assert backend.train_calls == 3
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from core import config, pipeline
+from core.fetch import FakeLatencyBackend, fetch_all
+from core.scenes import SceneQuery
+
+
+def test_requests_run_in_parallel():
+    backend = FakeLatencyBackend(latency=0.2, jitter=0.0)
+    tasks = {i: (lambda i=i: backend.tile_url(f"image-{i}", {})) for i in range(6)}
+    result = fetch_all(tasks, max_workers=6)
+    assert result.ok
+    assert backend.calls == 6
+    assert result.values[3] == "https://fake.invalid/image-3/{z}/{x}/{y}"
+    # 6 個 0.2 秒的請求同時執行，總時間約等於一個請求
+    assert result.elapsed < 0.6
+
+
+def test_partial_failure_and_timeout():
+    backend = FakeLatencyBackend(latency=0.0, jitter=0.0)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    result = fetch_all({
+        "scene": lambda: backend.lookup(SceneQuery(config.POINT_COORDS, config.ROI_COORDS, "2024-01-01", "2024-02-01")),
+        "error": fail,
+        "slow": lambda: time.sleep(1.0),
+    }, timeout=0.2)
+    assert result.values["scene"].id == "FAKE/2024-01-01"
+    assert isinstance(result.errors["error"], RuntimeError)
+    assert isinstance(result.errors["slow"], TimeoutError)
+    assert not result.ok
+
+
+def test_empty_tasks():
+    result = fetch_all({})
+    assert result.ok and result.values == {}
+
+
+def test_queued_tasks_time_out_when_workers_hang():
+    release = threading.Event()
+    tasks = {f"hang-{i}": (lambda: release.wait(5)) for i in range(2)}
+    tasks["queued"] = lambda: "never"
+    try:
+        result = fetch_all(tasks, max_workers=2, timeout=10, deadline=0.3)
+    finally:
+        release.set()
+    # 執行中的工作卡住時，排隊中的工作在總時限到期後也回報逾時
+    assert result.elapsed < 1.0
+    assert set(result.errors) == {"hang-0", "hang-1", "queued"}
+    assert all(isinstance(error, TimeoutError) for error in result.errors.values())
+
+
+def test_tile_urls_keep_successful_layers(monkeypatch):
+    def fake_tile_url(image, vis, data_end=None):
+        if image == "bad":
+            raise RuntimeError("boom")
+        return f"https://fake.invalid/{image}"
+
+    monkeypatch.setattr(pipeline, "tile_url", fake_tile_url)
+    fetched = pipeline.tile_urls({"good": ("good", {}), "bad": ("bad", {})})
+    assert fetched.values == {"good": "https://fake.invalid/good"}
+    assert isinstance(fetched.errors["bad"], RuntimeError)
@@ -0,0 +1,59 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas as gpd
+from shapely.geometry import Point
+
+from core.hotel_risk import LandCoverSampler
+
+HOTELS = gpd.GeoDataFrame(geometry=[Point(121.3, 24.1), Point(121.4, 24.2)], crs="EPSG:4326")
+OTHER_HOTELS = gpd.GeoDataFrame(geometry=[Point(121.5, 24.3)], crs="EPSG:4326")
+
+
+class SlowImages:
+    """假的 images()：year 在 block 中時等待 release，記錄每次請求的年份。"""
+
+    def __init__(self, block=()):
+        self.block = set(block)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.requests = []
+
+    def __call__(self, years):
+        self.requests.append(sorted(years))
+        if self.block & set(years):
+            self.started.set()
+            assert self.release.wait(5)
+        return {year: year for year in years}
+
+
+def fake_sample(classified_by_year, lonlats):
+    return {year: [image % 11] * len(lonlats) for year, image in classified_by_year.items()}
+
+
+def make_sampler(tmp_path):
+    return LandCoverSampler(cache_dir=str(tmp_path / "hotel_landcover"), compute=fake_sample, use_artifacts=False)
+
+
+def test_missing_years_are_sampled_once(tmp_path):
+    images = SlowImages()
+    sampler = make_sampler(tmp_path)
+    assert sampler.get([2016, 2024], "clf", HOTELS, images) == {2016: [3, 3], 2024: [0, 0]}
+    sampler.get([2016, 2020], "clf", HOTELS, images)
+    make_sampler(tmp_path).get([2020, 2024], "clf", HOTELS, images)
+    assert images.requests == [[2016, 2024], [2020]]
+
+
+def test_sampling_does_not_block_other_keys(tmp_path):
+    images = SlowImages(block=[2024])
+    sampler = make_sampler(tmp_path)
+    sampler.get([2016], "clf", HOTELS, images)
+    with ThreadPoolExecutor(4) as executor:
+        slow = [executor.submit(sampler.get, [2024], "clf", HOTELS, images) for _ in range(2)]
+        assert images.started.wait(5)
+        # 取影像與取樣期間，快取命中與其他點位的取樣都不需等待
+        assert executor.submit(sampler.get, [2016], "clf", HOTELS, images).result(timeout=1)
+        assert executor.submit(sampler.get, [2016], "clf", OTHER_HOTELS, images).result(timeout=1)
+        images.release.set()
+        assert [future.result(timeout=5) for future in slow] == [{2024: [0, 0]}] * 2
+    assert images.requests.count([2024]) == 1
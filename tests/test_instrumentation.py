@@ -0,0 +1,34 @@
+import ee
+import pytest
+
+from core import instrumentation
+from core.instrumentation import metrics
+
+
+@pytest.fixture
+def fake_ee(monkeypatch):
+    """以假回應取代 ee.data 的呼叫，再安裝計時包裝（測試結束後還原）。"""
+    for name in instrumentation.INSTRUMENTED_EE_CALLS:
+        monkeypatch.setattr(ee.data, name, lambda *args, **kwargs: {"result": "x" * 1000})
+    monkeypatch.setattr(instrumentation, "_ee_instrumented", False)
+    instrumentation.instrument_ee()
+
+
+def counters():
+    return metrics.snapshot()['counters']
+
+
+def test_response_bytes_not_measured_by_default(fake_ee, monkeypatch):
+    monkeypatch.setattr(instrumentation, "_ee_bytes_until", 0.0)
+    before = counters().get("ee.computeValue.bytes", 0)
+    calls = metrics.snapshot()['timers'].get("ee.computeValue", (0, 0, 0))[0]
+    ee.data.computeValue({})
+    assert counters().get("ee.computeValue.bytes", 0) == before
+    assert metrics.snapshot()['timers']["ee.computeValue"][0] == calls + 1
+
+
+def test_response_bytes_measured_in_debug(fake_ee, monkeypatch):
+    monkeypatch.setattr(instrumentation, "_ee_bytes_until", float("inf"))
+    before = counters().get("ee.getInfo.bytes", 0)
+    ee.data.getInfo("asset")
+    assert counters()["ee.getInfo.bytes"] - before > 1000
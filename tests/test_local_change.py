@@ -0,0 +1,31 @@
+import pytest
+
+from core import local_change, scenes
+
+
+def test_unknown_event_lists_valid_ids(capsys):
+    with pytest.raises(SystemExit) as exc:
+        local_change.main(["kanu-2023"])
+    assert exc.value.code == 2
+    assert "kanu" in capsys.readouterr().err
+
+
+def test_missing_scene(monkeypatch, capsys):
+    found = iter([scenes.SceneRecord("S2/pre", 1.0, 0, (0, 0, 1, 1)), None])
+    monkeypatch.setattr(scenes, "find_scene", lambda *args: next(found))
+    assert local_change.main(["kanu"]) == 1
+    out = capsys.readouterr().out
+    assert "災後期間 2023-08-01 ~ 2023-09-30 找不到場景" in out
+
+
+@pytest.mark.parametrize("threshold, message", [
+    ("EVI=-0.2", "未知的指數 'EVI'"),
+    ("NDVI=abc", "門檻不是數字"),
+    ("NDVI", "門檻不是數字"),
+    ("NDVI=-0.2=1", "門檻不是數字"),
+])
+def test_invalid_threshold(threshold, message, capsys):
+    with pytest.raises(SystemExit) as exc:
+        local_change.main(["kanu", "--threshold", threshold])
+    assert exc.value.code == 2
+    assert message in capsys.readouterr().err
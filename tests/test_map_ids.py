@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.map_ids import MapIdCache
+
+
+def make_cache(tmp_path, calls):
+    def request(image, vis_params):
+        calls.append(image)
+        return {'url': f"https://tiles.invalid/{image}/{{z}}/{{x}}/{{y}}", 'expires_at': time.time() + 4 * 3600}
+    return MapIdCache(cache_dir=str(tmp_path / "map_ids"), request=request, use_artifacts=False)
+
+
+def test_tile_ttl_is_recorded(tmp_path):
+    calls = []
+    cache = make_cache(tmp_path, calls)
+    cache.url("recent", {}, key="a", tile_ttl=3600)
+    cache.url("old", {}, key="b")
+    assert cache.tile_ttl("a") == 3600
+    assert cache.tile_ttl("b") is None
+    # 另一個 process（圖磚代理）從磁碟讀取
+    other = make_cache(tmp_path, calls)
+    assert other.cached("a") and other.tile_ttl("a") == 3600
+    assert len(calls) == 2
+
+
+def test_tile_ttl_update_without_new_request(tmp_path):
+    calls = []
+    cache = make_cache(tmp_path, calls)
+    cache.url("image", {}, key="a")
+    cache.url("image", {}, key="a", tile_ttl=3600)
+    assert len(calls) == 1
+    assert make_cache(tmp_path, calls).tile_ttl("a") == 3600
+
+
+def test_concurrent_requests_share_one_fetch_and_release_key_locks(tmp_path):
+    calls = []
+    cache = make_cache(tmp_path, calls)
+    with ThreadPoolExecutor(8) as executor:
+        urls = list(executor.map(lambda i: cache.url(f"image-{i % 4}", {}, key=f"k{i % 4}"), range(32)))
+    assert len(set(urls)) == 4
+    assert sorted(calls) == [f"image-{i}" for i in range(4)]
+    # 每個鍵的鎖在最後一個呼叫者離開後移除
+    assert cache._key_locks == {}
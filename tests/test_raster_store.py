@@ -0,0 +1,42 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.raster_store import RasterEntry, RasterStore
+from core.scenes import SceneRecord
+
+ROI = (121.3, 24.1, 121.4, 24.2)
+
+
+class FakeStore(RasterStore):
+    """下載回傳假的位元組，轉檔只寫出空檔案，不需 rasterio。"""
+
+    def __init__(self, root):
+        super().__init__(root=root, download=self.fake_download)
+        self.downloads = []
+        self._guard = threading.Lock()
+
+    def fake_download(self, scene_id, roi, bands, scale, crs):
+        with self._guard:
+            self.downloads.append(scene_id)
+        threading.Event().wait(0.02)
+        return b""
+
+    def _ingest(self, key, scene, bands, scale, crs, data):
+        os.makedirs(self.root, exist_ok=True)
+        paths = [os.path.join(self.root, f"{key}{suffix}") for suffix in (".tif", ".npy")]
+        for path in paths:
+            open(path, "wb").close()
+        return RasterEntry(key=key, scene_id=scene.id, date="2024-01-01", roi=ROI, scale=scale, crs=crs,
+                           bands=bands, shape=(1, 1, 1), transform=(0, 1, 0, 0, 0, -1),
+                           cog=paths[0], array=paths[1])
+
+
+def test_concurrent_downloads_keep_every_index_entry(tmp_path):
+    store = FakeStore(str(tmp_path / "rasters"))
+    scenes = [SceneRecord(f"S2/{i}", 0.0, 0, ROI) for i in range(6)]
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(store.get, scenes * 2))
+    # 同一場景只下載一次，不同場景同時寫入索引時不會互相覆蓋
+    assert sorted(store.downloads) == sorted(scene.id for scene in scenes)
+    assert sorted(entry.scene_id for entry in store.entries()) == sorted(scene.id for scene in scenes)
@@ -0,0 +1,55 @@
+from streamlit.testing.v1 import AppTest
+
+
+def map_app():
+    import folium
+    import streamlit as st
+
+    from core.sections import cached_map
+
+    key = st.radio("圖層", ["a", "b"])
+    max_age = st.session_state.get("max_age", 3600)
+
+    def build():
+        st.session_state["builds"] = st.session_state.get("builds", 0) + 1
+        if key == "b" and st.session_state.get("fail"):
+            return None
+        return folium.Map(location=[24.05, 121.16], zoom_start=12)
+
+    cached_map(("map", key), build, height=300, name="test", max_age=max_age)
+
+
+def run_app():
+    at = AppTest.from_function(map_app)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def test_one_build_per_key():
+    at = run_app()
+    assert at.session_state["builds"] == 1
+    at.run()
+    assert at.session_state["builds"] == 1
+    at.radio[0].set_value("b").run()
+    assert at.session_state["builds"] == 2
+    # 切回已顯示過的地圖不再建立
+    at.radio[0].set_value("a").run()
+    assert at.session_state["builds"] == 2
+    assert not at.exception
+
+
+def test_expired_map_is_rebuilt():
+    at = run_app()
+    at.session_state["max_age"] = 0
+    at.run()
+    assert at.session_state["builds"] == 2
+
+
+def test_failed_build_is_not_cached():
+    at = run_app()
+    at.session_state["fail"] = True
+    at.radio[0].set_value("b").run()
+    at.run()
+    assert at.session_state["builds"] == 3
+    assert not at.exception
@@ -0,0 +1,61 @@
+import logging
+
+import pytest
+
+from core import session
+
+
+class FakeCredentials:
+    """假的憑證：永遠過期，refresh 依 fail 決定是否拋出例外。"""
+
+    def __init__(self, fail=True):
+        self.valid = False
+        self.fail = fail
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        if self.fail:
+            raise RuntimeError("token endpoint unavailable")
+        self.valid = True
+
+
+@pytest.fixture
+def initialized(monkeypatch):
+    calls = []
+    credentials = FakeCredentials()
+
+    def fake_initialize():
+        calls.append(1)
+        session._state.update(credentials=credentials, initialized_at=len(calls), health=None)
+
+    monkeypatch.setattr(session, "_initialize", fake_initialize)
+    monkeypatch.setattr(session, "_state", dict(session._state))
+    session.reset()
+    session.ensure_ee()
+    return credentials, calls
+
+
+def test_failed_refresh_backs_off(initialized, monkeypatch, caplog):
+    credentials, calls = initialized
+    now = [1000.0]
+    monkeypatch.setattr(session.time, "time", lambda: now[0])
+    with caplog.at_level(logging.WARNING, logger="meovv.session"):
+        session.ensure_ee()
+    assert "憑證更新失敗" in caplog.text
+    assert credentials.refreshes == 1 and len(calls) == 2
+    # 失敗期間內不再更新、也不再重新初始化
+    for _ in range(5):
+        session.ensure_ee()
+    assert credentials.refreshes == 1 and len(calls) == 2
+    now[0] += session.REFRESH_BACKOFF + 1
+    session.ensure_ee()
+    assert credentials.refreshes == 2 and len(calls) == 3
+
+
+def test_successful_refresh_does_not_reinitialize(initialized):
+    credentials, calls = initialized
+    credentials.fail = False
+    session.ensure_ee()
+    assert credentials.refreshes == 1 and len(calls) == 1
+    assert session._state["refresh_failed_at"] is None
@@ -0,0 +1,34 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import shared_cache
+
+
+def test_single_flight_serializes_and_releases_name_locks(tmp_path):
+    active = []
+    overlaps = []
+    guard = threading.Lock()
+
+    def work(i):
+        with shared_cache.single_flight(f"key-{i % 3}", lock_dir=str(tmp_path)):
+            with guard:
+                overlaps.append(f"key-{i % 3}" in active)
+                active.append(f"key-{i % 3}")
+            threading.Event().wait(0.01)
+            with guard:
+                active.remove(f"key-{i % 3}")
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(work, range(30)))
+    assert not any(overlaps)
+    # 最後一個持有者離開後移除，字典不會隨用過的名稱無限增長
+    assert shared_cache._name_locks == {}
+
+
+def test_name_lock_released_on_error(tmp_path):
+    try:
+        with shared_cache.single_flight("boom", lock_dir=str(tmp_path)):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert "boom" not in shared_cache._name_locks
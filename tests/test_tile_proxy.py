@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from core.tile_proxy import RECENT_TILE_TTL, FakeTileServer, TileCache, TileNotFound, make_server, roi_tiles, tile_ttl
+
+LAYER = "0123abcd"
+
+
+def make_cache(tmp_path, server, **kwargs):
+    return TileCache(cache_dir=str(tmp_path / "tiles"),
+                     resolve=lambda layer: server.url_template if layer == LAYER else None, **kwargs)
+
+
+def age(path, seconds):
+    """把圖磚的取得時間與存取時間往前調。"""
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_tile_is_fetched_once_then_read_from_disk(tmp_path):
+    with FakeTileServer() as server:
+        cache = make_cache(tmp_path, server)
+        first = cache.get(LAYER, 12, 3424, 1753)
+        second = cache.get(LAYER, 12, 3424, 1753)
+        # 新的快取物件（另一個 process）也從磁碟讀取
+        third = make_cache(tmp_path, server).get(LAYER, 12, 3424, 1753)
+    assert first == second == third
+    assert first.startswith(FakeTileServer.PNG_HEADER) and first.endswith(b"/12/3424/1753")
+    assert server.requests == 1
+
+
+def test_concurrent_requests_share_one_upstream_request(tmp_path):
+    with FakeTileServer(latency=0.2) as server:
+        cache = make_cache(tmp_path, server)
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda _: cache.get(LAYER, 15, 1, 2), range(8)))
+    assert len(set(results)) == 1
+    assert server.requests == 1
+    assert cache.upstream_requests == 1
+
+
+def test_unknown_layer(tmp_path):
+    with FakeTileServer() as server:
+        with pytest.raises(TileNotFound):
+            make_cache(tmp_path, server).get("ffff", 12, 0, 0)
+    assert server.requests == 0
+
+
+def test_seed_covers_roi_tiles(tmp_path):
+    with FakeTileServer() as server:
+        cache = make_cache(tmp_path, server)
+        result = cache.seed([LAYER], zooms=(12, 13))
+    assert result.ok
+    assert len(result.values) == len(roi_tiles(zooms=(12, 13))) == server.requests
+
+
+def test_proxy_server(tmp_path):
+    with FakeTileServer() as server:
+        proxy = make_server(make_cache(tmp_path, server), port=0)
+        threading.Thread(target=proxy.serve_forever, daemon=True).start()
+        host, port = proxy.server_address
+        try:
+            ok = requests.get(f"http://{host}:{port}/tiles/{LAYER}/12/1/2.png", timeout=5)
+            missing = requests.get(f"http://{host}:{port}/tiles/ffff/12/1/2.png", timeout=5)
+        finally:
+            proxy.shutdown()
+            proxy.server_close()
+    assert ok.status_code == 200 and ok.headers["Content-Type"] == "image/png"
+    assert ok.content.endswith(b"/12/1/2")
+    assert missing.status_code == 404
+
+
+def test_tile_ttl_for_recent_data():
+    now = time.mktime(time.strptime("2025-06-15", "%Y-%m-%d"))
+    assert tile_ttl("2026-01-01", now=now) == RECENT_TILE_TTL
+    assert tile_ttl("2025-06-01", now=now) == RECENT_TILE_TTL
+    assert tile_ttl("2025-01-01", now=now) is None
+    assert tile_ttl(None, now=now) is None
+
+
+def test_recent_layer_tiles_expire(tmp_path):
+    with FakeTileServer() as server:
+        cache = make_cache(tmp_path, server, layer_ttl=lambda layer: 3600)
+        cache.get(LAYER, 12, 1, 2)
+        cache.get(LAYER, 12, 1, 2)
+        assert server.requests == 1
+        age(cache.path(LAYER, 12, 1, 2), 7200)
+        cache.get(LAYER, 12, 1, 2)
+        assert server.requests == 2
+
+
+def test_tiles_without_ttl_do_not_expire(tmp_path):
+    with FakeTileServer() as server:
+        cache = make_cache(tmp_path, server)
+        cache.get(LAYER, 12, 1, 2)
+        age(cache.path(LAYER, 12, 1, 2), 365 * 86400)
+        cache.get(LAYER, 12, 1, 2)
+    assert server.requests == 1
+
+
+def test_evict_least_recently_read(tmp_path):
+    with FakeTileServer() as server:
+        cache = make_cache(tmp_path, server)
+        tiles = [(12, x, 0) for x in range(4)]
+        for i, tile in enumerate(tiles):
+            cache.get(LAYER, *tile)
+            age(cache.path(LAYER, *tile), 100 - i)
+        # 最早取得的圖磚最近被讀取過，保留
+        cache.get(LAYER, *tiles[0])
+        size = os.path.getsize(cache.path(LAYER, *tiles[0]))
+        assert cache.evict(max_bytes=2 * size + size // 2) == 2
+    kept = [tile for tile in tiles if os.path.exists(cache.path(LAYER, *tile))]
+    assert kept == [tiles[0], tiles[3]]
+
+
+def test_evict_removes_expired_tiles(tmp_path):
+    with FakeTileServer() as server:
+        cache = make_cache(tmp_path, server, layer_ttl=lambda layer: 3600)
+        cache.get(LAYER, 12, 1, 2)
+        cache.get(LAYER, 12, 1, 3)
+        age(cache.path(LAYER, 12, 1, 2), 7200)
+        assert cache.evict() == 1
+    assert not os.path.exists(cache.path(LAYER, 12, 1, 2))
+    assert os.path.exists(cache.path(LAYER, 12, 1, 3))
+
+
+def test_evict_runs_while_fetching(tmp_path):
+    with FakeTileServer() as server:
+        cache = make_cache(tmp_path, server, max_bytes=0, evict_every=2)
+        for x in range(4):
+            cache.get(LAYER, 12, x, 0)
+    assert sum(os.path.exists(cache.path(LAYER, 12, x, 0)) for x in range(4)) == 0
@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.transitions import TransitionEngine, local_matrix, transpose
+
+
+class FakeCompute:
+    """以本機陣列代替 Earth Engine：classified_by_year 的值是類別陣列。"""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, pairs, roi_coords, scale):
+        self.requests.append(sorted(pairs))
+        return {pair: local_matrix(a, b, scale) for pair, (a, b) in pairs.items()}
+
+
+YEARS = {
+    2016: np.array([[0, 0], [1, 2]]),
+    2020: np.array([[0, 1], [1, 1]]),
+    2024: np.array([[1, 1], [2, 2]]),
+}
+
+
+def make_engine(tmp_path, compute):
+    return TransitionEngine(cache_dir=str(tmp_path / "transitions"), compute=compute, use_artifacts=False)
+
+
+def test_reversed_pair_is_transposed_locally(tmp_path):
+    compute = FakeCompute()
+    engine = make_engine(tmp_path, compute)
+    forward = engine.get(YEARS, [(2016, 2024)], "clf")[(2016, 2024)]
+    backward = engine.get(YEARS, [(2024, 2016)], "clf")[(2024, 2016)]
+    assert compute.requests == [[(2016, 2024)]]
+    assert backward == transpose(forward) == local_matrix(YEARS[2024], YEARS[2016])
+
+
+def test_reversed_pair_uses_canonical_request(tmp_path):
+    compute = FakeCompute()
+    engine = make_engine(tmp_path, compute)
+    result = engine.get(YEARS, [(2024, 2020), (2020, 2024), (2016, 2020)], "clf")
+    assert compute.requests == [[(2016, 2020), (2020, 2024)]]
+    assert result[(2024, 2020)] == transpose(result[(2020, 2024)])
+    # 新的引擎（另一個 process）從磁碟讀取
+    other = FakeCompute()
+    make_engine(tmp_path, other).get(YEARS, [(2020, 2016)], "clf")
+    assert other.requests == []
+
+
+def test_compute_does_not_block_cached_pairs(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    class BlockingCompute(FakeCompute):
+        def __call__(self, pairs, roi_coords, scale):
+            if (2020, 2024) in pairs:
+                started.set()
+                assert release.wait(5)
+            return super().__call__(pairs, roi_coords, scale)
+
+    compute = BlockingCompute()
+    engine = make_engine(tmp_path, compute)
+    engine.get(YEARS, [(2016, 2020)], "clf")
+    with ThreadPoolExecutor(4) as executor:
+        slow = [executor.submit(engine.get, YEARS, [pair], "clf") for pair in [(2020, 2024), (2024, 2020)]]
+        assert started.wait(5)
+        # 計算 2020-2024 期間，已快取的年份對（及其轉置）不需等待
+        assert executor.submit(engine.get, YEARS, [(2020, 2016)], "clf").result(timeout=1)
+        release.set()
+        forward, backward = [future.result(timeout=5) for future in slow]
+    assert backward[(2024, 2020)] == transpose(forward[(2020, 2024)])
+    assert compute.requests == [[(2016, 2020)], [(2020, 2024)]]